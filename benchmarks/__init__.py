@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+
+"""Pybooru benchmarks.
+
+Benchmarks run offline against synthetic payloads or the local fake server
+of pybooru.testing, run them from the repository root, e.g.:
+
+    python -m benchmarks.bench_json
+    python -m benchmarks.suite run --output baseline.json
+    python -m benchmarks.suite compare baseline.json
+"""
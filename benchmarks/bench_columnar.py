@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""benchmarks.bench_columnar
+
+Compare memory and aggregation time of posts kept as a list of dicts and as
+a columnar table (pybooru.columnar.Table): sum of scores, top 100 by score
+and filter by rating.
+
+Usage:
+    python -m benchmarks.bench_columnar [--records N]
+"""
+
+# __future__ imports
+from __future__ import absolute_import, print_function
+
+# External imports
+import argparse
+import gc
+import heapq
+import time
+import tracemalloc
+
+# pybooru imports
+from pybooru import columnar
+from pybooru.columnar import Table
+from pybooru.testing import Dataset
+
+
+def held(build):
+    """Return the result of build() and the memory it holds."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, memory
+
+
+def timed(function, repeat=5):
+    """Return the best time of function() in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def fill(posts):
+    """Return a table of posts."""
+    table = Table()
+    table.extend(posts)
+    return table
+
+
+def main(argv=None):
+    """Run the benchmark and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--records', type=int, default=50000,
+                        help="number of posts (default: 50000)")
+    args = parser.parse_args(argv)
+
+    dataset = Dataset(posts=args.records, cache_size=0)
+    posts, dict_memory = held(lambda: [
+        dataset.record('posts', post_id)
+        for post_id in range(1, args.records + 1)])
+    # Fresh records, the table doesn't share strings with the dicts
+    table, table_memory = held(lambda: fill(
+        dataset.record('posts', post_id)
+        for post_id in range(args.records, 0, -1)))
+
+    dict_ops = (
+        ('sum', lambda: sum(post['score'] for post in posts)),
+        ('top_k', lambda: heapq.nlargest(100, posts,
+                                         key=lambda post: post['score'])),
+        ('filter', lambda: [post for post in posts
+                            if post['rating'] == 's']))
+    table_ops = (('sum', lambda: table.sum('score')),
+                 ('top_k', lambda: table.top_k('score', 100)),
+                 ('filter', lambda: table.filter('rating', 's')))
+
+    print("numpy: {0}".format('yes' if columnar.numpy else 'no'))
+    print("{0:<8} {1:>12} {2:>12} {3:>8}".format('', 'dicts', 'table',
+                                                 'speedup'))
+    print("{0:<8} {1:>10.1f}MB {2:>10.1f}MB {3:>7.1f}x".format(
+        'memory', dict_memory / 1e6, table_memory / 1e6,
+        float(dict_memory) / table_memory))
+    for (name, dicts), (_, columns) in zip(dict_ops, table_ops):
+        dict_ms, table_ms = timed(dicts), timed(columns)
+        print("{0:<8} {1:>10.2f}ms {2:>10.2f}ms {3:>7.1f}x".format(
+            name, dict_ms, table_ms, dict_ms / table_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+"""benchmarks.bench_json
+
+Compare decode throughput of the JSON codecs available to Pybooru on
+realistic post_list(limit=200) payloads.
+
+Usage:
+    python -m benchmarks.bench_json [--pages N] [--repeat N]
+"""
+
+# __future__ imports
+from __future__ import absolute_import, print_function
+
+# External imports
+import argparse
+import time
+
+# pybooru imports
+from pybooru.codec import CODECS
+
+from .payloads import post_list_payload
+
+
+def bench_codec(codec, payloads, repeat):
+    """Return best decode time of all payloads in seconds."""
+    loads = codec.loads
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            loads(payload)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    """Run the benchmark and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--pages', type=int, default=20,
+                        help="number of 200 posts payloads (default: 20)")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="repetitions, best time is used (default: 5)")
+    args = parser.parse_args(argv)
+
+    payloads = [post_list_payload(200, page * 200 + 1)
+                for page in range(args.pages)]
+    size = sum(len(payload) for payload in payloads)
+    posts = 200 * args.pages
+    print("{0} payloads, {1} posts, {2:.1f} MiB".format(
+        args.pages, posts, size / 1048576.0))
+    print("{0:<8} {1:>10} {2:>12} {3:>9}".format(
+        'codec', 'MiB/s', 'posts/s', 'speedup'))
+
+    baseline = None
+    for codec_class in reversed(CODECS):
+        if not codec_class.is_available():
+            print("{0:<8} {1:>10}".format(codec_class.name, 'n/a'))
+            continue
+        elapsed = bench_codec(codec_class(), payloads, args.repeat)
+        baseline = baseline or elapsed
+        print("{0:<8} {1:>10.1f} {2:>12.0f} {3:>8.2f}x".format(
+            codec_class.name, size / 1048576.0 / elapsed, posts / elapsed,
+            baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""benchmarks.bench_middleware
+
+Measure the overhead of the middleware chain per API call. Requests are
+answered by a stub, so only URL building, _get and the chain are timed.
+
+Usage:
+    python -m benchmarks.bench_middleware [--calls N] [--repeat N]
+"""
+
+# __future__ imports
+from __future__ import absolute_import, print_function
+
+# External imports
+import argparse
+import time
+
+# pybooru imports
+from pybooru import Danbooru
+from pybooru.middleware import Middleware
+
+RESPONSE = {'id': 1}
+
+
+class StubDanbooru(Danbooru):
+    """Danbooru client that answers every request without network."""
+
+    def _send(self, url, api_call, request_args, method='GET',
+              stream=False):
+        return RESPONSE
+
+
+def bench_calls(client, calls, repeat):
+    """Return best time per post_show() call in microseconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            client.post_show(1)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / calls * 1e6
+
+
+def main(argv=None):
+    """Run the benchmark and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--calls', type=int, default=100000,
+                        help="calls per repetition (default: 100000)")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="repetitions, best time is used (default: 5)")
+    args = parser.parse_args(argv)
+
+    print("{0:<12} {1:>10} {2:>10}".format('middlewares', 'us/call',
+                                            'overhead'))
+    baseline = None
+    for count in (0, 1, 5, 10):
+        client = StubDanbooru('danbooru',
+                              middlewares=[Middleware()] * count)
+        elapsed = bench_calls(client, args.calls, args.repeat)
+        baseline = elapsed if baseline is None else baseline
+        print("{0:<12} {1:>10.2f} {2:>10.2f}".format(count, elapsed,
+                                                     elapsed - baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""benchmarks.bench_models
+
+Compare memory and build time of records kept as dicts and as models
+(pybooru.models) for a working set of decoded responses.
+
+Usage:
+    python -m benchmarks.bench_models [--records N]
+"""
+
+# __future__ imports
+from __future__ import absolute_import, print_function
+
+# External imports
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+# pybooru imports
+from pybooru.models import Pool, Post, Tag
+from pybooru.testing import Dataset
+
+
+def measure(build):
+    """Return memory held by the result of build() and its time."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    start = time.perf_counter()
+    build()
+    return held, time.perf_counter() - start
+
+
+def main(argv=None):
+    """Run the benchmark and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--records', type=int, default=50000,
+                        help="records of each resource (default: 50000)")
+    args = parser.parse_args(argv)
+
+    dataset = Dataset(posts=args.records, tags=args.records,
+                      pools=args.records)
+    print("{0:<6} {1:<6} {2:>12} {3:>10} {4:>10}".format(
+        'model', 'kind', 'bytes/rec', 'us/rec', 'memory'))
+    for model, resource in ((Post, 'posts'), (Tag, 'tags'),
+                            (Pool, 'pools')):
+        pages = [json.dumps([dataset.record(resource, record_id)
+                             for record_id in range(start, start + 1000)])
+                 for start in range(1, args.records + 1, 1000)]
+
+        def dicts():
+            return [record for page in pages for record in json.loads(page)]
+
+        def models():
+            return [record for page in pages
+                    for record in model.from_list(json.loads(page))]
+
+        baseline = None
+        for kind, build in (('dict', dicts), ('model', models)):
+            held, elapsed = measure(build)
+            baseline = baseline or held
+            print("{0:<6} {1:<6} {2:>12.0f} {3:>10.2f} {4:>9.0%}".format(
+                model.__name__, kind, float(held) / args.records,
+                elapsed / args.records * 1e6, float(held) / baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+"""benchmarks.payloads
+
+Synthetic payloads that look like real Danbooru responses, posts are built
+by pybooru.testing.
+
+Functions:
+    post_list_payload -- Build an encoded posts.json response.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import json
+
+# pybooru imports
+from pybooru.testing import make_post
+
+
+def post_list_payload(limit=200, start=1):
+    """Build an encoded posts.json response.
+
+    Parameters:
+        limit (int): Number of posts (Default: 200).
+        start (int): Id of the first post.
+
+    Returns:
+        JSON document (bytes).
+    """
+    posts = [make_post(post_id) for post_id in range(start, start + limit)]
+    return json.dumps(posts).encode('utf-8')
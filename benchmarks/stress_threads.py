@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""benchmarks.stress_threads
+
+Stress test of one Danbooru client shared by many threads against a local
+server. Workers mix post_list() and favorite_add() calls and check that
+'last_call' describes their own call and that POST headers don't leak into
+GET requests.
+
+Usage:
+    python -m benchmarks.stress_threads [--threads N] [--calls N]
+"""
+
+# __future__ imports
+from __future__ import absolute_import, print_function
+
+# External imports
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# pybooru imports
+from pybooru import Danbooru
+
+from .payloads import post_list_payload
+
+JSON_CONTENT_TYPE = 'application/json; charset=utf-8'
+
+
+class StressHandler(BaseHTTPRequestHandler):
+    """Serve posts.json pages and favorites.json, checking headers."""
+
+    protocol_version = 'HTTP/1.1'
+    pages = {}
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        page = int(query.get('page', ['1'])[0])
+        if self.headers.get('content-type') != JSON_CONTENT_TYPE:
+            self._send(400, b'{"reason": "bad content-type"}')
+        else:
+            self._send(200, self.pages[page])
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('content-length', 0)))
+        if self.headers.get('content-type') == JSON_CONTENT_TYPE:
+            self._send(400, b'{"reason": "bad content-type"}')
+        else:
+            post_id = parse_qs(body.decode('utf-8'))['post_id'][0]
+            self._send(201, json.dumps({'post_id': int(post_id)}).encode())
+
+    def _send(self, status, body):
+        # Header and body in one write, avoids delayed ACK stalls
+        self.wfile.write(
+            'HTTP/1.1 {0} X\r\nContent-Type: application/json\r\n'
+            'Content-Length: {1}\r\n\r\n'.format(status, len(body)).encode()
+            + body)
+
+    def log_message(self, *args):
+        pass
+
+
+def worker(client, number, calls):
+    """Do calls with a shared client, return a list of errors."""
+    errors = []
+    for call in range(calls):
+        page = (number + call) % len(StressHandler.pages) + 1
+        try:
+            if call % 4 == 3:
+                result = client.favorite_add(number * calls + call)
+                if result != {'post_id': number * calls + call}:
+                    errors.append("favorite_add: wrong result")
+                continue
+            posts = client.post_list(page=page, limit=20)
+        except Exception as e:
+            errors.append("{0}: {1}".format(type(e).__name__, e))
+            continue
+        if posts[0]['id'] != (page - 1) * 20 + 1:
+            errors.append("post_list: wrong page")
+        if 'page={0}&'.format(page) not in client.last_call['url'] + '&':
+            errors.append("last_call: record of another call")
+    return errors
+
+
+def main(argv=None):
+    """Run the stress test, exit with status 1 on errors."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--threads', type=int, default=64,
+                        help="number of worker threads (default: 64)")
+    parser.add_argument('--calls', type=int, default=100,
+                        help="calls per thread (default: 100)")
+    args = parser.parse_args(argv)
+
+    StressHandler.pages = dict((page, post_list_payload(20, page * 20 - 19))
+                               for page in range(1, 11))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StressHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    client = Danbooru(site_url='http://127.0.0.1:{0}'.format(
+        server.server_port), username='user', api_key='key',
+        pool=args.threads)
+    client.warmup()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as executor:
+        results = list(executor.map(worker, [client] * args.threads,
+                                    range(args.threads),
+                                    [args.calls] * args.threads))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    errors = [error for result in results for error in result]
+    total = args.threads * args.calls
+    stats = client.connection_stats()
+    print("{0} threads, {1} calls in {2:.2f}s ({3:.0f} calls/s), "
+          "{4} errors".format(args.threads, total, elapsed, total / elapsed,
+                              len(errors)))
+    print("{0} connections, {1:.1%} reused, {2} discarded".format(
+        stats['connections'], stats['reuse_ratio'], stats['discarded']))
+    for error in sorted(set(errors)):
+        print("  {0} x {1}".format(errors.count(error), error))
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
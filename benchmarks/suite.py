@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+
+"""benchmarks.suite
+
+End-to-end benchmark suite of typical crawls against a local fake Danbooru
+(pybooru.testing.FakeBooru). Each workload runs in its own process, which
+measures its client side CPU time and peak RSS; the server runs in the
+suite process.
+
+Workloads:
+    post_pages -- Deep posts pagination with id cursors, 200 per page.
+    tag_dump -- Full dump of tags kept in a list, 1000 per page.
+    post_show -- One post_show() call per post.
+    downloads -- Download the file of every post of posts pages.
+
+Metrics of each workload (best of the repetitions): requests/s,
+records/s, MiB/s of response bodies, client CPU microseconds per request
+and peak RSS of the client process.
+
+Usage:
+    python -m benchmarks.suite run [--scale X] [--output FILE]
+    python -m benchmarks.suite compare BASELINE [CURRENT] [--threshold %]
+
+'compare' runs the suite with the options of the baseline when CURRENT
+isn't given, and exits with status 1 when a metric regressed more than the
+threshold.
+"""
+
+# __future__ imports
+from __future__ import absolute_import, print_function
+
+# External imports
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# pybooru imports
+from pybooru import Danbooru, __version__
+from pybooru.testing import Dataset, FakeBooru
+
+# Version of the results format
+RESULTS_VERSION = 1
+
+# Records of each workload with scale 1
+WORKLOADS = {'post_pages': 40000, 'tag_dump': 100000, 'post_show': 2000,
+             'downloads': 1000}
+
+# Compared metrics, and whether higher values are better
+METRICS = (('requests_per_s', True), ('records_per_s', True),
+           ('mib_per_s', True), ('cpu_us_per_request', False),
+           ('peak_rss_mib', False))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def post_pages(client, size):
+    """Iterate over posts, return the number of posts."""
+    return sum(1 for _ in itertools.islice(client.iter_posts(limit=200),
+                                           size))
+
+
+def tag_dump(client, size):
+    """Keep all tags in a list, return the number of tags."""
+    tags = list(itertools.islice(client.iter_tags(limit=1000), size))
+    return len(tags)
+
+
+def post_show(client, size):
+    """Get posts one by one, return the number of posts."""
+    for post_id in range(1, size + 1):
+        client.post_show(post_id)
+    return size
+
+
+def downloads(client, size):
+    """Download the files of posts, return the number of files."""
+    files = 0
+    for post in itertools.islice(client.iter_posts(limit=200), size):
+        url = '{0}/data/{1}.{2}'.format(client.site_url, post['md5'],
+                                        post['file_ext'])
+        with client.client.get(url, stream=True) as response:
+            response.raise_for_status()
+            for _ in response.iter_content(65536):
+                pass
+        files += 1
+    return files
+
+
+def peak_rss_mib():
+    """Return peak RSS of the current process in MiB, None if unknown."""
+    # ru_maxrss of Linux keeps the peak of the parent across fork and exec
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return peak / (1048576.0 if sys.platform == 'darwin' else 1024.0)
+
+
+def worker(name, url, size):
+    """Run a workload in this process and print its measures as JSON."""
+    client = Danbooru(site_url=url)
+    base_rss = peak_rss_mib()
+    cpu, start = time.process_time(), time.perf_counter()
+    records = globals()[name](client, size)
+    seconds = time.perf_counter() - start
+    print(json.dumps({'records': records, 'seconds': seconds,
+                      'cpu': time.process_time() - cpu,
+                      'base_rss_mib': base_rss,
+                      'peak_rss_mib': peak_rss_mib()}))
+
+
+def run_workload(server, name, size):
+    """Run a workload in a new process.
+
+    Returns:
+        dict of measures.
+    """
+    server.reset_stats()
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.suite', 'worker', name,
+         server.url, str(size)], cwd=ROOT, stdout=subprocess.PIPE,
+        check=True, universal_newlines=True).stdout
+    measures = json.loads(output.strip().splitlines()[-1])
+    stats = server.stats()
+    seconds = measures['seconds']
+    requests = stats['requests']
+    return {'records': measures['records'],
+            'requests': requests,
+            'bytes': stats['bytes'],
+            'seconds': seconds,
+            'requests_per_s': requests / seconds,
+            'records_per_s': measures['records'] / seconds,
+            'mib_per_s': stats['bytes'] / 1048576.0 / seconds,
+            'cpu_us_per_request': measures['cpu'] / max(requests, 1) * 1e6,
+            'peak_rss_mib': measures['peak_rss_mib'],
+            'base_rss_mib': measures['base_rss_mib'],
+            'errors': sum(count for status, count in
+                          stats['statuses'].items() if status >= 400)}
+
+
+def best(runs):
+    """Return the best value of every measure of repeated runs."""
+    result = dict(runs[0])
+    for metric, higher in METRICS + (('seconds', False),):
+        values = [run[metric] for run in runs if run[metric] is not None]
+        if values:
+            result[metric] = max(values) if higher else min(values)
+    return result
+
+
+def run_suite(scale=1.0, repeat=3, workloads=None, progress=sys.stderr):
+    """Run the suite.
+
+    Parameters:
+        scale (float): Multiplier of the records of every workload.
+        repeat (int): Runs of every workload, the best is kept.
+        workloads (list): Names of the workloads (Default: all).
+        progress (file): Output of progress lines, or None.
+
+    Returns:
+        Results document (dict).
+    """
+    workloads = workloads or sorted(WORKLOADS)
+    sizes = dict((name, max(1, int(WORKLOADS[name] * scale)))
+                 for name in workloads)
+    dataset = Dataset(posts=max(1000000, sizes.get('post_pages', 0),
+                                sizes.get('downloads', 0)),
+                      tags=sizes.get('tag_dump', 1000))
+    results = {}
+    with FakeBooru(dataset=dataset) as server:
+        for name in workloads:
+            runs = []
+            for number in range(repeat):
+                runs.append(run_workload(server, name, sizes[name]))
+                if progress:
+                    print("{0} run {1}/{2}: {3:.2f}s".format(
+                        name, number + 1, repeat, runs[-1]['seconds']),
+                        file=progress)
+            results[name] = best(runs)
+    return {'suite': 'pybooru', 'version': RESULTS_VERSION,
+            'created': datetime.datetime.now().isoformat(),
+            'pybooru': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'options': {'scale': scale, 'repeat': repeat,
+                        'workloads': workloads},
+            'results': results}
+
+
+def print_results(document):
+    """Print results as a table."""
+    print("{0:<11} {1:>9} {2:>10} {3:>11} {4:>8} {5:>10} {6:>9}".format(
+        'workload', 'requests', 'req/s', 'records/s', 'MiB/s', 'cpu us/req',
+        'peak RSS'))
+    for name, result in sorted(document['results'].items()):
+        print("{0:<11} {1:>9} {2:>10.0f} {3:>11.0f} {4:>8.1f} {5:>10.0f} "
+              "{6:>9}".format(
+                  name, result['requests'], result['requests_per_s'],
+                  result['records_per_s'], result['mib_per_s'],
+                  result['cpu_us_per_request'],
+                  '{0:.1f}MiB'.format(result['peak_rss_mib'])
+                  if result['peak_rss_mib'] is not None else '-'))
+
+
+def compare(baseline, current, threshold):
+    """Print the changes of metrics and return the regressions.
+
+    Parameters:
+        baseline (dict): Results document of the baseline.
+        current (dict): Results document to compare.
+        threshold (float): Percentage of change allowed.
+
+    Returns:
+        List of (workload, metric) that regressed.
+    """
+    regressions = []
+    print("{0:<11} {1:<20} {2:>12} {3:>12} {4:>8}".format(
+        'workload', 'metric', 'baseline', 'current', 'change'))
+    for name in sorted(baseline['results']):
+        if name not in current['results']:
+            print("{0:<11} missing from current results".format(name))
+            continue
+        for metric, higher in METRICS:
+            old = baseline['results'][name].get(metric)
+            new = current['results'][name].get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if higher else change
+            flag = ''
+            if worse > threshold:
+                flag = '  REGRESSION'
+                regressions.append((name, metric))
+            print("{0:<11} {1:<20} {2:>12.1f} {3:>12.1f} {4:>+7.1f}%"
+                  "{5}".format(name, metric, old, new, change, flag))
+    return regressions
+
+
+def load(path):
+    """Load a results document."""
+    with open(path, encoding='utf-8') as results:
+        document = json.load(results)
+    if document.get('suite') != 'pybooru':
+        sys.exit("{0} isn't a results file of the suite".format(path))
+    return document
+
+
+def save(document, path):
+    """Write a results document."""
+    with open(path, 'w', encoding='utf-8') as results:
+        json.dump(document, results, indent=2, sort_keys=True)
+        results.write('\n')
+
+
+def main(argv=None):
+    """Run a command of the suite."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    run = commands.add_parser('run', help="run the suite")
+    run.add_argument('--scale', type=float, default=1.0,
+                     help="multiplier of records per workload (default: 1)")
+    run.add_argument('--repeat', type=int, default=3,
+                     help="runs of each workload, best is kept "
+                          "(default: 3)")
+    run.add_argument('--workload', action='append',
+                     choices=sorted(WORKLOADS),
+                     help="workload to run, can be repeated (default: all)")
+    run.add_argument('--output', help="write results as JSON to this file")
+
+    diff = commands.add_parser('compare',
+                               help="compare results with a baseline")
+    diff.add_argument('baseline', help="results file of the baseline")
+    diff.add_argument('current', nargs='?',
+                      help="results file (default: run the suite)")
+    diff.add_argument('--threshold', type=float, default=15.0,
+                      help="regression threshold in percent (default: 15)")
+    diff.add_argument('--output', help="write current results to this file")
+
+    work = commands.add_parser('worker', help="run one workload, used by "
+                                                "the suite")
+    work.add_argument('name', choices=sorted(WORKLOADS))
+    work.add_argument('url')
+    work.add_argument('size', type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == 'worker':
+        worker(args.name, args.url, args.size)
+    elif args.command == 'run':
+        document = run_suite(args.scale, args.repeat, args.workload)
+        print_results(document)
+        if args.output:
+            save(document, args.output)
+    else:
+        baseline = load(args.baseline)
+        if args.current:
+            current = load(args.current)
+        else:
+            options = baseline['options']
+            current = run_suite(options['scale'], options['repeat'],
+                                options['workloads'])
+            if args.output:
+                save(current, args.output)
+        if compare(baseline, current, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,7 @@ Pybooru modules:
     pybooru -- Main module of Pybooru, contains Pybooru class.
     moebooru -- Contains Moebooru main class.
     danbooru -- Contains Danbooru main class.
+    aio -- Contains asyncio Danbooru and Moebooru classes.
     api_moebooru -- Contains all Moebooru API functions.
     api_danbooru -- Contains all Danbooru API functions.
     exceptions -- Manages and builds Pybooru errors messages.
@@ -25,4 +26,6 @@ __author__ = "Daniel Luque <danielluque14[at]gmail[dot]com>"
 # pybooru imports
 from .moebooru import Moebooru
 from .danbooru import Danbooru
-from .exceptions import (PybooruError, PybooruAPIError, PybooruHTTPError)
+from .aio import (AsyncDanbooru, AsyncMoebooru)
+from .exceptions import (PybooruError, PybooruAPIError, PybooruHTTPError,
+                         PybooruDeadlineError)
@@ -0,0 +1,702 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.aio
+
+This module contains asyncio versions of the Danbooru and Moebooru classes.
+They expose the same API functions, authentication and URL building rules as
+the synchronous classes, but every API function returns a coroutine and all
+requests share a pooled aiohttp session.
+
+This module requires "aiohttp" package to work.
+
+Classes:
+    AsyncDanbooru -- Danbooru asyncio class.
+    AsyncMoebooru -- Moebooru asyncio class.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import asyncio
+import inspect
+import time
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+# pybooru imports
+from .danbooru import Danbooru
+from .moebooru import Moebooru
+from .pybooru import (_END_OF_PAGES, STREAM_CHUNK_SIZE)
+from .streaming import JSONArrayParser
+from .singleflight import AsyncSingleFlight
+from .cache import BaseCache
+from .exceptions import (PybooruError, PybooruHTTPError)
+from . import timeouts
+from . import timing
+
+
+def _timing_trace_config():
+    """Return an aiohttp TraceConfig that reports connections to timing."""
+    async def on_dns_start(session, context, params):
+        context.dns_start = time.perf_counter()
+
+    async def on_dns_end(session, context, params):
+        context.dns = time.perf_counter() - context.dns_start
+
+    async def on_connect_start(session, context, params):
+        context.connect_start = time.perf_counter()
+        context.dns = None
+
+    async def on_connect_end(session, context, params):
+        timing.add_connect(time.perf_counter() - context.connect_start,
+                           dns=context.dns)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_dns_resolvehost_start.append(on_dns_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_end)
+    trace_config.on_connection_create_start.append(on_connect_start)
+    trace_config.on_connection_create_end.append(on_connect_end)
+    return trace_config
+
+
+class _AsyncPybooru(object):
+    """Replace the blocking request path of _Pybooru with aiohttp.
+
+    Must be placed before a _Pybooru subclass in the bases of a class.
+    The aiohttp session is created on first request, inside the running
+    event loop, and it's closed by close() or when leaving
+    'async with' block.
+    """
+
+    # Class of request coalescing for 'single_flight' option
+    _single_flight_class = AsyncSingleFlight
+
+    def _init_async(self, limit, limit_per_host):
+        """Check aiohttp and store connector settings.
+
+        Parameters:
+            limit (int): Max number of simultaneous connections.
+            limit_per_host (int): Max number of simultaneous connections to
+                                  the same host (0 is unlimited).
+
+        Raises:
+            PybooruError: When aiohttp isn't installed.
+        """
+        if aiohttp is None:
+            raise PybooruError("Package 'aiohttp' is required to use "
+                               "asyncio classes.")
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+
+    def _create_client(self, headers):
+        """Store default headers, session is created on first request.
+
+        Raises:
+            PybooruError: When 'transport' is set, transports are requests
+                          adapters.
+        """
+        if self.transport is not None:
+            raise PybooruError("'transport' isn't supported by asyncio "
+                               "clients.")
+        self.headers = headers
+        return None
+
+    def _get_client(self):
+        """Return the aiohttp session, create it if it doesn't exist."""
+        if self.client is None or self.client.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host)
+            self.client = aiohttp.ClientSession(
+                connector=connector,
+                headers={'user-agent': self.headers['user-agent']},
+                trace_configs=[_timing_trace_config()])
+        return self.client
+
+    async def _sleep(self, seconds, url, name):
+        """Coroutine to wait before a request, in a span.
+
+        Parameters:
+            seconds (float): Time to wait.
+            url (str): Url of the request.
+            name (str): Span name.
+        """
+        timeouts.check_wait(seconds, url)
+        with self._trace(name, seconds=seconds):
+            await asyncio.sleep(seconds)
+
+    def warmup(self, connections=None):
+        """Not supported, connections are managed by aiohttp.
+
+        Raises:
+            PybooruError: Always.
+        """
+        raise PybooruError("warmup() isn't supported by asyncio classes, "
+                           "use 'limit' and 'limit_per_host' options.")
+
+    def connection_stats(self):
+        """Not supported, connections are managed by aiohttp.
+
+        Raises:
+            PybooruError: Always.
+        """
+        raise PybooruError("connection_stats() isn't supported by asyncio "
+                           "classes.")
+
+    async def close(self):
+        """Close the aiohttp session and all pooled connections."""
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def __aenter__(self):
+        """Enter async context manager."""
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Exit async context manager and close session."""
+        await self.close()
+
+    async def _paginate(self, fetch, params, limit=None, cursor=False,
+                        prefetch=0, deadline=None):
+        """Async generator that yields every record of a list API function.
+
+        Used by iter_* functions, so they return async iterators:
+
+            async for post in client.iter_posts(tags='computer'):
+                ...
+
+        Parameters:
+            fetch (function): API function that returns one page.
+            params (dict): Parameters for 'fetch'.
+            limit (int): Page size, sent as 'limit' parameter.
+            cursor (bool): Use id cursors ('page=b<id>') instead of page
+                           numbers (Danbooru only).
+            prefetch (int): Number of pages fetched ahead by a background
+                            task (Default: 0).
+            deadline (float): Seconds for the whole iteration, counted from
+                              the first record requested (Default: None).
+        """
+        deadline = timeouts.Deadline.from_value(deadline)
+        span = self._start_span('paginate', limit=limit, cursor=cursor,
+                                prefetch=prefetch)
+        if prefetch > 0:
+            pages = self._prefetch_pages(fetch, params, limit, cursor,
+                                         prefetch, deadline, span)
+        else:
+            pages = self._iter_pages(fetch, params, limit, cursor, deadline,
+                                     span)
+
+        try:
+            async for records in pages:
+                for record in records:
+                    yield record
+        except Exception as e:
+            span.fail(e)
+            raise
+        finally:
+            # Async generators aren't closed when they are dropped
+            await pages.aclose()
+            span.finish()
+
+    async def _iter_pages(self, fetch, params, limit, cursor, deadline=None,
+                          span=None):
+        """Async generator that yields every page of a list API function.
+
+        Parameters:
+            fetch (function): API function that returns one page.
+            params (dict): Parameters for 'fetch'.
+            limit (int): Page size.
+            cursor (bool): Use id cursors instead of page numbers.
+            deadline (Deadline): Deadline of the iteration.
+            span (Span): Span of the iteration, parent of page spans.
+        """
+        params = self._first_page(params, limit, cursor)
+        number = 1
+        while params is not None:
+            with timeouts.scope(deadline=deadline), self._trace(
+                    'page', span, page=number) as page_span:
+                records = await fetch(**params)
+                page_span.set(records=len(records))
+            yield records
+            params = self._next_page(params, records, limit, cursor)
+            number += 1
+
+    async def _prefetch_pages(self, fetch, params, limit, cursor, depth,
+                              deadline=None, span=None):
+        """Async generator that yields pages fetched by a background task.
+
+        Parameters:
+            fetch (function): API function that returns one page.
+            params (dict): Parameters for 'fetch'.
+            limit (int): Page size.
+            cursor (bool): Use id cursors instead of page numbers.
+            depth (int): Max number of pages waiting in the queue.
+            deadline (Deadline): Deadline of the iteration.
+            span (Span): Span of the iteration, parent of page spans.
+        """
+        pages = asyncio.Queue(maxsize=depth)
+        source = self._iter_pages(fetch, params, limit, cursor, deadline,
+                                  span)
+
+        async def worker():
+            try:
+                async for records in source:
+                    await pages.put((records, None))
+                await pages.put((_END_OF_PAGES, None))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await pages.put((None, e))
+
+        task = asyncio.ensure_future(worker())
+        try:
+            while True:
+                records, error = await pages.get()
+                if error is not None:
+                    raise error
+                if records is _END_OF_PAGES:
+                    return
+                yield records
+        finally:
+            task.cancel()
+            # Close the pages generator once the worker stopped using it,
+            # instead of leaving it to the garbage collector
+            await asyncio.wait([task])
+            await source.aclose()
+
+    @staticmethod
+    def _clean_fields(fields):
+        """Drop None values and stringify the rest, like requests does.
+
+        Parameters:
+            fields (dict): Query string or form parameters.
+        """
+        if not fields:
+            return None
+        return dict((key, str(value)) for key, value in fields.items()
+                    if value is not None)
+
+    def _build_request_args(self, request_args, method):
+        """Convert requests style arguments into aiohttp arguments.
+
+        Parameters:
+            request_args (dict): All requests parameters.
+            method (str): HTTP method.
+        """
+        kwargs = {}
+        if 'params' in request_args:
+            kwargs['params'] = self._clean_fields(request_args['params'])
+
+        if request_args.get('files'):
+            form = aiohttp.FormData()
+            for key, value in (self._clean_fields(
+                    request_args.get('data')) or {}).items():
+                form.add_field(key, value)
+            for key, value in request_args['files'].items():
+                form.add_field(key, value)
+            kwargs['data'] = form
+        elif 'data' in request_args:
+            kwargs['data'] = self._clean_fields(request_args['data'])
+
+        if 'auth' in request_args:
+            kwargs['auth'] = aiohttp.BasicAuth(*request_args['auth'])
+
+        if method == 'GET':
+            kwargs['headers'] = {'content-type': self.headers['content-type']}
+
+        if self.proxies:
+            scheme = self.site_url.split(':', 1)[0]
+            kwargs['proxy'] = self.proxies.get(scheme)
+        return kwargs
+
+    async def _send(self, url, api_call, request_args, method='GET',
+                    stream=False):
+        """Coroutine to request and returning JSON data.
+
+        GET requests are served from 'cache' when it's set, and identical
+        GET requests share one request when 'single_flight' is set.
+
+        Parameters:
+            url (str): Base url call.
+            api_call (str): API function to be called.
+            request_args (dict): All requests parameters.
+            method (str): (Default: GET) HTTP method 'GET' or 'POST'
+            stream (bool): Return an async generator that decodes records of
+                           the response while it's downloaded (not cached).
+
+        Raises:
+            PybooruHTTPError: HTTP Error.
+            PybooruError: When HTTP Timeout or can't decode JSON response.
+            PybooruDeadlineError: When the deadline of the timeouts scope
+                                  expires.
+            aiohttp.ClientConnectionError: When connection fails.
+        """
+        endpoint = self._get_endpoint(api_call)
+        if method != 'GET' or stream:
+            return (await self._fetch(url, api_call, endpoint, request_args,
+                                      method, stream=stream))[1]
+        if self.cache is None and self.single_flight is None:
+            return (await self._fetch_hedged(url, api_call, endpoint,
+                                             request_args))[1]
+
+        key = BaseCache.make_key(method, url, request_args.get('params'),
+                                 request_args.get('auth', (None,))[0])
+        if self.single_flight is None:
+            return await self._get_cached(url, api_call, endpoint,
+                                          request_args, key)
+
+        (data, record), shared = await self.single_flight.do(
+            key, self._get_recorded, url, api_call, endpoint, request_args,
+            key)
+        self.last_call = dict(record, shared=shared)
+        return data
+
+    async def _get_recorded(self, *args):
+        """Await _get_cached and return its data and a copy of 'last_call'.
+
+        The record is passed to tasks that share the request.
+        """
+        data = await self._get_cached(*args)
+        return data, dict(self.last_call)
+
+    async def _get_cached(self, url, api_call, endpoint, request_args, key):
+        """Coroutine to do a GET request, using 'cache' when it's set.
+
+        Parameters:
+            url (str): Base url call.
+            api_call (str): API function to be called.
+            endpoint (str): Endpoint name.
+            request_args (dict): All requests parameters.
+            key (tuple): Cache key of the request.
+        """
+        if self.cache is None:
+            return (await self._fetch_hedged(url, api_call, endpoint,
+                                             request_args))[1]
+
+        with self._trace('cache.lookup', endpoint=endpoint) as span:
+            entry = self.cache.lookup(key)
+            span.set(result='miss' if entry is None else
+                     'hit' if entry.fresh else 'stale')
+        if entry is not None and entry.fresh:
+            self.last_call = {
+                'API': api_call,
+                'url': url,
+                'status_code': 200,
+                'status': self._get_status(200),
+                'headers': {},
+                'retries': 0,
+                'bytes': 0,
+                'timings': None,
+                'cache': 'hit'
+                }
+            return entry.value
+
+        validators = entry.get_validators() if entry is not None else None
+        status_code, data, body, headers = await self._fetch_hedged(
+            url, api_call, endpoint, request_args, validators)
+        if status_code == 304:
+            self.cache.refresh(key, endpoint)
+            self.last_call['cache'] = 'revalidated'
+            return entry.value
+
+        self.last_call['cache'] = 'miss'
+        if status_code == 200:
+            self.cache.set(key, data, body, endpoint, headers.get('etag'),
+                           headers.get('last-modified'))
+        return data
+
+    async def _fetch_hedged(self, url, api_call, endpoint, request_args,
+                            validators=None):
+        """Coroutine to do a GET request, hedged when 'hedging' is set.
+
+        Parameters:
+            url (str): Base url call.
+            api_call (str): API function to be called.
+            endpoint (str): Endpoint name.
+            request_args (dict): All requests parameters.
+            validators (dict): Conditional request headers.
+        """
+        if self.hedging is None:
+            return await self._fetch(url, api_call, endpoint, request_args,
+                                     'GET', validators)
+
+        (result, record), hedged = await self.hedging.run_async(
+            endpoint, self._fetch_recorded, url, api_call, endpoint,
+            request_args, 'GET', validators)
+        self.last_call = dict(record, hedged=hedged)
+        return result
+
+    async def _fetch_recorded(self, *args):
+        """Await _fetch and return its result and a copy of 'last_call'."""
+        result = await self._fetch(*args)
+        return result, dict(self.last_call)
+
+    async def _fetch(self, url, api_call, endpoint, request_args, method,
+                     validators=None, stream=False):
+        """Coroutine to do a request and return status, data and body.
+
+        Every attempt waits for 'rate_limiter'. Failed requests are retried
+        according to 'retry' policy. 'last_call' has the 'timings' of the
+        last attempt (see pybooru.timing). Requests, retries and waits are
+        limited by 'timeout' and by the deadline of the current timeouts
+        scope.
+
+        Parameters:
+            url (str): Base url call.
+            api_call (str): API function to be called.
+            endpoint (str): Endpoint name.
+            request_args (dict): All requests parameters.
+            method (str): HTTP method.
+            validators (dict): Conditional request headers, a 304 response
+                               is accepted when they are set.
+            stream (bool): Decode the response while it's downloaded, data
+                           is an async generator and body is None.
+
+        Returns:
+            Tuple with status code, decoded data, response body and
+            response headers.
+        """
+        client = self._get_client()
+        kwargs = self._build_request_args(request_args, method)
+        if validators:
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, **validators)
+
+        retries = 0
+        while True:
+            if self.rate_limiter is not None:
+                wait = self.rate_limiter.reserve(method, endpoint)
+                if wait > 0:
+                    await self._sleep(wait, url, 'ratelimit.wait')
+
+            connect, read, total = timeouts.resolve(self.timeout, url)
+            kwargs['timeout'] = aiohttp.ClientTimeout(
+                total=total, sock_connect=connect, sock_read=read)
+            timings = timing.new_timings()
+            start = time.perf_counter()
+            try:
+                with self._trace('http', method=method, endpoint=endpoint,
+                                 attempt=retries) as span:
+                    with timing.collect(timings):
+                        response = await client.request(method, url,
+                                                        **kwargs)
+                    received = time.perf_counter()
+                    timings['ttfb'] = max(
+                        received - start - timings['connect'], 0.0)
+                    streamed = stream and response.status in (200, 201, 202)
+                    if not streamed:
+                        try:
+                            body = await response.read()
+                        finally:
+                            response.release()
+                        timings['download'] = time.perf_counter() - received
+                    span.set(status_code=response.status,
+                             bytes=None if streamed else len(body),
+                             reused=timings['reused'])
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
+                if self.retry is not None and self.retry.is_retry(method,
+                                                                  retries):
+                    await self._sleep(self.retry.get_backoff(retries), url,
+                                      'retry.wait')
+                    retries += 1
+                    continue
+                # Timeouts are capped to the deadline
+                timeouts.check_deadline(url)
+                if isinstance(e, asyncio.TimeoutError):
+                    raise PybooruError("Timeout! url: {0}".format(url))
+                raise
+
+            self.last_call = {
+                'API': api_call,
+                'url': str(response.url),
+                'status_code': response.status,
+                'status': self._get_status(response.status),
+                'headers': response.headers,
+                'retries': retries,
+                'bytes': None if streamed else len(body),
+                'timings': timings,
+                'cache': None
+                }
+
+            if streamed:
+                return (response.status, self._stream_records(response),
+                        None, response.headers)
+            elif response.status in (200, 201, 202):
+                start = time.perf_counter()
+                try:
+                    with self._profile(endpoint, 'decode'), self._trace(
+                            'decode', bytes=len(body)):
+                        data = self.codec.loads(body)
+                except ValueError as e:
+                    raise self._json_error(e)
+                timings['decode'] = time.perf_counter() - start
+                return response.status, data, body, response.headers
+            elif response.status == 204:
+                return response.status, True, body, response.headers
+            elif response.status == 304 and validators:
+                return response.status, None, body, response.headers
+
+            if self.retry is not None and self.retry.is_retry(
+                    method, retries, response.status):
+                retry_after = response.headers.get('retry-after')
+                delay = self.retry.get_backoff(retries, retry_after)
+                if delay is not None:
+                    await self._sleep(delay, url, 'retry.wait')
+                    retries += 1
+                    continue
+                # The server doesn't allow a retry before backoff_max
+                self.last_call['retry_after'] = (
+                    self.retry.parse_retry_after(retry_after))
+            raise PybooruHTTPError("In _request", response.status,
+                                   str(response.url))
+
+    def _models(self, model, data, enabled=True, only=None):
+        """Return a coroutine of records as model objects.
+
+        Parameters:
+            model (class): Model class (see pybooru.models).
+            data (coroutine): Coroutine of an API function.
+            enabled (bool): Convert the records, else data is returned.
+            only (str): Fields selected by the request (Default: None).
+        """
+        if not enabled:
+            return data
+        return self._await_models(model, data, only)
+
+    @staticmethod
+    async def _await_models(model, data, only=None):
+        """Await records and return them as model objects."""
+        data = await data
+        if isinstance(data, list):
+            return model.from_list(data, only)
+        if inspect.isasyncgen(data):
+            return (model(record, only) async for record in data)
+        return data
+
+    @staticmethod
+    async def _stream_records(response):
+        """Async generator that yields records of a response while downloading.
+
+        Parameters:
+            response (aiohttp.ClientResponse): Response with unread body.
+
+        Raises:
+            PybooruError: When can't decode JSON response.
+        """
+        parser = JSONArrayParser()
+        try:
+            async for chunk in response.content.iter_chunked(
+                    STREAM_CHUNK_SIZE):
+                for record in parser.feed(chunk):
+                    yield record
+            for record in parser.close():
+                yield record
+        except ValueError as e:
+            raise _AsyncPybooru._json_error(e)
+        finally:
+            response.release()
+
+
+class AsyncDanbooru(_AsyncPybooru, Danbooru):
+    """Danbooru asyncio class (inherits: Danbooru).
+
+    All API functions of Danbooru are available and return coroutines.
+    Use it as an async context manager, or call close() when done.
+
+    Example:
+        async with AsyncDanbooru('danbooru') as client:
+            posts = await client.post_list(tags='computer')
+
+    Attributes:
+        site_name (str): Get or set site name set.
+        site_url (str): Get or set the URL of Moebooru/Danbooru based site.
+        username (str): Return user name.
+        api_key (str): Return API key.
+        last_call (dict): Return last call.
+        limit (int): Max number of simultaneous connections.
+        limit_per_host (int): Max number of simultaneous connections to the
+                              same host.
+    """
+
+    def __init__(self, site_name='', site_url='', username='', api_key='',
+                 proxies=None, limit=100, limit_per_host=0, **kwargs):
+        """Initialize AsyncDanbooru.
+
+        Keyword arguments:
+            site_name (str): Get or set site name set.
+            site_url (str): Get or set the URL of Moebooru/Danbooru based site.
+            username (str): Your username of the site (Required only for
+                            functions that modify the content).
+            api_key (str): Your api key of the site (Required only for
+                           functions that modify the content).
+            proxies (dict): Your proxies to connect to the danbooru site
+                            (Required only when your network is blocked).
+            limit (int): Max number of simultaneous connections.
+            limit_per_host (int): Max number of simultaneous connections to
+                                  the same host (0 is unlimited).
+            **kwargs: Request options of _Pybooru: retry, rate_limiter,
+                      cache, codec, single_flight, timeout,
+                      hedging, middlewares, metrics,
+                      profiler, tracer.
+        """
+        self._init_async(limit, limit_per_host)
+        super(AsyncDanbooru, self).__init__(site_name, site_url, username,
+                                            api_key, proxies, **kwargs)
+
+
+class AsyncMoebooru(_AsyncPybooru, Moebooru):
+    """Moebooru asyncio class (inherits: Moebooru).
+
+    All API functions of Moebooru are available and return coroutines.
+    Use it as an async context manager, or call close() when done.
+
+    Example:
+        async with AsyncMoebooru('konachan') as client:
+            tags = await client.tag_list(order='date')
+
+    Attributes:
+        site_name (str): Get or set site name set.
+        site_url (str): Get or set the URL of Moebooru/Danbooru based site.
+        api_version (str): Version of Moebooru API.
+        username (str): Return user name.
+        password (str): Return password in plain text.
+        hash_string (str): Return hash_string of the site.
+        last_call (dict) last call.
+        limit (int): Max number of simultaneous connections.
+        limit_per_host (int): Max number of simultaneous connections to the
+                              same host.
+    """
+
+    def __init__(self, site_name='', site_url='', username='', password='',
+                 hash_string='', api_version='1.13.0+update.3', proxies=None,
+                 limit=100, limit_per_host=0, **kwargs):
+        """Initialize AsyncMoebooru.
+
+        Keyword arguments:
+            site_name (str): Get or set site name set.
+            site_url (str): Get or set the URL of Moebooru/Danbooru based site.
+            api_version (str): Version of Moebooru API.
+            hash_string (str): String that is hashed (required to login).
+                               (See the API documentation of the site for more
+                               information).
+            username (str): Your username of the site (Required only for
+                             functions that modify the content).
+            password (str): Your user password in plain text (Required only
+                            for functions that modify the content).
+            proxies (dict): Your proxies to connect to the danbooru site
+                            (Required only when your network is blocked).
+            limit (int): Max number of simultaneous connections.
+            limit_per_host (int): Max number of simultaneous connections to
+                                  the same host (0 is unlimited).
+            **kwargs: Request options of _Pybooru: retry, rate_limiter,
+                      cache, codec, single_flight, timeout,
+                      hedging, middlewares, metrics,
+                      profiler, tracer.
+        """
+        self._init_async(limit, limit_per_host)
+        super(AsyncMoebooru, self).__init__(site_name, site_url, username,
+                                            password, hash_string,
+                                            api_version, proxies, **kwargs)
@@ -15,6 +15,7 @@ import warnings
 
 # pybooru imports
 from .exceptions import PybooruAPIError
+from .models import (Post, Tag, Pool, Comment, User)
 
 
 class DanbooruApi_Mixin(object):
@@ -24,7 +25,7 @@ class DanbooruApi_Mixin(object):
     * Doc: https://danbooru.donmai.us/wiki_pages/43568
     """
 
-    def post_list(self, **params):
+    def post_list(self, stream=False, models=False, only=None, **params):
         """Get a list of posts.
 
         Parameters:
@@ -39,16 +40,59 @@ class DanbooruApi_Mixin(object):
             raw (bool): When this parameter is set the tags parameter will not
                         be parsed for aliased tags, metatags or multiple tags,
                         and will instead be parsed as a single literal tag.
-        """
-        return self._get('posts.json', params)
-
-    def post_show(self, post_id):
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
+            models (bool): Return Post objects instead of dicts, see
+                           pybooru.models (Default: False).
+            only (str or list): Fields of the records, the others aren't
+                                sent. Comma separated names with nested
+                                fields in brackets ('id,media_asset[id]'),
+                                or a list where dicts select nested fields
+                                (['id', {'media_asset': ['id']}])
+                                (Default: None, all fields).
+        """
+        params['only'] = only = self._only(only)
+        return self._models(Post, self._get('posts.json', params,
+                                            stream=stream), models, only)
+
+    def iter_posts(self, limit=100, prefetch=0, deadline=None, **params):
+        """Iterate over all posts of a search, one page at a time.
+
+        Pages are requested with id cursors ('page=b<id>'), so deep pages
+        stay fast and don't drift when new posts are uploaded. Order
+        meta-tags are not supported.
+
+        Parameters:
+            limit (int): Posts per page, no more than 200.
+            prefetch (int): Number of pages to fetch ahead in a background
+                            thread (Default: 0).
+            deadline (float): Seconds for the whole iteration, requests
+                              fail with PybooruDeadlineError after it
+                              (Default: None).
+            **params: Same parameters as post_list(). 'page' can be an id
+                      cursor to start from (e.g. 'b1000'). 'id' is added to
+                      'only' fields, cursors need it.
+
+        Yields:
+            Each post (dict, or Post with models=True).
+        """
+        return self._paginate(self.post_list, params, limit, cursor=True,
+                              prefetch=prefetch, deadline=deadline)
+
+    def post_show(self, post_id, only=None):
         """Get a post.
 
         Parameters:
             post_id (int): Where post_id is the post id.
+            only (str or list): Fields of the records, the others aren't
+                                sent. Comma separated names with nested
+                                fields in brackets ('id,media_asset[id]'),
+                                or a list where dicts select nested fields
+                                (['id', {'media_asset': ['id']}])
+                                (Default: None, all fields).
         """
-        return self._get('posts/{0}.json'.format(post_id))
+        return self._get('posts/{0}.json'.format(post_id),
+                         {'only': self._only(only)})
 
     def post_update(self, post_id, tag_string=None, rating=None, source=None,
                     parent_id=None, has_embedded_notes=None,
@@ -306,7 +350,8 @@ class DanbooruApi_Mixin(object):
 
     def comment_list(self, group_by, limit=None, page=None, body_matches=None,
                      post_id=None, post_tags_match=None, creator_name=None,
-                     creator_id=None, is_deleted=None):
+                     creator_id=None, is_deleted=None, stream=False,
+                     models=False):
         """Return a list of comments.
 
         Parameters:
@@ -322,6 +367,10 @@ class DanbooruApi_Mixin(object):
             creator_name (str): The name of the creator (exact match).
             creator_id (int): The user id of the creator.
             is_deleted (bool): Can be: True, False.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
+            models (bool): Return Comment objects instead of dicts, see
+                           pybooru.models (Default: False).
 
         Raises:
             PybooruAPIError: When 'group_by' is invalid.
@@ -337,7 +386,31 @@ class DanbooruApi_Mixin(object):
             'search[creator_id]': creator_id,
             'search[is_deleted]': is_deleted
             }
-        return self._get('comments.json', params)
+        return self._models(Comment, self._get('comments.json', params,
+                                               stream=stream), models)
+
+    def iter_comments(self, group_by='comment', limit=100, prefetch=0,
+                      deadline=None, **params):
+        """Iterate over all comments of a search, one page at a time.
+
+        Pages are requested with id cursors ('page=b<id>').
+
+        Parameters:
+            group_by: Can be 'comment', 'post'.
+            limit (int): Comments per page.
+            prefetch (int): Number of pages to fetch ahead in a background
+                            thread (Default: 0).
+            deadline (float): Seconds for the whole iteration, requests
+                              fail with PybooruDeadlineError after it
+                              (Default: None).
+            **params: Same parameters as comment_list().
+
+        Yields:
+            Each comment (dict), or each post when group_by is 'post'.
+        """
+        params['group_by'] = group_by
+        return self._paginate(self.comment_list, params, limit, cursor=True,
+                              prefetch=prefetch, deadline=deadline)
 
     def comment_create(self, post_id, body, do_not_bump_post=None):
         """Action to lets you create a comment (Requires login).
@@ -497,7 +570,7 @@ class DanbooruApi_Mixin(object):
 
     def artist_list(self, query=None, artist_id=None, creator_name=None,
                     creator_id=None, is_active=None, is_banned=None,
-                    empty_only=None, order=None):
+                    empty_only=None, order=None, stream=False):
         """Get an artist of a list of artists.
 
         Parameters:
@@ -525,6 +598,8 @@ class DanbooruApi_Mixin(object):
             empty_only (True): Search for artists that have 0 posts. Can be:
                                true
             order (str): Can be: name, updated_at.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
         """
         params = {
             'search[name]': query,
@@ -536,7 +611,7 @@ class DanbooruApi_Mixin(object):
             'search[empty_only]': empty_only,
             'search[order]': order
             }
-        return self._get('artists.json', params)
+        return self._get('artists.json', params, stream=stream)
 
     def artist_show(self, artist_id):
         """Return a specific artist.
@@ -721,7 +796,8 @@ class DanbooruApi_Mixin(object):
         return self._get('artist_commentary_versions.json', params)
 
     def note_list(self, body_matches=None, post_id=None, post_tags_match=None,
-                  creator_name=None, creator_id=None, is_active=None):
+                  creator_name=None, creator_id=None, is_active=None,
+                  stream=False):
         """Return list of notes.
 
         Parameters:
@@ -731,6 +807,8 @@ class DanbooruApi_Mixin(object):
             creator_name (str): The creator's name. Exact match.
             creator_id (int): The creator's user id.
             is_active (bool): Can be: True, False.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
         """
         params = {
             'search[body_matches]': body_matches,
@@ -740,7 +818,7 @@ class DanbooruApi_Mixin(object):
             'search[creator_id]': creator_id,
             'search[is_active]': is_active
             }
-        return self._get('notes.json', params)
+        return self._get('notes.json', params, stream=stream)
 
     def note_show(self, note_id):
         """Get a specific note.
@@ -832,7 +910,8 @@ class DanbooruApi_Mixin(object):
         return self._get('note_versions.json', params)
 
     def user_list(self, name=None, name_matches=None, min_level=None,
-                  max_level=None, level=None, user_id=None, order=None):
+                  max_level=None, level=None, user_id=None, order=None,
+                  stream=False, models=False):
         """Function to get a list of users or a specific user.
 
         Levels:
@@ -851,6 +930,10 @@ class DanbooruApi_Mixin(object):
             user_id (int): The user id.
             order (str): Can be: 'name', 'post_upload_count', 'note_count',
                          'post_update_count', 'date'.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
+            models (bool): Return User objects instead of dicts, see
+                           pybooru.models (Default: False).
         """
         params = {
             'search[name]': name,
@@ -861,7 +944,8 @@ class DanbooruApi_Mixin(object):
             'search[id]': user_id,
             'search[order]': order
             }
-        return self._get('users.json', params)
+        return self._models(User, self._get('users.json', params,
+                                            stream=stream), models)
 
     def user_show(self, user_id):
         """Get a specific user.
@@ -873,7 +957,8 @@ class DanbooruApi_Mixin(object):
 
     def pool_list(self, name_matches=None, pool_ids=None, category=None,
                   description_matches=None, creator_name=None, creator_id=None,
-                  is_deleted=None, is_active=None, order=None):
+                  is_deleted=None, is_active=None, order=None, limit=None,
+                  page=None, stream=False, models=False, only=None):
         """Get a list of pools.
 
         Parameters:
@@ -887,6 +972,18 @@ class DanbooruApi_Mixin(object):
             is_deleted (bool): Can be: True, False.
             order (str): Can be: name, created_at, post_count, date.
             category (str): Can be: series, collection.
+            limit (int): How many pools you want to retrieve.
+            page (int): The page number.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
+            models (bool): Return Pool objects instead of dicts, see
+                           pybooru.models (Default: False).
+            only (str or list): Fields of the records, the others aren't
+                                sent. Comma separated names with nested
+                                fields in brackets ('id,media_asset[id]'),
+                                or a list where dicts select nested fields
+                                (['id', {'media_asset': ['id']}])
+                                (Default: None, all fields).
         """
         params = {
             'search[name_matches]': name_matches,
@@ -897,9 +994,36 @@ class DanbooruApi_Mixin(object):
             'search[is_active]': is_active,
             'search[is_deleted]': is_deleted,
             'search[order]': order,
-            'search[category]': category
+            'search[category]': category,
+            'limit': limit,
+            'page': page,
+            'only': self._only(only)
             }
-        return self._get('pools.json', params)
+        return self._models(Pool, self._get('pools.json', params,
+                                            stream=stream), models,
+                            params['only'])
+
+    def iter_pools(self, limit=100, prefetch=0, deadline=None, **params):
+        """Iterate over all pools of a search, one page at a time.
+
+        Pages are requested with id cursors ('page=b<id>'), 'order' is
+        ignored.
+
+        Parameters:
+            limit (int): Pools per page.
+            prefetch (int): Number of pages to fetch ahead in a background
+                            thread (Default: 0).
+            deadline (float): Seconds for the whole iteration, requests
+                              fail with PybooruDeadlineError after it
+                              (Default: None).
+            **params: Same parameters as pool_list(), 'id' is added to
+                      'only' fields.
+
+        Yields:
+            Each pool (dict, or Pool with models=True).
+        """
+        return self._paginate(self.pool_list, params, limit, cursor=True,
+                              prefetch=prefetch, deadline=deadline)
 
     def pool_show(self, pool_id):
         """Get a specific pool.
@@ -990,7 +1114,9 @@ class DanbooruApi_Mixin(object):
         return self._get('pool_versions.json', params)
 
     def tag_list(self, name_matches=None, name=None, category=None,
-                 hide_empty=None, has_wiki=None, has_artist=None, order=None, limit=1000, page=1):
+                 hide_empty=None, has_wiki=None, has_artist=None,
+                 order=None, limit=1000, page=1, stream=False,
+                 models=False, only=None):
         """Get a list of tags.
 
         Parameters:
@@ -1008,6 +1134,16 @@ class DanbooruApi_Mixin(object):
             order (str): Can be: name, date, count.
             limit (int): Limit of one page, no more than 1000.
             page (int): Page.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
+            models (bool): Return Tag objects instead of dicts, see
+                           pybooru.models (Default: False).
+            only (str or list): Fields of the records, the others aren't
+                                sent. Comma separated names with nested
+                                fields in brackets ('id,media_asset[id]'),
+                                or a list where dicts select nested fields
+                                (['id', {'media_asset': ['id']}])
+                                (Default: None, all fields).
         """
         if limit > 1000:
             warnings.warn(UserWarning(f'Limit over 1000 is not supported by API, but {limit!r} found.'), stacklevel=2)
@@ -1021,8 +1157,33 @@ class DanbooruApi_Mixin(object):
             'search[order]': order,
             'limit': str(limit),
             'page': str(page),
+            'only': self._only(only)
             }
-        return self._get('tags.json', params)
+        return self._models(Tag, self._get('tags.json', params,
+                                           stream=stream), models,
+                            params['only'])
+
+    def iter_tags(self, limit=1000, prefetch=0, deadline=None, **params):
+        """Iterate over all tags of a search, one page at a time.
+
+        Pages are requested with id cursors ('page=b<id>'), 'order' is
+        ignored.
+
+        Parameters:
+            limit (int): Tags per page, no more than 1000.
+            prefetch (int): Number of pages to fetch ahead in a background
+                            thread (Default: 0).
+            deadline (float): Seconds for the whole iteration, requests
+                              fail with PybooruDeadlineError after it
+                              (Default: None).
+            **params: Same parameters as tag_list(), 'id' is added to
+                      'only' fields.
+
+        Yields:
+            Each tag (dict, or Tag with models=True).
+        """
+        return self._paginate(self.tag_list, params, limit, cursor=True,
+                              prefetch=prefetch, deadline=deadline)
 
     def tag_show(self, tag_id):
         """Show a specific tag.
@@ -1090,7 +1251,7 @@ class DanbooruApi_Mixin(object):
 
     def wiki_list(self, title=None, creator_id=None, body_matches=None,
                   other_names_match=None, creator_name=None, hide_deleted=None,
-                  other_names_present=None, order=None):
+                  other_names_present=None, order=None, stream=False):
         """Function to retrieves a list of every wiki page.
 
         Parameters:
@@ -1102,6 +1263,8 @@ class DanbooruApi_Mixin(object):
             hide_deleted (str): Can be: yes, no.
             other_names_present (str): Can be: yes, no.
             order (str): Can be: date, title.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
         """
         params = {
             'search[title]': title,
@@ -1113,7 +1276,7 @@ class DanbooruApi_Mixin(object):
             'search[other_names_present]': other_names_present,
             'search[order]': order
             }
-        return self._get('wiki_pages.json', params)
+        return self._get('wiki_pages.json', params, stream=stream)
 
     def wiki_show(self, wiki_page_id):
         """Retrieve a specific page of the wiki.
@@ -1275,7 +1438,8 @@ class DanbooruApi_Mixin(object):
 
     def forum_post_list(self, creator_id=None, creator_name=None,
                         topic_id=None, topic_title_matches=None,
-                        topic_category_id=None, body_matches=None):
+                        topic_category_id=None, body_matches=None, limit=None,
+                        page=None, stream=False):
         """Return a list of forum posts.
 
         Parameters:
@@ -1286,6 +1450,10 @@ class DanbooruApi_Mixin(object):
             topic_category_id (int): Can be: 0, 1, 2 (General, Tags, Bugs &
                                      Features respectively).
             body_matches (str): Can be part of the post content.
+            limit (int): How many forum posts you want to retrieve.
+            page (int): The page number.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
         """
         params = {
             'search[creator_id]': creator_id,
@@ -1293,9 +1461,33 @@ class DanbooruApi_Mixin(object):
             'search[topic_id]': topic_id,
             'search[topic_title_matches]': topic_title_matches,
             'search[topic_category_id]': topic_category_id,
-            'search[body_matches]': body_matches
+            'search[body_matches]': body_matches,
+            'limit': limit,
+            'page': page
             }
-        return self._get('forum_posts.json', params)
+        return self._get('forum_posts.json', params, stream=stream)
+
+    def iter_forum_posts(self, limit=100, prefetch=0, deadline=None,
+                         **params):
+        """Iterate over all forum posts of a search, one page at a time.
+
+        Pages are requested with id cursors ('page=b<id>').
+
+        Parameters:
+            limit (int): Forum posts per page.
+            prefetch (int): Number of pages to fetch ahead in a background
+                            thread (Default: 0).
+            deadline (float): Seconds for the whole iteration, requests
+                              fail with PybooruDeadlineError after it
+                              (Default: None).
+            **params: Same parameters as forum_post_list().
+
+        Yields:
+            Each forum post (dict).
+        """
+        return self._paginate(self.forum_post_list, params, limit,
+                              cursor=True, prefetch=prefetch,
+                              deadline=deadline)
 
     def forum_post_create(self, topic_id, body):
         """Create a forum post (Requires login).
@@ -13,6 +13,7 @@ from __future__ import absolute_import
 
 # pybooru imports
 from .exceptions import PybooruAPIError
+from .models import (Post, Tag, Pool)
 
 
 class MoebooruApi_Mixin(object):
@@ -22,7 +23,7 @@ class MoebooruApi_Mixin(object):
     * doc: https://yande.re/help/api or https://konachan.com/help/api
     """
 
-    def post_list(self, **params):
+    def post_list(self, stream=False, models=False, **params):
         """Get a list of posts.
 
         Parameters:
@@ -32,8 +33,31 @@ class MoebooruApi_Mixin(object):
             limit (int): How many posts you want to retrieve. There is a limit
                          of 100:param  posts per request.
             page (int): The page number.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
+            models (bool): Return Post objects instead of dicts, see
+                           pybooru.models (Default: False).
         """
-        return self._get('post', params)
+        return self._models(Post, self._get('post', params,
+                                            stream=stream), models)
+
+    def iter_posts(self, limit=100, prefetch=0, deadline=None, **params):
+        """Iterate over all posts of a search, one page at a time.
+
+        Parameters:
+            limit (int): Posts per page, no more than 100.
+            prefetch (int): Number of pages to fetch ahead in a background
+                            thread (Default: 0).
+            deadline (float): Seconds for the whole iteration, requests
+                              fail with PybooruDeadlineError after it
+                              (Default: None).
+            **params: Same parameters as post_list().
+
+        Yields:
+            Each post (dict, or Post with models=True).
+        """
+        return self._paginate(self.post_list, params, limit, prefetch=prefetch,
+                              deadline=deadline)
 
     def post_create(self, tags, file_=None, rating=None, source=None,
                     rating_locked=None, note_locked=None, parent_id=None,
@@ -154,7 +178,7 @@ class MoebooruApi_Mixin(object):
         else:
             raise PybooruAPIError("Value of 'score' only can be 0, 1, 2 or 3.")
 
-    def tag_list(self, **params):
+    def tag_list(self, stream=False, models=False, **params):
         """Get a list of tags.
 
         Parameters:
@@ -166,8 +190,31 @@ class MoebooruApi_Mixin(object):
             order (str): Can be 'date', 'name' or 'count'.
             after_id (int): Return all tags that have an id number greater
                             than this.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
+            models (bool): Return Tag objects instead of dicts, see
+                           pybooru.models (Default: False).
+        """
+        return self._models(Tag, self._get('tag', params,
+                                           stream=stream), models)
+
+    def iter_tags(self, limit=1000, prefetch=0, deadline=None, **params):
+        """Iterate over all tags of a search, one page at a time.
+
+        Parameters:
+            limit (int): Tags per page, must be greater than 0.
+            prefetch (int): Number of pages to fetch ahead in a background
+                            thread (Default: 0).
+            deadline (float): Seconds for the whole iteration, requests
+                              fail with PybooruDeadlineError after it
+                              (Default: None).
+            **params: Same parameters as tag_list().
+
+        Yields:
+            Each tag (dict, or Tag with models=True).
         """
-        return self._get('tag', params)
+        return self._paginate(self.tag_list, params, limit, prefetch=prefetch,
+                              deadline=deadline)
 
     def tag_update(self, name=None, tag_type=None, is_ambiguous=None):
         """Action to lets you update tag (Requires login) (UNTESTED).
@@ -199,15 +246,34 @@ class MoebooruApi_Mixin(object):
         """
         return self._get('tag/related', params)
 
-    def artist_list(self, **params):
+    def artist_list(self, stream=False, **params):
         """Get a list of artists.
 
         Parameters:
             name (str): The name (or a fragment of the name) of the artist.
             order (str): Can be date or name.
             page (int): The page number.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
         """
-        return self._get('artist', params)
+        return self._get('artist', params, stream=stream)
+
+    def iter_artists(self, prefetch=0, deadline=None, **params):
+        """Iterate over all artists of a search, one page at a time.
+
+        Parameters:
+            prefetch (int): Number of pages to fetch ahead in a background
+                            thread (Default: 0).
+            deadline (float): Seconds for the whole iteration, requests
+                              fail with PybooruDeadlineError after it
+                              (Default: None).
+            **params: Same parameters as artist_list().
+
+        Yields:
+            Each artist (dict).
+        """
+        return self._paginate(self.artist_list, params, prefetch=prefetch,
+                              deadline=deadline)
 
     def artist_create(self, name, urls=None, alias=None, group=None):
         """Function to create an artist (Requires login) (UNTESTED).
@@ -295,7 +361,7 @@ class MoebooruApi_Mixin(object):
         """
         return self._get('comment/destroy', {'id': comment_id}, 'DELETE')
 
-    def wiki_list(self, **params):
+    def wiki_list(self, stream=False, **params):
         """Function to retrieves a list of every wiki page.
 
         Parameters:
@@ -303,8 +369,10 @@ class MoebooruApi_Mixin(object):
             order (str): Can be: title, date (Default: title).
             limit (int): The number of pages to retrieve (Default: 100).
             page (int): The page number.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
         """
-        return self._get('wiki', params)
+        return self._get('wiki', params, stream=stream)
 
     def wiki_create(self, title, body):
         """Action to lets you create a wiki page (Requires login) (UNTESTED).
@@ -385,13 +453,15 @@ class MoebooruApi_Mixin(object):
         """
         return self._get('wiki/history', {'title': title})
 
-    def note_list(self, **params):
+    def note_list(self, stream=False, **params):
         """Get note list.
 
         Parameters:
             post_id (int): The post id number to retrieve notes for.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
         """
-        return self._get('note', params)
+        return self._get('note', params, stream=stream)
 
     def note_search(self, query):
         """Search specific note.
@@ -462,7 +532,7 @@ class MoebooruApi_Mixin(object):
         """
         return self._get('user', params)
 
-    def forum_list(self, **params):
+    def forum_list(self, stream=False, **params):
         """Function to get forum posts.
 
         If you don't specify any parameters you'll _get a listing of all users.
@@ -470,10 +540,12 @@ class MoebooruApi_Mixin(object):
         Parameters:
             parent_id (int): The parent ID number. You'll return all the
                              responses to that forum post.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
         """
-        return self._get('forum', params)
+        return self._get('forum', params, stream=stream)
 
-    def pool_list(self, **params):
+    def pool_list(self, stream=False, models=False, **params):
         """Function to get pools.
 
         If you don't specify any parameters you'll get a list of all pools.
@@ -481,8 +553,30 @@ class MoebooruApi_Mixin(object):
         Parameters:
             query (str): The title.
             page (int): The page number.
+            stream (bool): Yield records while the response is downloaded,
+                           uses constant memory (Default: False).
+            models (bool): Return Pool objects instead of dicts, see
+                           pybooru.models (Default: False).
+        """
+        return self._models(Pool, self._get('pool', params,
+                                            stream=stream), models)
+
+    def iter_pools(self, prefetch=0, deadline=None, **params):
+        """Iterate over all pools of a search, one page at a time.
+
+        Parameters:
+            prefetch (int): Number of pages to fetch ahead in a background
+                            thread (Default: 0).
+            deadline (float): Seconds for the whole iteration, requests
+                              fail with PybooruDeadlineError after it
+                              (Default: None).
+            **params: Same parameters as pool_list().
+
+        Yields:
+            Each pool (dict, or Pool with models=True).
         """
-        return self._get('pool', params)
+        return self._paginate(self.pool_list, params, prefetch=prefetch,
+                              deadline=deadline)
 
     def pool_posts(self, **params):
         """Function to get pools posts.
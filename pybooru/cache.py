@@ -0,0 +1,504 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.cache
+
+This module contains response caches for GET requests of Pybooru.
+
+Expired entries that have an 'ETag' or 'Last-Modified' header are kept and
+revalidated with a conditional request; a '304 Not Modified' response
+refreshes them without downloading the body again.
+
+Cached responses are shared between callers, don't modify them.
+
+Classes:
+    CacheEntry -- A cached response.
+    MemoryCache -- Thread safe in-memory cache with TTL and LRU eviction.
+    SQLiteCache -- Persistent cache stored in a sqlite database.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# pybooru imports
+from .codec import get_codec
+
+
+class CacheEntry(object):
+    """A cached response.
+
+    Attributes:
+        value (object): Decoded response.
+        size (int): Size of the response body in bytes.
+        expires (float): Time when the entry expires (cache clock).
+        etag (str): 'ETag' header of the response.
+        last_modified (str): 'Last-Modified' header of the response.
+        fresh (bool): Entry hasn't expired.
+    """
+
+    __slots__ = ('value', 'size', 'expires', 'etag', 'last_modified',
+                 'fresh')
+
+    def __init__(self, value, size, expires, etag=None, last_modified=None,
+                 fresh=True):
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh = fresh
+
+    def get_validators(self):
+        """Return headers for a conditional request (dict)."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class BaseCache(object):
+    """Base class of Pybooru caches.
+
+    Endpoints are named like Pybooru API calls with ids replaced by '{id}',
+    e.g. 'posts/{id}.json', 'counts/posts.json' or 'post'.
+
+    Attributes:
+        ttl (float): Default time to live of entries in seconds.
+        ttls (dict): Time to live per endpoint, 0 disables the cache for
+                     that endpoint.
+        max_entries (int): Max number of entries.
+        max_bytes (int): Max size of cached response bodies.
+        hits (int): Number of fresh entries returned.
+        misses (int): Number of lookups without a fresh entry.
+        revalidations (int): Number of entries refreshed by a 304 response.
+        evictions (int): Number of entries evicted to make room.
+    """
+
+    def __init__(self, ttl=60, ttls=None, max_entries=1024,
+                 max_bytes=64 * 1024 * 1024):
+        """Initialize cache.
+
+        Keyword arguments:
+            ttl (float): Default time to live in seconds (Default: 60).
+            ttls (dict): Time to live per endpoint.
+            max_entries (int): Max number of entries (Default: 1024).
+            max_bytes (int): Max size of cached response bodies (Default:
+                             64 MiB).
+        """
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_value(value):
+        """Build a cache from a constructor argument.
+
+        Parameters:
+            value (cache, bool or None): A cache object, True for a
+                                         MemoryCache with default options,
+                                         or None/False to disable cache.
+
+        Returns:
+            Cache object or None.
+        """
+        if value is None or value is False:
+            return None
+        if value is True:
+            return MemoryCache()
+        return value
+
+    @staticmethod
+    def make_key(method, url, params=None, username=None):
+        """Build the cache key of a request.
+
+        Parameters are normalized: None values are dropped (like requests
+        does), values are converted to strings and sorted by name.
+
+        Parameters:
+            method (str): HTTP method.
+            url (str): Request url without query string.
+            params (dict): Query string parameters.
+            username (str): Authenticated user, results may depend on it.
+        """
+        if params:
+            params = tuple(sorted((key, str(value)) for key, value in
+                                  params.items() if value is not None))
+        return (method, url, params or (), username)
+
+    def get_ttl(self, endpoint):
+        """Return time to live of an endpoint."""
+        return self.ttls.get(endpoint, self.ttl)
+
+    def _count(self, name):
+        """Increase a statistics counter."""
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key):
+        """Return a cached value, or None if it isn't cached or expired.
+
+        Parameters:
+            key (tuple): Cache key.
+        """
+        entry = self.lookup(key)
+        return entry.value if entry is not None and entry.fresh else None
+
+    def lookup(self, key):
+        """Return the entry of a key, fresh or expired, or None.
+
+        Expired entries are only returned when they can be revalidated.
+
+        Parameters:
+            key (tuple): Cache key.
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, body, endpoint=None, etag=None,
+            last_modified=None):
+        """Add a response to the cache.
+
+        Parameters:
+            key (tuple): Cache key.
+            value (object): Decoded response.
+            body (bytes): Response body.
+            endpoint (str): Endpoint name, for its time to live.
+            etag (str): 'ETag' header of the response.
+            last_modified (str): 'Last-Modified' header of the response.
+        """
+        raise NotImplementedError
+
+    def refresh(self, key, endpoint=None):
+        """Renew the time to live of an entry after a 304 response.
+
+        Parameters:
+            key (tuple): Cache key.
+            endpoint (str): Endpoint name, for its time to live.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove all entries."""
+        raise NotImplementedError
+
+    def stats(self):
+        """Return cache statistics.
+
+        Returns:
+            dict with hits, misses, revalidations and evictions.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'revalidations': self.revalidations,
+                    'evictions': self.evictions}
+
+
+class MemoryCache(BaseCache):
+    """Thread safe in-memory cache with TTL and LRU eviction.
+
+    Entries expire after the TTL of their endpoint. When the cache has more
+    than 'max_entries' entries or 'max_bytes' bytes (size of the response
+    bodies), least recently used entries are evicted.
+    """
+
+    def __init__(self, ttl=60, ttls=None, max_entries=1024,
+                 max_bytes=64 * 1024 * 1024):
+        """Initialize MemoryCache.
+
+        Keyword arguments:
+            ttl (float): Default time to live in seconds (Default: 60).
+            ttls (dict): Time to live per endpoint.
+            max_entries (int): Max number of entries (Default: 1024).
+            max_bytes (int): Max size of cached response bodies (Default:
+                             64 MiB).
+        """
+        super(MemoryCache, self).__init__(ttl, ttls, max_entries, max_bytes)
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, key):
+        """Return the entry of a key, fresh or expired, or None.
+
+        Parameters:
+            key (tuple): Cache key.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.fresh = entry.expires > time.monotonic()
+                if entry.fresh or entry.etag or entry.last_modified:
+                    self._entries.move_to_end(key)
+                else:
+                    self._remove(key)
+                    entry = None
+            if entry is not None and entry.fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry
+
+    def set(self, key, value, body, endpoint=None, etag=None,
+            last_modified=None):
+        """Add a response to the cache.
+
+        Parameters:
+            key (tuple): Cache key.
+            value (object): Decoded response.
+            body (bytes): Response body, only its size is kept.
+            endpoint (str): Endpoint name, for its time to live.
+            etag (str): 'ETag' header of the response.
+            last_modified (str): 'Last-Modified' header of the response.
+        """
+        ttl = self.get_ttl(endpoint)
+        size = len(body)
+        if not ttl or size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CacheEntry(
+                value, size, time.monotonic() + ttl, etag, last_modified)
+            self._bytes += size
+
+            while (len(self._entries) > self.max_entries or
+                   self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def refresh(self, key, endpoint=None):
+        """Renew the time to live of an entry after a 304 response.
+
+        Parameters:
+            key (tuple): Cache key.
+            endpoint (str): Endpoint name, for its time to live.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.expires = time.monotonic() + self.get_ttl(endpoint)
+                entry.fresh = True
+            self.revalidations += 1
+
+    def _remove(self, key):
+        """Remove an entry, lock must be held."""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return cache statistics.
+
+        Returns:
+            dict with hits, misses, revalidations, evictions, entries and
+            bytes.
+        """
+        stats = super(MemoryCache, self).stats()
+        stats.update({'entries': len(self._entries), 'bytes': self._bytes})
+        return stats
+
+
+class SQLiteCache(BaseCache):
+    """Persistent cache stored in a sqlite database.
+
+    Response bodies are stored with their 'ETag' and 'Last-Modified'
+    headers, so a restarted client revalidates them instead of downloading
+    them again. Entries are kept after they expire while they can be
+    revalidated, until 'max_entries' or 'max_bytes' evict them (least
+    recently used first). The database can be shared by several processes.
+
+    Attributes:
+        path (str): Path of the sqlite database.
+    """
+
+    def __init__(self, path, ttl=60, ttls=None, max_entries=100000,
+                 max_bytes=1024 * 1024 * 1024, timeout=30, codec=None):
+        """Initialize SQLiteCache.
+
+        Keyword arguments:
+            path (str): Path of the sqlite database, it's created if it
+                        doesn't exist.
+            ttl (float): Default time to live in seconds (Default: 60).
+            ttls (dict): Time to live per endpoint.
+            max_entries (int): Max number of entries (Default: 100000).
+            max_bytes (int): Max size of cached response bodies (Default:
+                             1 GiB).
+            timeout (float): Seconds to wait for the database lock.
+            codec (str or JSONCodec): JSON codec to decode stored bodies
+                                      (Default: fastest installed codec).
+        """
+        super(SQLiteCache, self).__init__(ttl, ttls, max_entries, max_bytes)
+        self.path = path
+        self.timeout = timeout
+        self.codec = get_codec(codec)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pybooru_cache ("
+            "key TEXT PRIMARY KEY, body BLOB, size INTEGER, expires REAL, "
+            "etag TEXT, last_modified TEXT, accessed REAL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS pybooru_cache_accessed "
+                     "ON pybooru_cache (accessed)")
+
+    def __len__(self):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM pybooru_cache").fetchone()[0]
+
+    def _connect(self):
+        """Return the sqlite connection of the current thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout,
+                                   isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _hash_key(key):
+        """Return the database key of a cache key."""
+        return hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()
+
+    def lookup(self, key):
+        """Return the entry of a key, fresh or expired, or None.
+
+        Parameters:
+            key (tuple): Cache key.
+        """
+        conn = self._connect()
+        db_key = self._hash_key(key)
+        row = conn.execute(
+            "SELECT body, size, expires, etag, last_modified "
+            "FROM pybooru_cache WHERE key = ?", (db_key,)).fetchone()
+
+        entry = None
+        if row is not None:
+            now = time.time()
+            body, size, expires, etag, last_modified = row
+            if expires > now or etag or last_modified:
+                entry = CacheEntry(self.codec.loads(body), size, expires, etag,
+                                   last_modified, expires > now)
+                conn.execute("UPDATE pybooru_cache SET accessed = ? "
+                             "WHERE key = ?", (now, db_key))
+            else:
+                conn.execute("DELETE FROM pybooru_cache WHERE key = ?",
+                             (db_key,))
+
+        self._count('hits' if entry is not None and entry.fresh
+                    else 'misses')
+        return entry
+
+    def set(self, key, value, body, endpoint=None, etag=None,
+            last_modified=None):
+        """Add a response to the cache.
+
+        Parameters:
+            key (tuple): Cache key.
+            value (object): Decoded response, the body is stored instead.
+            body (bytes): Response body.
+            endpoint (str): Endpoint name, for its time to live.
+            etag (str): 'ETag' header of the response.
+            last_modified (str): 'Last-Modified' header of the response.
+        """
+        ttl = self.get_ttl(endpoint)
+        if not ttl or len(body) > self.max_bytes:
+            return
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO pybooru_cache "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._hash_key(key), sqlite3.Binary(body), len(body),
+                 now + ttl, etag, last_modified, now))
+            evicted = self._evict(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def _evict(self, conn):
+        """Remove least recently used entries over the limits.
+
+        Returns:
+            Number of evicted entries.
+        """
+        count, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) "
+            "FROM pybooru_cache").fetchone()
+        evicted = 0
+        if count <= self.max_entries and size <= self.max_bytes:
+            return evicted
+
+        rows = conn.execute(
+            "SELECT key, size FROM pybooru_cache ORDER BY accessed")
+        keys = []
+        for db_key, entry_size in rows:
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            keys.append((db_key,))
+            count -= 1
+            size -= entry_size
+            evicted += 1
+        conn.executemany("DELETE FROM pybooru_cache WHERE key = ?", keys)
+        return evicted
+
+    def refresh(self, key, endpoint=None):
+        """Renew the time to live of an entry after a 304 response.
+
+        Parameters:
+            key (tuple): Cache key.
+            endpoint (str): Endpoint name, for its time to live.
+        """
+        now = time.time()
+        self._connect().execute(
+            "UPDATE pybooru_cache SET expires = ?, accessed = ? "
+            "WHERE key = ?",
+            (now + self.get_ttl(endpoint), now, self._hash_key(key)))
+        self._count('revalidations')
+
+    def clear(self):
+        """Remove all entries."""
+        self._connect().execute("DELETE FROM pybooru_cache")
+
+    def stats(self):
+        """Return cache statistics.
+
+        Returns:
+            dict with hits, misses, revalidations, evictions, entries and
+            bytes.
+        """
+        stats = super(SQLiteCache, self).stats()
+        entries, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) "
+            "FROM pybooru_cache").fetchone()
+        stats.update({'entries': entries, 'bytes': size})
+        return stats
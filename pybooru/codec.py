@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.codec
+
+This module contains the JSON codecs used by Pybooru to decode responses.
+The fastest installed library is used by default: orjson, then ujson and
+finally the json module of the standard library.
+
+Classes:
+    JSONCodec -- Codec of the standard library json module.
+    OrjsonCodec -- Codec of orjson library.
+    UjsonCodec -- Codec of ujson library.
+
+Functions:
+    get_codec -- Return a codec by name or the fastest available.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import json
+
+# pybooru imports
+from .exceptions import PybooruError
+
+
+class JSONCodec(object):
+    """Codec of the standard library json module.
+
+    Codecs have a 'name' and 'loads' and 'dumps' functions. 'loads' takes
+    bytes or str and raises ValueError on invalid documents.
+    """
+
+    name = 'json'
+
+    def __init__(self):
+        """Initialize JSONCodec."""
+        self.loads = json.loads
+        self.dumps = json.dumps
+
+    def __repr__(self):
+        return "{0}()".format(type(self).__name__)
+
+    @staticmethod
+    def is_available():
+        """Check if the library of the codec is installed."""
+        return True
+
+
+class OrjsonCodec(JSONCodec):
+    """Codec of orjson library (https://github.com/ijl/orjson)."""
+
+    name = 'orjson'
+
+    def __init__(self):
+        """Initialize OrjsonCodec."""
+        import orjson
+        self.loads = orjson.loads
+        self.dumps = lambda obj: orjson.dumps(obj).decode('utf-8')
+
+    @staticmethod
+    def is_available():
+        """Check if orjson is installed."""
+        try:
+            import orjson  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+
+class UjsonCodec(JSONCodec):
+    """Codec of ujson library (https://github.com/ultrajson/ultrajson)."""
+
+    name = 'ujson'
+
+    def __init__(self):
+        """Initialize UjsonCodec."""
+        import ujson
+        self.loads = ujson.loads
+        self.dumps = ujson.dumps
+
+    @staticmethod
+    def is_available():
+        """Check if ujson is installed."""
+        try:
+            import ujson  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+
+# Codecs by preference
+CODECS = (OrjsonCodec, UjsonCodec, JSONCodec)
+
+
+def get_codec(codec=None):
+    """Return a JSON codec.
+
+    Parameters:
+        codec (str or codec): Name of a codec ('orjson', 'ujson' or 'json'),
+                              a codec object, or None for the fastest
+                              installed codec.
+
+    Raises:
+        PybooruError: When codec is unknown or isn't installed.
+    """
+    if codec is None:
+        for codec_class in CODECS:
+            if codec_class.is_available():
+                return codec_class()
+    if not isinstance(codec, str):
+        return codec
+
+    for codec_class in CODECS:
+        if codec_class.name == codec:
+            if not codec_class.is_available():
+                raise PybooruError(
+                    "JSON codec '{0}' isn't installed.".format(codec))
+            return codec_class()
+    raise PybooruError("Unknown JSON codec: '{0}'.".format(codec))
@@ -0,0 +1,547 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.columnar
+
+This module contains a columnar container of records, for analytics over
+big list results (tag dumps, post metadata). Every field is a column:
+numbers are arrays of machine values and strings are dictionary encoded
+(an array of codes and the list of distinct values), so a million records
+take a few megabytes instead of a list of dicts.
+
+A table is filled incrementally, page by page, from any iterator of
+records (dicts or models):
+
+    tags = Table(TAG_COLUMNS)
+    tags.extend(client.iter_tags(hide_empty='yes'))
+    tags.sum('post_count')
+    tags.top_k('post_count', 10)
+    tags.filter('category', 4)
+
+Aggregations run vectorized with NumPy when it is installed (pip install
+pybooru[numpy]) and with C loops of the standard library otherwise.
+to_numpy() exports columns to NumPy without copying them.
+
+Column types:
+    int -- 64 bits integers, None is stored as 0.
+    float -- 64 bits floats, None is stored as NaN.
+    bool -- Booleans, stored as 8 bits integers, None is stored as False.
+    str -- Dictionary encoded strings (or any hashable value, None too),
+           for values that repeat (ratings, extensions, categories).
+    text -- Plain list of strings, for unique values (md5, names).
+
+Classes:
+    Table -- Columnar records.
+    NumberColumn -- Column of numbers.
+    DictColumn -- Dictionary encoded column.
+    TextColumn -- Column of unique strings.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import array
+import collections
+import heapq
+import itertools
+import operator
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+# pybooru imports
+from .exceptions import PybooruError
+
+# Columns of Danbooru posts and tags
+POST_COLUMNS = {'id': 'int', 'score': 'int', 'fav_count': 'int',
+                'rating': 'str', 'md5': 'text', 'file_ext': 'str',
+                'file_size': 'int', 'image_width': 'int',
+                'image_height': 'int', 'is_deleted': 'bool'}
+TAG_COLUMNS = {'id': 'int', 'name': 'text', 'post_count': 'int',
+               'category': 'int'}
+
+# Records converted at a time by Table.extend
+_BATCH_SIZE = 1000
+
+
+def _take(values, indices):
+    """Return an array of the values of an array at indices."""
+    if numpy is not None:
+        taken = array.array(values.typecode)
+        taken.frombytes(numpy.frombuffer(
+            values, dtype=values.typecode)[indices].tobytes())
+        return taken
+    return array.array(values.typecode, map(values.__getitem__, indices))
+
+
+def _check_resize(values):
+    """Raise BufferError when an array can't be resized (a NumPy array
+    shares its memory), without changing it."""
+    values.append(values[0] if values else 0)
+    values.pop()
+
+
+class NumberColumn(object):
+    """Column of numbers stored in an array.
+
+    Attributes:
+        name (str): Field name.
+        values (array.array): Values.
+    """
+
+    __slots__ = ('name', 'values', 'default')
+
+    # Array typecode and value stored for None, by type name
+    TYPES = {'int': ('q', 0), 'float': ('d', float('nan')),
+             'bool': ('b', 0)}
+
+    def __init__(self, name, type_='int'):
+        """Initialize NumberColumn.
+
+        Parameters:
+            name (str): Field name.
+            type_ (str): 'int', 'float' or 'bool' (Default: 'int').
+        """
+        self.name = name
+        typecode, self.default = self.TYPES[type_]
+        self.values = array.array(typecode)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def extend(self, values):
+        """Append values, None values are stored as the column default.
+
+        Parameters:
+            values (iterable): Values.
+        """
+        self._extend(self._convert(values))
+
+    def _convert(self, values):
+        """Return values converted to an array, the column isn't changed."""
+        default = self.default
+        return array.array(self.values.typecode,
+                           (default if value is None else value
+                            for value in values))
+
+    def _check_resize(self):
+        _check_resize(self.values)
+
+    def _extend(self, converted):
+        self.values.extend(converted)
+
+    def take(self, indices):
+        """Return a column of the values at indices."""
+        column = type(self).__new__(type(self))
+        column.name = self.name
+        column.default = self.default
+        column.values = _take(self.values, indices)
+        return column
+
+    def _compared(self, value):
+        """Return values compared by filters, and the value to find."""
+        return self.values, value
+
+    def to_numpy(self):
+        """Return a NumPy array that shares the memory of the column.
+
+        The column can't be extended while the array exists.
+        """
+        return numpy.frombuffer(self.values, dtype=self.values.typecode)
+
+
+class DictColumn(object):
+    """Dictionary encoded column: an array of codes and distinct values.
+
+    Attributes:
+        name (str): Field name.
+        codes (array.array): Code of the value of each record.
+        categories (list): Distinct values, indexed by code.
+    """
+
+    __slots__ = ('name', 'codes', 'categories', '_index')
+
+    def __init__(self, name):
+        """Initialize DictColumn.
+
+        Parameters:
+            name (str): Field name.
+        """
+        self.name = name
+        self.codes = array.array('l')
+        self.categories = []
+        self._index = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.categories[code] for code in self.codes[index]]
+        return self.categories[self.codes[index]]
+
+    def _code(self, value):
+        """Return the code of a value, add it when it's new."""
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.categories)
+            self.categories.append(value)
+        return code
+
+    def extend(self, values):
+        """Append values.
+
+        Parameters:
+            values (iterable): Values.
+        """
+        self._extend(self._convert(values))
+
+    def _convert(self, values):
+        """Return an array of the codes of values, new values are added to
+        the categories."""
+        index = self._index
+        return array.array(self.codes.typecode,
+                           (index[value] if value in index
+                            else self._code(value) for value in values))
+
+    def _check_resize(self):
+        _check_resize(self.codes)
+
+    def _extend(self, converted):
+        self.codes.extend(converted)
+
+    def take(self, indices):
+        """Return a column of the values at indices."""
+        column = DictColumn(self.name)
+        # Copies, extending a column doesn't change the other
+        column.categories = list(self.categories)
+        column._index = dict(self._index)
+        column.codes = _take(self.codes, indices)
+        return column
+
+    def _compared(self, value):
+        """Return values compared by filters, and the value to find."""
+        return self.codes, self._index.get(value, -1)
+
+    def to_numpy(self):
+        """Return the codes as a NumPy array sharing their memory.
+
+        Values are 'categories' indexed by the codes.
+        """
+        return numpy.frombuffer(self.codes, dtype=self.codes.typecode)
+
+
+class TextColumn(object):
+    """Column of unique strings, stored in a list.
+
+    Attributes:
+        name (str): Field name.
+        values (list): Values.
+    """
+
+    __slots__ = ('name', 'values')
+
+    def __init__(self, name):
+        """Initialize TextColumn.
+
+        Parameters:
+            name (str): Field name.
+        """
+        self.name = name
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def extend(self, values):
+        """Append values.
+
+        Parameters:
+            values (iterable): Values.
+        """
+        self.values.extend(values)
+
+    def _convert(self, values):
+        return list(values)
+
+    def _check_resize(self):
+        pass
+
+    def _extend(self, converted):
+        self.values.extend(converted)
+
+    def take(self, indices):
+        """Return a column of the values at indices."""
+        column = TextColumn(self.name)
+        if numpy is not None and isinstance(indices, numpy.ndarray):
+            indices = indices.tolist()
+        column.values = list(map(self.values.__getitem__, indices))
+        return column
+
+    def _compared(self, value):
+        """Return values compared by filters, and the value to find."""
+        return self.values, value
+
+    def to_numpy(self):
+        """Return a NumPy array of objects (a copy)."""
+        return numpy.array(self.values, dtype=object)
+
+
+class Table(object):
+    """Columnar records.
+
+    Attributes:
+        columns (dict): Columns by field name.
+    """
+
+    def __init__(self, columns=None, _columns=None):
+        """Initialize Table.
+
+        Parameters:
+            columns (dict): Column types by field name, 'int', 'float',
+                            'bool', 'str' or 'text' (Default: None,
+                            POST_COLUMNS).
+
+        Raises:
+            PybooruError: When a column type is unknown.
+        """
+        if _columns is not None:
+            self.columns = _columns
+            return
+        self.columns = {}
+        for name, type_ in (columns or POST_COLUMNS).items():
+            if type_ in NumberColumn.TYPES:
+                self.columns[name] = NumberColumn(name, type_)
+            elif type_ == 'str':
+                self.columns[name] = DictColumn(name)
+            elif type_ == 'text':
+                self.columns[name] = TextColumn(name)
+            else:
+                raise PybooruError("Unknown column type '{0}' of '{1}', "
+                                   "use int, float, bool, str or "
+                                   "text.".format(type_, name))
+
+    def __repr__(self):
+        return "{0}({1} rows, columns={2})".format(
+            type(self).__name__, len(self), list(self.columns))
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def __getitem__(self, name):
+        """Return a column."""
+        return self.columns[name]
+
+    def __iter__(self):
+        """Iterate over rows as dicts."""
+        return (self.row(index) for index in range(len(self)))
+
+    def row(self, index):
+        """Return a row as a dict.
+
+        Parameters:
+            index (int): Row index.
+        """
+        return dict((name, column[index])
+                    for name, column in self.columns.items())
+
+    def append(self, record):
+        """Append a record.
+
+        Parameters:
+            record (dict or Model): The record, missing fields are None.
+        """
+        self.add_page([record])
+
+    def add_page(self, records):
+        """Append a list of records, column by column.
+
+        Values of all columns are converted and columns are checked before
+        any of them is changed, so an error (a wrong type, a column
+        exported with to_numpy()) leaves the table as it was.
+
+        Parameters:
+            records (list): Records (dicts or models), missing fields are
+                            None.
+
+        Raises:
+            BufferError: When a NumPy array of a column exists.
+        """
+        converted = [(column, column._convert(record.get(name)
+                                              for record in records))
+                     for name, column in self.columns.items()]
+        for column, _ in converted:
+            column._check_resize()
+        for column, values in converted:
+            column._extend(values)
+
+    def extend(self, records, limit=None):
+        """Append the records of an iterator, a batch at a time.
+
+        The iterator is consumed incrementally, so an iter_*() function of
+        a client fills the table without keeping its pages.
+
+        Parameters:
+            records (iterable): Records (dicts or models).
+            limit (int): Max number of records to append (Default: None).
+
+        Returns:
+            Number of records appended (int).
+        """
+        records = iter(records)
+        if limit is not None:
+            records = itertools.islice(records, limit)
+        added = 0
+        while True:
+            batch = list(itertools.islice(records, _BATCH_SIZE))
+            if not batch:
+                return added
+            self.add_page(batch)
+            added += len(batch)
+
+    def take(self, indices):
+        """Return a table of the rows at indices.
+
+        Parameters:
+            indices (iterable): Row indices.
+        """
+        if numpy is not None:
+            indices = numpy.asarray(indices, dtype=numpy.intp)
+        elif not isinstance(indices, (list, array.array)):
+            indices = list(indices)
+        return Table(_columns=dict(
+            (name, column.take(indices))
+            for name, column in self.columns.items()))
+
+    def _numeric(self, name):
+        """Return a numeric column.
+
+        Raises:
+            PybooruError: When the column isn't numeric.
+        """
+        column = self.columns[name]
+        if not isinstance(column, NumberColumn):
+            raise PybooruError("'{0}' is not a numeric column.".format(name))
+        return column
+
+    def sum(self, name):
+        """Return the sum of a numeric column.
+
+        Parameters:
+            name (str): Column name.
+
+        Raises:
+            PybooruError: When the column isn't numeric.
+        """
+        column = self._numeric(name)
+        if numpy is not None:
+            return column.to_numpy().sum().item()
+        return sum(column.values)
+
+    def top_k(self, name, k=10):
+        """Return indices of the rows with the greatest values of a column.
+
+        Parameters:
+            name (str): Column name.
+            k (int): Number of rows (Default: 10).
+
+        Returns:
+            List of row indices, greatest value first.
+
+        Raises:
+            PybooruError: When the column isn't numeric.
+        """
+        column = self._numeric(name)
+        if k <= 0:
+            return []
+        if numpy is not None:
+            values = column.to_numpy()
+            if k >= len(values):
+                top = numpy.argsort(values, kind='stable')[::-1]
+            else:
+                top = numpy.argpartition(values, len(values) - k)[-k:]
+                top = top[numpy.argsort(values[top], kind='stable')[::-1]]
+            return top.tolist()
+        return heapq.nlargest(k, range(len(column)),
+                              key=column.values.__getitem__)
+
+    def where(self, name, value):
+        """Return indices of the rows where a column equals a value.
+
+        Dictionary encoded columns compare codes, not strings.
+
+        Parameters:
+            name (str): Column name.
+            value: Value to find.
+
+        Returns:
+            List of row indices.
+        """
+        column = self.columns[name]
+        values, value = column._compared(value)
+        if numpy is not None and not isinstance(column, TextColumn):
+            return numpy.flatnonzero(
+                numpy.frombuffer(values, dtype=values.typecode) ==
+                value).tolist()
+        return list(itertools.compress(
+            itertools.count(),
+            map(operator.eq, values, itertools.repeat(value))))
+
+    def filter(self, name, value):
+        """Return a table of the rows where a column equals a value.
+
+        Parameters:
+            name (str): Column name.
+            value: Value to find.
+        """
+        return self.take(self.where(name, value))
+
+    def value_counts(self, name):
+        """Return the number of rows of each value of a column.
+
+        Parameters:
+            name (str): Column name.
+
+        Returns:
+            dict by value, most common first.
+        """
+        column = self.columns[name]
+        if isinstance(column, DictColumn):
+            if numpy is not None:
+                counts = numpy.bincount(column.to_numpy(),
+                                        minlength=len(column.categories))
+            else:
+                counts = [0] * len(column.categories)
+                for code, count in collections.Counter(
+                        column.codes).items():
+                    counts[code] = count
+            return dict(sorted(
+                ((value, int(count)) for value, count in
+                 zip(column.categories, counts) if count),
+                key=operator.itemgetter(1), reverse=True))
+        return dict(collections.Counter(column.values).most_common())
+
+    def to_numpy(self):
+        """Return the columns as NumPy arrays, by name.
+
+        Numeric columns and codes of dictionary encoded columns share
+        memory with the table, which can't be extended while they exist.
+
+        Raises:
+            PybooruError: When NumPy isn't installed.
+        """
+        if numpy is None:
+            raise PybooruError("Package 'numpy' is required to export "
+                               "columns.")
+        return dict((name, column.to_numpy())
+                    for name, column in self.columns.items())
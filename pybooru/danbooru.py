@@ -37,7 +37,8 @@ class Danbooru(_Pybooru, DanbooruApi_Mixin):
         last_call (dict): Return last call.
     """
 
-    def __init__(self, site_name='', site_url='', username='', api_key='', proxies=None):
+    def __init__(self, site_name='', site_url='', username='', api_key='',
+                 proxies=None, **kwargs):
         """Initialize Danbooru.
 
         Keyword arguments:
@@ -49,13 +50,18 @@ class Danbooru(_Pybooru, DanbooruApi_Mixin):
                            functions that modify the content).
             proxies (dict): Your proxies to connect to the danbooru site
                             (Required only when your network is blocked).
+            **kwargs: Request options of _Pybooru: retry, rate_limiter,
+                      cache, codec, single_flight, pool,
+                      timeout, hedging, middlewares, metrics,
+                      profiler, tracer, transport.
         """
-        super(Danbooru, self).__init__(site_name, site_url, username, proxies)
+        super(Danbooru, self).__init__(site_name, site_url, username, proxies,
+                                       **kwargs)
 
         self.api_key = api_key
 
     def _get(self, api_call, params=None, method='GET', auth=False,
-             file_=None):
+             file_=None, stream=False):
         """Function to preapre API call.
 
         Parameters:
@@ -64,6 +70,8 @@ class Danbooru(_Pybooru, DanbooruApi_Mixin):
             method (str): (Defauld: GET) HTTP method (GET, POST, PUT or
                            DELETE)
             file_ (file): File to upload (only uploads).
+            stream (bool): Return a generator that yields records while the
+                           response is downloaded.
 
         Raise:
             PybooruError: When 'username' or 'api_key' are not set.
@@ -85,4 +93,4 @@ class Danbooru(_Pybooru, DanbooruApi_Mixin):
                                    "Danbooru are required.")
 
         # Do call
-        return self._request(url, api_call, request_args, method)
+        return self._request(url, api_call, request_args, method, stream)
@@ -8,6 +8,7 @@ Classes:
     * PybooruError -- Main Pybooru exception class.
     * PybooruHTTPError -- Manages HTTP status errors.
     * PybooruAPIError -- Manages all API errors.
+    * PybooruDeadlineError -- Raised when a deadline expires.
 """
 
 # __furute__ imports
@@ -34,9 +35,10 @@ class PybooruHTTPError(PybooruError):
             url (str): The URL.
         """
         super(PybooruHTTPError, self).__init__(msg, http_code, url)
+        self.http_code = http_code
+        status = HTTP_STATUS_CODE.get(http_code, ('Undefined', 'undefined'))
         self._msg = "{0}: {1} - {2}, {3} - URL: {4}".format(
-            msg, http_code, HTTP_STATUS_CODE[http_code][0],
-            HTTP_STATUS_CODE[http_code][1], url)
+            msg, http_code, status[0], status[1], url)
 
     def __str__(self):
         """Print exception."""
@@ -46,3 +48,8 @@ class PybooruHTTPError(PybooruError):
 class PybooruAPIError(PybooruError):
     """Class to catch all API errors."""
     pass
+
+
+class PybooruDeadlineError(PybooruError):
+    """Class to catch requests not done because a deadline expired."""
+    pass
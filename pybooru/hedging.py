@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.hedging
+
+This module contains request hedging for Pybooru. When a GET request hasn't
+answered after a delay (by default the observed 95th percentile latency of
+its endpoint), a duplicate request is sent and the first response is used.
+A budget caps the extra requests, e.g. at most 5% more requests.
+
+Classes:
+    Hedging -- Hedging policy, latency statistics and budget.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import asyncio
+import collections
+import contextvars
+import threading
+import time
+from concurrent.futures import (ThreadPoolExecutor, FIRST_COMPLETED,
+                                wait as wait_futures)
+
+
+class Hedging(object):
+    """Hedging policy, latency statistics and budget.
+
+    Each request adds 'budget' tokens (up to 'max_tokens') and a hedge takes
+    one token, so in the long run hedges are at most 'budget' of requests.
+
+    Sync clients run hedged requests in a thread pool and use the response
+    that arrives first; the slower request can't be interrupted, it ends in
+    background and its response is dropped. It still takes rate limiter
+    tokens (and waits for them) and holds a pool connection until it ends,
+    so lower 'budget' when the rate limit is tight. Async clients cancel
+    it.
+
+    Attributes:
+        delay (float): Fixed hedge delay in seconds, or None.
+        quantile (float): Quantile of latencies used as delay.
+        budget (float): Max ratio of extra requests.
+        min_samples (int): Latencies needed before hedging an endpoint.
+        window (int): Number of latencies kept per endpoint.
+        max_tokens (float): Max number of hedges in a burst.
+        max_workers (int): Threads of the pool of sync clients.
+        requests (int): Number of requests.
+        hedged (int): Number of hedges sent.
+        wins (int): Number of hedges that answered first.
+    """
+
+    def __init__(self, delay=None, quantile=0.95, budget=0.05, min_samples=20,
+                 window=200, max_tokens=10, max_workers=64):
+        """Initialize Hedging.
+
+        Keyword arguments:
+            delay (float): Seconds before sending a hedge (Default: None,
+                           'quantile' of latencies of the endpoint).
+            quantile (float): Quantile of latencies used as delay
+                              (Default: 0.95).
+            budget (float): Max ratio of extra requests (Default: 0.05).
+            min_samples (int): Latencies needed before hedging requests of
+                               an endpoint, when 'delay' isn't set
+                               (Default: 20).
+            window (int): Number of recent latencies kept per endpoint
+                          (Default: 200).
+            max_tokens (float): Max number of hedges in a burst
+                                (Default: 10).
+            max_workers (int): Threads of the pool of sync clients, set it
+                               higher than the number of threads that share
+                               the client (Default: 64).
+        """
+        if not 0 < quantile < 1:
+            raise ValueError("'quantile' must be between 0 and 1.")
+        self.delay = delay
+        self.quantile = quantile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.window = window
+        self.max_tokens = max_tokens
+        self.max_workers = max_workers
+        self.requests = 0
+        self.hedged = 0
+        self.wins = 0
+        self._tokens = 0.0
+        self._latencies = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "{0}(delay={1}, quantile={2}, budget={3})".format(
+            type(self).__name__, self.delay, self.quantile, self.budget)
+
+    @classmethod
+    def from_value(cls, value):
+        """Build a hedging policy from a constructor argument.
+
+        Parameters:
+            value (Hedging, bool, float or None): A Hedging object, True for
+                                                  default policy, a fixed
+                                                  delay or None.
+
+        Returns:
+            Hedging object or None.
+        """
+        if value is None or value is False or isinstance(value, cls):
+            return value or None
+        if value is True:
+            return cls()
+        return cls(delay=value)
+
+    def record(self, endpoint, latency):
+        """Add the latency of a successful request.
+
+        Parameters:
+            endpoint (str): Endpoint name.
+            latency (float): Seconds.
+        """
+        with self._lock:
+            latencies = self._latencies.get(endpoint)
+            if latencies is None:
+                latencies = self._latencies[endpoint] = collections.deque(
+                    maxlen=self.window)
+            latencies.append(latency)
+
+    def get_delay(self, endpoint):
+        """Return seconds before hedging a request, None to not hedge.
+
+        Parameters:
+            endpoint (str): Endpoint name.
+        """
+        if self.delay is not None:
+            return self.delay
+        with self._lock:
+            latencies = self._latencies.get(endpoint)
+            if latencies is None or len(latencies) < self.min_samples:
+                return None
+            latencies = sorted(latencies)
+        return latencies[min(int(len(latencies) * self.quantile),
+                             len(latencies) - 1)]
+
+    def _start(self):
+        """Count a request and add its budget tokens."""
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self._tokens + self.budget, self.max_tokens)
+
+    def _take_token(self):
+        """Take a token to send a hedge, return False when out of budget."""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            self.hedged += 1
+            return True
+
+    def _win(self, index):
+        """Count a response, 'index' 1 is the hedge."""
+        if index:
+            with self._lock:
+                self.wins += 1
+
+    def _get_executor(self):
+        """Return the thread pool, create it if it doesn't exist."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.max_workers, thread_name_prefix='pybooru-hedging')
+            return self._executor
+
+    def _timed(self, endpoint, function, args):
+        """Call function and record its latency when it succeeds."""
+        start = time.monotonic()
+        result = function(*args)
+        self.record(endpoint, time.monotonic() - start)
+        return result
+
+    def run(self, endpoint, function, *args):
+        """Call a function, and a hedge if it doesn't return in time.
+
+        Calls run in the thread pool, in a copy of the caller context.
+
+        Parameters:
+            endpoint (str): Endpoint name.
+            function (function): Function that does the request.
+            *args: Arguments of the function.
+
+        Returns:
+            Tuple with the first result and a bool that is True when a
+            hedge was sent.
+
+        Raises:
+            The exception of the request when all requests fail.
+        """
+        self._start()
+        delay = self.get_delay(endpoint)
+        if delay is None:
+            return self._timed(endpoint, function, args), False
+
+        executor = self._get_executor()
+        futures = [executor.submit(contextvars.copy_context().run,
+                                   self._timed, endpoint, function, args)]
+        done = wait_futures(futures, timeout=delay)[0]
+        if not done and self._take_token():
+            futures.append(executor.submit(
+                contextvars.copy_context().run, self._timed, endpoint,
+                function, args))
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait_futures(pending,
+                                         return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    self._win(futures.index(future))
+                    return future.result(), len(futures) > 1
+                error = error or future.exception()
+        raise error
+
+    async def run_async(self, endpoint, function, *args):
+        """Await a coroutine function, and a hedge if it's slow.
+
+        The slower request is cancelled.
+
+        Parameters:
+            endpoint (str): Endpoint name.
+            function (function): Coroutine function that does the request.
+            *args: Arguments of the function.
+
+        Returns:
+            Tuple with the first result and a bool that is True when a
+            hedge was sent.
+
+        Raises:
+            The exception of the request when all requests fail.
+        """
+        self._start()
+        delay = self.get_delay(endpoint)
+        if delay is None:
+            return await self._timed_async(endpoint, function, args), False
+
+        tasks = [asyncio.ensure_future(
+            self._timed_async(endpoint, function, args))]
+        try:
+            done = (await asyncio.wait(tasks, timeout=delay))[0]
+            if not done and self._take_token():
+                tasks.append(asyncio.ensure_future(
+                    self._timed_async(endpoint, function, args)))
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._win(tasks.index(task))
+                        return task.result(), len(tasks) > 1
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _timed_async(self, endpoint, function, args):
+        """Await function and record its latency when it succeeds."""
+        start = time.monotonic()
+        result = await function(*args)
+        self.record(endpoint, time.monotonic() - start)
+        return result
+
+    def stats(self):
+        """Return hedging statistics.
+
+        Returns:
+            dict with 'requests', 'hedged', 'wins' (hedges that answered
+            first), 'ratio' (hedged / requests) and 'delays' (current delay
+            per endpoint).
+        """
+        with self._lock:
+            endpoints = list(self._latencies)
+            stats = {'requests': self.requests, 'hedged': self.hedged,
+                     'wins': self.wins}
+        stats['ratio'] = (float(stats['hedged']) / stats['requests']
+                          if stats['requests'] else 0.0)
+        stats['delays'] = dict((endpoint, self.get_delay(endpoint))
+                               for endpoint in endpoints)
+        return stats
+
+    def close(self):
+        """Shut down the thread pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
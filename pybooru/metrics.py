@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.metrics
+
+This module contains the metrics collector of Pybooru. It keeps, per
+endpoint, request counts, status code counts, bytes received, retries,
+cache hits, connection reuse and histograms with p50/p95/p99 estimates of
+latency and of each phase of requests (see pybooru.timing).
+
+Collection is lock free: every thread updates its own shard, and shards
+are merged when a snapshot is taken.
+
+Classes:
+    Histogram -- Latency histogram with logarithmic buckets.
+    Metrics -- Metrics collector, installed as a middleware.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import inspect
+import math
+import threading
+import time
+
+# pybooru imports
+from .exceptions import PybooruHTTPError
+from .timing import PHASES
+
+# Histogram buckets: 4 per power of 2, from 100us to ~30 minutes
+_MIN_LATENCY = 0.0001
+_BUCKETS_PER_DOUBLING = 4
+_NUM_BUCKETS = 24 * _BUCKETS_PER_DOUBLING + 2
+_LOG_FACTOR = math.log(2) / _BUCKETS_PER_DOUBLING
+
+
+class Histogram(object):
+    """Latency histogram with logarithmic buckets.
+
+    Bucket 0 counts values up to 100us, bucket i counts values up to
+    100us * 2 ** (i / 4), so quantiles have a relative error below 10%.
+
+    Attributes:
+        counts (list): Count per bucket.
+        count (int): Number of values.
+        sum (float): Sum of values.
+    """
+
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        """Initialize Histogram."""
+        self.counts = [0] * _NUM_BUCKETS
+        self.count = 0
+        self.sum = 0.0
+
+    @staticmethod
+    def bucket_bound(index):
+        """Return upper bound of a bucket in seconds (inf for the last)."""
+        if index >= _NUM_BUCKETS - 1:
+            return float('inf')
+        return _MIN_LATENCY * math.exp(index * _LOG_FACTOR)
+
+    def add(self, value):
+        """Add a value in seconds."""
+        if value <= _MIN_LATENCY:
+            index = 0
+        else:
+            index = min(int(math.ceil(
+                math.log(value / _MIN_LATENCY) / _LOG_FACTOR)),
+                _NUM_BUCKETS - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other):
+        """Add counts of another histogram."""
+        counts = self.counts
+        for index, count in enumerate(list(other.counts)):
+            counts[index] += count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q):
+        """Estimate a quantile (e.g. 0.95) in seconds, None when empty."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                if index == 0:
+                    return _MIN_LATENCY
+                if index == _NUM_BUCKETS - 1:
+                    return self.bucket_bound(index - 1)
+                # Geometric middle of the bucket
+                return _MIN_LATENCY * math.exp((index - 0.5) * _LOG_FACTOR)
+        return self.bucket_bound(_NUM_BUCKETS - 2)
+
+    def summary(self):
+        """Return 'count', 'sum', 'mean', 'p50', 'p95' and 'p99' (dict)."""
+        return {'count': self.count,
+                'sum': self.sum,
+                'mean': self.sum / self.count if self.count else None,
+                'p50': self.quantile(0.5),
+                'p95': self.quantile(0.95),
+                'p99': self.quantile(0.99)}
+
+
+class _EndpointStats(object):
+    """Counters of an endpoint in a shard."""
+
+    __slots__ = ('requests', 'errors', 'statuses', 'bytes', 'retries',
+                 'cache_hits', 'cache_revalidated', 'short_circuited',
+                 'connections', 'reused', 'latency', 'phases')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.statuses = {}
+        self.bytes = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.cache_revalidated = 0
+        self.short_circuited = 0
+        self.connections = 0
+        self.reused = 0
+        self.latency = Histogram()
+        self.phases = dict((phase, Histogram()) for phase in PHASES)
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.errors += other.errors
+        for status, count in list(other.statuses.items()):
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.bytes += other.bytes
+        self.retries += other.retries
+        self.cache_hits += other.cache_hits
+        self.cache_revalidated += other.cache_revalidated
+        self.short_circuited += other.short_circuited
+        self.connections += other.connections
+        self.reused += other.reused
+        self.latency.merge(other.latency)
+        for phase, histogram in self.phases.items():
+            histogram.merge(other.phases[phase])
+
+
+class Metrics(object):
+    """Metrics collector, installed as a middleware of a client.
+
+    A collector can be shared by several clients (use 'labels' of the
+    exporter to tell sites apart, or one collector per client).
+
+    Example:
+        client = Danbooru('danbooru', metrics=True)
+        ...
+        print(client.metrics.snapshot()['GET posts.json']['p95'])
+        print(client.metrics.to_prometheus(labels={'site': 'danbooru'}))
+    """
+
+    def __init__(self):
+        """Initialize Metrics."""
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()  # only to register shards
+
+    @classmethod
+    def from_value(cls, value):
+        """Build a collector from a constructor argument.
+
+        Parameters:
+            value (Metrics, bool or None): A Metrics object, True for a new
+                                           one, or None/False.
+
+        Returns:
+            Metrics object or None.
+        """
+        if not value or isinstance(value, cls):
+            return value or None
+        return cls()
+
+    def _get_shard(self):
+        """Return the shard (dict of _EndpointStats) of current thread."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _get_stats(self, method, endpoint):
+        """Return _EndpointStats of the current thread."""
+        shard = self._get_shard()
+        stats = shard.get((method, endpoint))
+        if stats is None:
+            stats = shard[(method, endpoint)] = _EndpointStats()
+        return stats
+
+    def record(self, method, endpoint, latency, record=None, error=None,
+               short_circuited=False):
+        """Record a call.
+
+        Parameters:
+            method (str): HTTP method.
+            endpoint (str): Endpoint name.
+            latency (float): Seconds.
+            record (dict): 'last_call' of the call, when it succeeds.
+            error (Exception): Exception raised by the call.
+            short_circuited (bool): A middleware answered without a
+                                    request, like a cache hit.
+        """
+        stats = self._get_stats(method, endpoint)
+        stats.requests += 1
+        if short_circuited:
+            stats.short_circuited += 1
+            return
+        if error is not None:
+            stats.errors += 1
+            status = (error.http_code if isinstance(error, PybooruHTTPError)
+                      else 'error')
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.latency.add(latency)
+            return
+
+        record = record or {}
+        status = record.get('status_code')
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.retries += record.get('retries') or 0
+        cache = record.get('cache')
+        if cache == 'hit':
+            stats.cache_hits += 1
+            return
+        if cache == 'revalidated':
+            stats.cache_revalidated += 1
+        stats.latency.add(latency)
+        timings = record.get('timings')
+        if record.get('shared') or not timings:
+            # Bytes and phases are counted by the call that did the request
+            return
+        stats.bytes += record.get('bytes') or 0
+        if timings['reused']:
+            stats.reused += 1
+        else:
+            stats.connections += 1
+            stats.phases['connect'].add(timings['connect'])
+        for phase in PHASES[1:]:
+            value = timings[phase]
+            if value is not None:
+                stats.phases[phase].add(value)
+
+    def _record_call(self, request, start, previous):
+        """Record a call that succeeded.
+
+        A call that doesn't set a new 'last_call' of the client was
+        answered by a later middleware without a request.
+        """
+        record = request.client.last_call
+        self.record(request.method, request.endpoint,
+                    time.perf_counter() - start, record,
+                    short_circuited=record is previous)
+
+    def __call__(self, request, call_next):
+        """Middleware: time a request and record it."""
+        previous = request.client.last_call
+        start = time.perf_counter()
+        try:
+            data = call_next(request)
+        except Exception as e:
+            self.record(request.method, request.endpoint,
+                        time.perf_counter() - start, error=e)
+            raise
+        if inspect.isawaitable(data):
+            return self._record_async(request, data, start, previous)
+        self._record_call(request, start, previous)
+        return data
+
+    async def _record_async(self, request, awaitable, start, previous):
+        """Await the request of an asyncio client and record it."""
+        try:
+            data = await awaitable
+        except Exception as e:
+            self.record(request.method, request.endpoint,
+                        time.perf_counter() - start, error=e)
+            raise
+        self._record_call(request, start, previous)
+        return data
+
+    def _merged(self):
+        """Return _EndpointStats of all shards merged, by key."""
+        with self._lock:
+            shards = list(self._shards)
+        merged = {}
+        for shard in shards:
+            for key, stats in list(shard.items()):
+                total = merged.get(key)
+                if total is None:
+                    total = merged[key] = _EndpointStats()
+                total.merge(stats)
+        return merged
+
+    def snapshot(self):
+        """Return metrics per endpoint.
+
+        Returns:
+            dict by 'METHOD endpoint' (e.g. 'GET posts.json') of dicts with
+            'requests', 'errors', 'statuses' (count per status code, or
+            'error' for failed connections), 'bytes', 'retries',
+            'cache_hits', 'cache_revalidated', 'short_circuited' (calls
+            answered by a middleware), 'connections' (requests
+            that opened a connection), 'reused' (requests that reused
+            one), latency 'count', 'sum', 'mean', 'p50', 'p95' and 'p99' in
+            seconds (cache hits and short circuited calls aren't included
+            in latencies) and 'phases'
+            with the same latency keys for each phase ('connect' only
+            counts requests that opened a connection).
+        """
+        snapshot = {}
+        for (method, endpoint), stats in sorted(self._merged().items()):
+            snapshot["{0} {1}".format(method, endpoint)] = dict(
+                stats.latency.summary(), **{
+                'method': method,
+                'endpoint': endpoint,
+                'requests': stats.requests,
+                'errors': stats.errors,
+                'statuses': stats.statuses,
+                'bytes': stats.bytes,
+                'retries': stats.retries,
+                'cache_hits': stats.cache_hits,
+                'cache_revalidated': stats.cache_revalidated,
+                'short_circuited': stats.short_circuited,
+                'connections': stats.connections,
+                'reused': stats.reused,
+                'phases': dict((phase, histogram.summary()) for
+                               phase, histogram in stats.phases.items()),
+                })
+        return snapshot
+
+    def reset(self):
+        """Drop all collected metrics."""
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def to_prometheus(self, prefix='pybooru', labels=None):
+        """Export metrics in Prometheus text format.
+
+        Histogram buckets are exported every power of 2 of seconds.
+
+        Parameters:
+            prefix (str): Prefix of metric names (Default: pybooru).
+            labels (dict): Labels added to every metric, e.g. site name.
+
+        Returns:
+            Text in Prometheus exposition format (str).
+        """
+        merged = sorted(self._merged().items())
+        lines = []
+
+        def label_text(method, endpoint, **extra):
+            items = sorted((labels or {}).items())
+            items += [('method', method), ('endpoint', endpoint)]
+            items += sorted(extra.items())
+            return ','.join('{0}="{1}"'.format(
+                name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                for name, value in items)
+
+        def header(name, kind, text):
+            lines.append("# HELP {0}_{1} {2}".format(prefix, name, text))
+            lines.append("# TYPE {0}_{1} {2}".format(prefix, name, kind))
+
+        def write_histogram(name, histogram, method, endpoint, **extra):
+            cumulative = 0
+            for index, count in enumerate(histogram.counts[:-1]):
+                cumulative += count
+                if index % _BUCKETS_PER_DOUBLING == 0:
+                    le = "{0:.6g}".format(Histogram.bucket_bound(index))
+                    lines.append("{0}_{1}_bucket{{{2}}} {3}".format(
+                        prefix, name, label_text(method, endpoint, le=le,
+                                                 **extra), cumulative))
+            lines.append("{0}_{1}_bucket{{{2}}} {3}".format(
+                prefix, name, label_text(method, endpoint, le='+Inf',
+                                         **extra), histogram.count))
+            lines.append("{0}_{1}_sum{{{2}}} {3}".format(
+                prefix, name, label_text(method, endpoint, **extra),
+                histogram.sum))
+            lines.append("{0}_{1}_count{{{2}}} {3}".format(
+                prefix, name, label_text(method, endpoint, **extra),
+                histogram.count))
+
+        header('requests_total', 'counter', "Calls by endpoint and status.")
+        for (method, endpoint), stats in merged:
+            for status, count in sorted(stats.statuses.items(),
+                                        key=lambda item: str(item[0])):
+                lines.append("{0}_requests_total{{{1}}} {2}".format(
+                    prefix, label_text(method, endpoint, status=status),
+                    count))
+
+        for name, attr, text in (
+                ('errors_total', 'errors', "Calls that raised an error."),
+                ('received_bytes_total', 'bytes', "Bytes of responses."),
+                ('retries_total', 'retries', "Retried requests."),
+                ('cache_hits_total', 'cache_hits', "Calls served by cache."),
+                ('cache_revalidated_total', 'cache_revalidated',
+                 "Cache entries revalidated by the server."),
+                ('short_circuited_total', 'short_circuited',
+                 "Calls answered by a middleware without a request."),
+                ('connections_total', 'connections',
+                 "Requests that opened a connection."),
+                ('reused_connections_total', 'reused',
+                 "Requests that reused a pooled connection.")):
+            header(name, 'counter', text)
+            for (method, endpoint), stats in merged:
+                lines.append("{0}_{1}{{{2}}} {3}".format(
+                    prefix, name, label_text(method, endpoint),
+                    getattr(stats, attr)))
+
+        header('request_duration_seconds', 'histogram',
+               "Latency of calls not served by cache.")
+        for (method, endpoint), stats in merged:
+            write_histogram('request_duration_seconds', stats.latency,
+                            method, endpoint)
+
+        header('phase_duration_seconds', 'histogram',
+               "Duration of phases of requests.")
+        for (method, endpoint), stats in merged:
+            for phase in PHASES:
+                write_histogram('phase_duration_seconds',
+                                stats.phases[phase], method, endpoint,
+                                phase=phase)
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.middleware
+
+This module contains the middleware chain of Pybooru. Middlewares are
+called in order with each request of a client, before cache, single-flight,
+hedging, rate limiting and retries. A middleware can inspect or change the
+request, answer it without calling the next stage (e.g. from its own cache)
+and inspect the decoded response (and 'last_call' of the client).
+
+A middleware is any callable that takes the request and the next stage:
+
+    def log_calls(request, call_next):
+        start = time.monotonic()
+        data = call_next(request)
+        print(request.url, time.monotonic() - start)
+        return data
+
+    client = Danbooru('danbooru', middlewares=[log_calls])
+
+Middlewares of asyncio clients are coroutine functions and await
+call_next(request).
+
+Classes:
+    Request -- Request passed through middlewares.
+    Middleware -- Base class of middlewares.
+
+Functions:
+    build_chain -- Compose middlewares around a handler.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+
+class Request(object):
+    """Request passed through middlewares.
+
+    Attributes:
+        client (_Pybooru): Client doing the request.
+        method (str): HTTP method.
+        url (str): Request url without query string.
+        api_call (str): API function called, e.g. 'posts/1.json'.
+        request_args (dict): requests arguments: 'params' for GET
+                             requests, 'data' and 'files' for the rest,
+                             and 'auth'.
+        stream (bool): Decode the response while it's downloaded.
+    """
+
+    __slots__ = ('client', 'method', 'url', 'api_call', 'request_args',
+                 'stream')
+
+    def __init__(self, client, method, url, api_call, request_args,
+                 stream=False):
+        """Initialize Request."""
+        self.client = client
+        self.method = method
+        self.url = url
+        self.api_call = api_call
+        self.request_args = request_args
+        self.stream = stream
+
+    def __repr__(self):
+        return "{0}({1} {2})".format(type(self).__name__, self.method,
+                                     self.url)
+
+    @property
+    def endpoint(self):
+        """Endpoint name of the request, e.g. 'posts/{id}.json'."""
+        return self.client._get_endpoint(self.api_call)
+
+    @property
+    def params(self):
+        """Query string (GET) or form (other methods) parameters."""
+        key = 'params' if self.method == 'GET' else 'data'
+        return self.request_args.get(key)
+
+
+class Middleware(object):
+    """Base class of middlewares.
+
+    Subclasses override __call__, calling call_next(request) to continue
+    the chain. The base class passes requests through.
+    """
+
+    def __call__(self, request, call_next):
+        """Handle a request.
+
+        Parameters:
+            request (Request): The request.
+            call_next (function): Next stage, takes the request and returns
+                                  the decoded response.
+
+        Returns:
+            Decoded response.
+        """
+        return call_next(request)
+
+
+def build_chain(middlewares, handler):
+    """Compose middlewares around a handler.
+
+    Parameters:
+        middlewares (list): Middlewares, the first one is called first.
+        handler (function): Last stage, takes a Request.
+
+    Returns:
+        Function that takes a Request and runs the chain.
+    """
+    for middleware in reversed(middlewares):
+        handler = _link(middleware, handler)
+    return handler
+
+
+def _link(middleware, call_next):
+    """Return a stage that calls middleware with the next stage."""
+    return lambda request: middleware(request, call_next)
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.models
+
+This module contains compact model objects of API records, an opt-in
+alternative to dicts for big working sets (list functions take
+'models=True'):
+
+    posts = client.post_list(tags='cat', limit=200, models=True)
+    posts[0].id, posts[0].file_url
+
+Models use __slots__ for the common fields of Danbooru and Moebooru
+records. Values that repeat between records (ratings, file extensions,
+statuses, url hosts) are interned, so they are shared. Other fields are
+serialized together with marshal and decoded when they are read, which is
+slower than a slot: read them once or use to_dict() when they are needed
+often. Models are pickled as dicts, marshal data isn't persisted.
+
+Fields are read as attributes (post.md5) or like dict keys (post['md5'],
+post.get('md5')). A field missing from the record raises AttributeError
+(KeyError with []), like a missing key of a dict.
+
+Models of requests with Danbooru 'only' parameter are partial, they have
+the selected fields only (post_list(only='id,md5', models=True)). Their
+'partial' attribute is True and a missing field error names the selected
+fields.
+
+Classes:
+    Model -- Base class of models.
+    Post -- A post.
+    Tag -- A tag.
+    Pool -- A pool.
+    Comment -- A comment.
+    User -- A user.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import array
+import marshal
+import sys
+
+# Prefixes of urls that aren't relative to the url base of a record
+_ABSOLUTE = ('http://', 'https://', '//', '/')
+
+
+class _UrlField(object):
+    """Descriptor of an url field, stored without the url base of its
+    record (e.g. 'https://cdn.donmai.us/') that is interned."""
+
+    __slots__ = ('name', 'slot')
+
+    def __init__(self, name):
+        self.name = name
+        self.slot = '_' + name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        # AttributeError for a missing field falls back to __getattr__
+        value = getattr(instance, self.slot)
+        if value is None or value.startswith(_ABSOLUTE):
+            return value
+        return instance._url_base + value
+
+    def __set__(self, instance, value):
+        base = getattr(instance, '_url_base', None)
+        if value and base is None and '://' in value:
+            end = value.find('/', value.index('://') + 3)
+            if end != -1:
+                base = instance._url_base = sys.intern(value[:end + 1])
+        if (value and base is not None and value.startswith(base) and
+                not value.startswith(_ABSOLUTE, len(base))):
+            value = value[len(base):]
+        setattr(instance, self.slot, value)
+
+
+class Model(object):
+    """Base class of models.
+
+    Subclasses list their fields kept in slots in FIELDS. Fields in
+    INTERNED are interned strings, fields in URLS are urls and fields in
+    ARRAYS are lists of integers stored as arrays.
+    """
+
+    __slots__ = ('_extra', '_only')
+
+    FIELDS = ()
+    INTERNED = frozenset()
+    URLS = ()
+    ARRAYS = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super(Model, cls).__init_subclass__(**kwargs)
+        for name in cls.URLS:
+            setattr(cls, name, _UrlField(name))
+        cls._slotted = frozenset(cls.FIELDS + cls.URLS)
+
+    def __init__(self, record, only=None):
+        """Initialize a model, the record isn't modified.
+
+        Parameters:
+            record (dict): Record decoded from a response.
+            only (str): Fields selected by the request, the model is
+                        partial (Default: None, all fields).
+        """
+        self._only = only
+        slotted = self._slotted
+        interned = self.INTERNED
+        arrays = self.ARRAYS
+        extra = None
+        for name, value in record.items():
+            if name not in slotted:
+                if extra is None:
+                    extra = {}
+                extra[name] = value
+                continue
+            if value.__class__ is str and name in interned:
+                value = sys.intern(value)
+            elif value.__class__ is list and name in arrays:
+                value = array.array('q', value)
+            setattr(self, name, value)
+        # marshal is several times faster than JSON and more compact
+        self._extra = marshal.dumps(extra) if extra else None
+
+    @classmethod
+    def from_list(cls, records, only=None):
+        """Return a list of models of a list of records.
+
+        Parameters:
+            records (list): Records decoded from a response.
+            only (str): Fields selected by the request (Default: None).
+        """
+        return [cls(record, only) for record in records]
+
+    def __getattr__(self, name):
+        """Read a serialized field, called when a slot isn't set."""
+        if not name.startswith('_'):
+            extra = self._extra
+            if extra is not None:
+                fields = marshal.loads(extra)
+                if name in fields:
+                    return fields[name]
+            if self._only is not None:
+                raise AttributeError(
+                    "{0} has no field '{1}', the request selected "
+                    "'{2}'".format(type(self).__name__, name, self._only))
+        raise AttributeError("{0} has no field '{1}'".format(
+            type(self).__name__, name))
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def __contains__(self, name):
+        return name in self.keys()
+
+    def __repr__(self):
+        return "{0}(id={1!r})".format(type(self).__name__,
+                                      self.get('id'))
+
+    @property
+    def partial(self):
+        """True when the request selected some fields only (bool)."""
+        return self._only is not None
+
+    def get(self, name, default=None):
+        """Return a field, or 'default' when the record doesn't have it.
+
+        Parameters:
+            name (str): Field name.
+            default: Value of missing fields (Default: None).
+        """
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            return default
+
+    def keys(self):
+        """Return the names of the fields of the record (list)."""
+        return list(self.to_dict())
+
+    def to_dict(self):
+        """Return the record as a dict, slotted fields first."""
+        record = {}
+        for name in self.FIELDS + self.URLS:
+            try:
+                value = getattr(self, name)
+            except AttributeError:
+                continue
+            if name in self.ARRAYS and isinstance(value, array.array):
+                value = value.tolist()
+            record[name] = value
+        if self._extra is not None:
+            record.update(marshal.loads(self._extra))
+        return record
+
+    def __getstate__(self):
+        if self._only is not None:
+            return self.to_dict(), self._only
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            self.__init__(*state)
+        else:
+            self.__init__(state)
+
+
+class Post(Model):
+    """A post of Danbooru or Moebooru.
+
+    Moebooru posts have 'tags', 'width', 'height', 'creator_id' and
+    'status' instead of 'tag_string', 'image_width', 'image_height',
+    'uploader_id' and 'is_deleted'.
+    """
+
+    FIELDS = ('id', 'created_at', 'score', 'rating', 'md5', 'file_ext',
+              'file_size', 'source', 'parent_id', 'has_children',
+              'fav_count', 'tag_string', 'tag_string_artist',
+              'tag_string_character', 'tag_string_copyright',
+              'image_width', 'image_height', 'uploader_id', 'is_deleted',
+              'tags', 'width', 'height', 'creator_id', 'status')
+    INTERNED = frozenset(('rating', 'file_ext', 'status'))
+    URLS = ('file_url', 'large_file_url', 'preview_file_url',
+            'sample_url', 'preview_url', 'jpeg_url')
+
+    __slots__ = FIELDS + ('_url_base',) + tuple('_' + name for name in URLS)
+
+
+class Tag(Model):
+    """A tag of Danbooru ('post_count', 'category') or Moebooru ('count',
+    'type')."""
+
+    FIELDS = ('id', 'name', 'post_count', 'category', 'count', 'type')
+
+    __slots__ = FIELDS
+
+
+class Pool(Model):
+    """A pool, 'post_ids' is an array of integers."""
+
+    FIELDS = ('id', 'name', 'post_ids', 'post_count', 'category',
+              'is_active', 'is_deleted', 'created_at', 'updated_at',
+              'description', 'user_id', 'is_public')
+    INTERNED = frozenset(('category',))
+    ARRAYS = frozenset(('post_ids',))
+
+    __slots__ = FIELDS
+
+
+class Comment(Model):
+    """A comment of a post."""
+
+    FIELDS = ('id', 'post_id', 'creator_id', 'body', 'score', 'created_at',
+              'is_deleted', 'creator')
+
+    __slots__ = FIELDS
+
+
+class User(Model):
+    """A user."""
+
+    FIELDS = ('id', 'name', 'level', 'level_string', 'created_at')
+    INTERNED = frozenset(('level_string',))
+
+    __slots__ = FIELDS
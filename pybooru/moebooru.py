@@ -48,7 +48,8 @@ class Moebooru(_Pybooru, MoebooruApi_Mixin):
     """
 
     def __init__(self, site_name='', site_url='', username='', password='',
-                 hash_string='', api_version='1.13.0+update.3', proxies=None):
+                 hash_string='', api_version='1.13.0+update.3', proxies=None,
+                 **kwargs):
         """Initialize Moebooru.
 
         Keyword arguments:
@@ -64,8 +65,13 @@ class Moebooru(_Pybooru, MoebooruApi_Mixin):
                             for functions that modify the content).
             proxies (dict): Your proxies to connect to the danbooru site
                             (Required only when your network is blocked).
+            **kwargs: Request options of _Pybooru: retry, rate_limiter,
+                      cache, codec, single_flight, pool,
+                      timeout, hedging, middlewares, metrics,
+                      profiler, tracer, transport.
         """
-        super(Moebooru, self).__init__(site_name, site_url, username, proxies)
+        super(Moebooru, self).__init__(site_name, site_url, username, proxies,
+                                       **kwargs)
 
         self.api_version = api_version.lower()
         self.hash_string = hash_string
@@ -132,7 +138,7 @@ class Moebooru(_Pybooru, MoebooruApi_Mixin):
                 "Specify the 'hash_string' parameter of the Pybooru"
                 " object, for the functions that requires login.")
 
-    def _get(self, api_call, params, method='GET', file_=None):
+    def _get(self, api_call, params, method='GET', file_=None, stream=False):
         """Function to preapre API call.
 
         Parameters:
@@ -140,6 +146,8 @@ class Moebooru(_Pybooru, MoebooruApi_Mixin):
             params (dict): API function parameters.
             method (str): (Defauld: GET) HTTP method 'GET' or 'POST'
             file_ (file): File to upload.
+            stream (bool): Return a generator that yields records while the
+                           response is downloaded.
         """
         url = self._build_url(api_call)
 
@@ -155,4 +163,4 @@ class Moebooru(_Pybooru, MoebooruApi_Mixin):
             request_args = {'data': params, 'files': file_}
 
         # Do call
-        return self._request(url, api_call, request_args, method)
+        return self._request(url, api_call, request_args, method, stream)
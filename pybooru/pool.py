@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.pool
+
+This module contains the connection pool settings of Pybooru. The adapter
+mounted in the requests session of a client keeps connections alive between
+requests, closes connections idle for too long and counts how often
+connections are reused, so the pool can be sized for the number of threads
+that share a client. Connections report the time spent opening them to
+the timing breakdown of the request.
+
+Classes:
+    PoolAdapter -- requests adapter with pool settings and statistics.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import (HTTPAdapter, DEFAULT_POOLSIZE,
+                               DEFAULT_POOLBLOCK)
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import PoolManager
+
+# pybooru imports
+from . import timing
+
+
+class _TimedConnectionMixin(object):
+    """Report the time to open a urllib3 connection to pybooru.timing.
+
+    The socket connection (DNS and TCP) is timed apart, the rest of an
+    HTTPS connection is the TLS handshake.
+    """
+
+    _pybooru_tcp_time = None
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        sock = super(_TimedConnectionMixin, self)._new_conn()
+        self._pybooru_tcp_time = time.perf_counter() - start
+        return sock
+
+    def connect(self):
+        self._pybooru_tcp_time = None
+        start = time.perf_counter()
+        super(_TimedConnectionMixin, self).connect()
+        elapsed = time.perf_counter() - start
+        tls = None
+        if isinstance(self, HTTPSConnection) and self._pybooru_tcp_time:
+            tls = elapsed - self._pybooru_tcp_time
+        timing.add_connect(elapsed, tls=tls)
+
+
+class _HTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _HTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _PoolStatsMixin(object):
+    """Count discarded and expired connections of a urllib3 pool.
+
+    urllib3 already counts new connections ('num_connections') and
+    requests ('num_requests'). Connections opened by PoolAdapter.warmup()
+    are counted in 'num_warmed'. Pooled connections closed by the server or
+    idle for more than 'idle_timeout' seconds are reopened on next use.
+    """
+
+    idle_timeout = None
+    num_discarded = 0
+    num_expired = 0
+    num_reopened = 0
+    num_warmed = 0
+
+    def _get_conn(self, timeout=None):
+        conn = super(_PoolStatsMixin, self)._get_conn(timeout)
+        released = getattr(conn, 'pybooru_released', None)
+        if (self.idle_timeout is not None and released is not None and
+                conn.sock is not None and
+                time.monotonic() - released > self.idle_timeout):
+            conn.close()
+            self.num_expired += 1
+        if released is not None and conn.sock is None:
+            self.num_reopened += 1
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn.pybooru_released = time.monotonic()
+            if self.pool is not None and self.pool.full():
+                # The pool is full, urllib3 closes the connection
+                self.num_discarded += 1
+        super(_PoolStatsMixin, self)._put_conn(conn)
+
+
+class _HTTPConnectionPool(_PoolStatsMixin, HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+
+class _HTTPSConnectionPool(_PoolStatsMixin, HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+
+class _PoolManager(PoolManager):
+    """PoolManager that creates pools with statistics and idle timeout."""
+
+    def __init__(self, idle_timeout=None, **kwargs):
+        super(_PoolManager, self).__init__(**kwargs)
+        self.idle_timeout = idle_timeout
+        self.pool_classes_by_scheme = {'http': _HTTPConnectionPool,
+                                       'https': _HTTPSConnectionPool}
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super(_PoolManager, self)._new_pool(scheme, host, port,
+                                                   request_context)
+        pool.idle_timeout = self.idle_timeout
+        return pool
+
+
+class PoolAdapter(HTTPAdapter):
+    """requests adapter with connection pool settings and statistics.
+
+    An adapter can be shared by several clients, so they share their
+    connections.
+
+    Attributes:
+        pool_connections (int): Number of hosts with a pool.
+        pool_maxsize (int): Max number of connections kept per host.
+        pool_block (bool): Block when all connections to a host are in use.
+        idle_timeout (float): Seconds after an idle connection is closed.
+    """
+
+    __attrs__ = HTTPAdapter.__attrs__ + ['idle_timeout']
+
+    def __init__(self, pool_connections=DEFAULT_POOLSIZE,
+                 pool_maxsize=DEFAULT_POOLSIZE, pool_block=DEFAULT_POOLBLOCK,
+                 idle_timeout=None):
+        """Initialize PoolAdapter.
+
+        Keyword arguments:
+            pool_connections (int): Number of hosts with a pool
+                                    (Default: 10).
+            pool_maxsize (int): Max number of connections kept per host,
+                                size it as the number of threads that share
+                                a client (Default: 10).
+            pool_block (bool): Wait for a free connection when all
+                               connections to a host are in use, instead of
+                               opening a connection that is discarded after
+                               the request (Default: False).
+            idle_timeout (float): Seconds after an idle connection is closed
+                                  and reopened on next use, use a value lower
+                                  than the keep-alive timeout of the server
+                                  (Default: None, keep connections open).
+        """
+        self.idle_timeout = idle_timeout
+        super(PoolAdapter, self).__init__(pool_connections, pool_maxsize,
+                                          pool_block=pool_block)
+
+    @property
+    def pool_connections(self):
+        """Number of hosts with a pool (int)."""
+        return self._pool_connections
+
+    @property
+    def pool_maxsize(self):
+        """Max number of connections kept per host (int)."""
+        return self._pool_maxsize
+
+    @property
+    def pool_block(self):
+        """Block when all connections to a host are in use (bool)."""
+        return self._pool_block
+
+    @classmethod
+    def from_value(cls, value):
+        """Build an adapter from a constructor argument.
+
+        Parameters:
+            value (PoolAdapter, int or None): A PoolAdapter object, the max
+                                              number of connections per host,
+                                              or None for default settings.
+
+        Returns:
+            PoolAdapter object.
+        """
+        if isinstance(value, cls):
+            return value
+        if value is None:
+            return cls()
+        return cls(pool_maxsize=value)
+
+    def init_poolmanager(self, connections, maxsize,
+                         block=DEFAULT_POOLBLOCK, **pool_kwargs):
+        """Create the urllib3 PoolManager (called by HTTPAdapter)."""
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _PoolManager(
+            idle_timeout=self.idle_timeout,
+            num_pools=connections, maxsize=maxsize, block=block,
+            **pool_kwargs)
+
+    def get_pool(self, url, proxies=None, verify=True):
+        """Return the urllib3 pool used for requests to an url.
+
+        Parameters:
+            url (str): Request url.
+            proxies (dict): Proxies of the requests.
+            verify (bool or str): TLS verification of the requests.
+        """
+        if hasattr(self, 'get_connection_with_tls_context'):
+            request = requests.Request('GET', url).prepare()
+            return self.get_connection_with_tls_context(request, verify,
+                                                        proxies)
+        return self.get_connection(url, proxies)  # requests < 2.32
+
+    def warmup(self, url, connections=None, proxies=None, verify=True):
+        """Open connections to the host of an url before the first requests.
+
+        Connections are opened in parallel and put in the pool, so
+        requests don't pay TCP and TLS handshakes.
+
+        Parameters:
+            url (str): Url of the host.
+            connections (int): Connections to open (Default and max:
+                               'pool_maxsize').
+            proxies (dict): Proxies of the requests.
+            verify (bool or str): TLS verification of the requests.
+
+        Returns:
+            Number of connections opened (int).
+        """
+        pool = self.get_pool(url, proxies, verify)
+        connections = min(connections or self.pool_maxsize,
+                          self.pool_maxsize)
+        # Take connections out of the pool, so they are all different
+        conns = [pool._get_conn() for _ in range(connections)]
+        try:
+            idle = [conn for conn in conns if conn.sock is None]
+            if idle:
+                with ThreadPoolExecutor(len(idle)) as executor:
+                    list(executor.map(lambda conn: conn.connect(), idle))
+            pool.num_warmed = getattr(pool, 'num_warmed', 0) + len(idle)
+        finally:
+            for conn in conns:
+                pool._put_conn(conn)
+        return len(idle)
+
+    def stats(self):
+        """Return connection statistics of the pools.
+
+        Statistics per host have the number of 'connections' opened
+        (including reopened ones), connections opened by warmup()
+        ('warmed'), 'requests' done, connections 'discarded' because the
+        pool was full, connections closed after 'idle_timeout' ('expired')
+        and the 'reuse_ratio': requests done with a connection already
+        open, the first request on a warmed connection is a reuse. A low
+        reuse ratio with discarded connections means that 'pool_maxsize'
+        is lower than the number of threads.
+
+        Returns:
+            dict with the totals and a 'hosts' dict with stats per host.
+        """
+        names = ('connections', 'warmed', 'requests', 'discarded',
+                 'expired')
+        totals = dict.fromkeys(names, 0)
+        hosts = {}
+        for key in list(self.poolmanager.pools.keys()):
+            pool = self.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            host = "{0}://{1}:{2}".format(key.key_scheme, key.key_host,
+                                          key.key_port)
+            stats = hosts.setdefault(host, dict.fromkeys(names, 0))
+            for name, value in zip(names, (
+                    pool.num_connections + getattr(pool, 'num_reopened', 0),
+                    getattr(pool, 'num_warmed', 0),
+                    pool.num_requests,
+                    getattr(pool, 'num_discarded', 0),
+                    getattr(pool, 'num_expired', 0))):
+                stats[name] += value
+                totals[name] += value
+
+        for stats in list(hosts.values()) + [totals]:
+            # Connections opened by requests, not by warmup()
+            opened = stats['connections'] - stats['warmed']
+            reused = max(stats['requests'] - opened, 0)
+            stats['reuse_ratio'] = (float(reused) / stats['requests']
+                                    if stats['requests'] else 0.0)
+        totals['hosts'] = hosts
+        return totals
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.profiling
+
+This module contains the profiling mode of Pybooru. It attributes client
+side CPU time (of the calling thread, waits don't count) and memory
+allocated (traced with tracemalloc) to each endpoint and phase of calls:
+
+    build -- From the call of an API function to the request: parameters,
+             url and authentication.
+    request -- Sending the request and reading the response with requests
+               (sync clients only).
+    decode -- Decoding the JSON response.
+    call -- The whole API function call (sync clients only).
+
+The rest of a call (middlewares, cache, result handling) is reported as
+'other'. Memory is the growth of memory traced by tracemalloc during a phase,
+other threads allocating at the same time are counted too.
+
+Example:
+    client = Danbooru('danbooru', profiler=True)
+    ...
+    client.profiler.report()
+
+Classes:
+    Profiler -- CPU time and allocations per endpoint and phase.
+"""
+
+# __future__ imports
+from __future__ import absolute_import, print_function
+
+# External imports
+import contextlib
+import functools
+import inspect
+import sys
+import threading
+import time
+import tracemalloc
+
+# Phases of calls
+PHASES = ('build', 'request', 'decode', 'call')
+
+
+class Profiler(object):
+    """CPU time and allocations of calls, per endpoint and phase.
+
+    Like metrics, every thread records in its own shard without locks.
+
+    Attributes:
+        memory (bool): Trace allocations with tracemalloc.
+    """
+
+    def __init__(self, memory=True):
+        """Initialize Profiler.
+
+        Keyword arguments:
+            memory (bool): Trace allocations with tracemalloc, it slows down
+                           the whole program while profiling (Default: True).
+        """
+        self.memory = memory
+        self._tracing = False  # tracemalloc started by the profiler
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()  # only to register shards
+
+    def __repr__(self):
+        return "{0}(memory={1})".format(type(self).__name__, self.memory)
+
+    @classmethod
+    def from_value(cls, value):
+        """Build a profiler from a constructor argument.
+
+        Parameters:
+            value (Profiler, bool or None): A Profiler object, True for a new
+                                            one, or None/False.
+
+        Returns:
+            Profiler object or None.
+        """
+        if not value or isinstance(value, cls):
+            return value or None
+        return cls()
+
+    def start(self):
+        """Start tracing allocations, when 'memory' is set."""
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+    def stop(self):
+        """Stop tracing allocations, if the profiler started it."""
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def _get_shard(self):
+        """Return the shard of current thread, by (endpoint, phase)."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    @staticmethod
+    def _traced_memory():
+        """Return memory traced by tracemalloc, 0 when it isn't tracing."""
+        return tracemalloc.get_traced_memory()[0]
+
+    def add(self, endpoint, phase, cpu, memory=0):
+        """Add a phase of a call.
+
+        Parameters:
+            endpoint (str): Endpoint name.
+            phase (str): Phase name.
+            cpu (float): CPU seconds.
+            memory (int): Bytes allocated.
+        """
+        shard = self._get_shard()
+        totals = shard.get((endpoint, phase))
+        if totals is None:
+            totals = shard[(endpoint, phase)] = [0, 0.0, 0]
+        totals[0] += 1
+        totals[1] += cpu
+        totals[2] += max(memory, 0)
+
+    @contextlib.contextmanager
+    def span(self, endpoint, phase):
+        """Context manager that adds its block as a phase of a call.
+
+        Parameters:
+            endpoint (str): Endpoint name.
+            phase (str): Phase name.
+        """
+        memory = self._traced_memory()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self.add(endpoint, phase, time.thread_time() - cpu,
+                     self._traced_memory() - memory)
+
+    def wrap(self, function):
+        """Return an API function that marks the start of calls.
+
+        The 'build' phase ends, and the endpoint is known, when the request
+        is done (see end_build). Nested API calls are part of the outer one.
+
+        Parameters:
+            function (function): Bound API function.
+        """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if getattr(self._local, 'call', None) is not None:
+                return function(*args, **kwargs)
+            call = self._local.call = [time.thread_time(),
+                                       self._traced_memory(), None]
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                self._local.call = None
+            # Coroutines of asyncio clients run later
+            if call[2] is not None and not inspect.isawaitable(result):
+                self.add(call[2], 'call', time.thread_time() - call[0],
+                         self._traced_memory() - call[1])
+            return result
+        return wrapper
+
+    def end_build(self, endpoint):
+        """End the 'build' phase of the API call of current thread.
+
+        Parameters:
+            endpoint (str): Endpoint of the request.
+        """
+        call = getattr(self._local, 'call', None)
+        if call is not None and call[2] is None:
+            call[2] = endpoint
+            self.add(endpoint, 'build', time.thread_time() - call[0],
+                     self._traced_memory() - call[1])
+
+    def stats(self):
+        """Return profile per endpoint.
+
+        Returns:
+            dict by endpoint of dicts by phase (plus 'other': 'call' minus
+            the other phases) with 'calls', 'cpu' (seconds) and 'memory'
+            (bytes).
+        """
+        with self._lock:
+            shards = list(self._shards)
+        stats = {}
+        for shard in shards:
+            for (endpoint, phase), totals in list(shard.items()):
+                phases = stats.setdefault(endpoint, {})
+                total = phases.setdefault(
+                    phase, {'calls': 0, 'cpu': 0.0, 'memory': 0})
+                total['calls'] += totals[0]
+                total['cpu'] += totals[1]
+                total['memory'] += totals[2]
+
+        for phases in stats.values():
+            if 'call' in phases:
+                other = dict(phases['call'])
+                for phase in PHASES[:-1]:
+                    if phase in phases:
+                        other['cpu'] -= phases[phase]['cpu']
+                        other['memory'] -= phases[phase]['memory']
+                other['cpu'] = max(other['cpu'], 0.0)
+                other['memory'] = max(other['memory'], 0)
+                phases['other'] = other
+        return stats
+
+    def reset(self):
+        """Drop all collected profiles."""
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def report(self, top=10, file=None):
+        """Print the endpoints and phases that use most CPU.
+
+        When allocations are traced, the source lines that hold most traced
+        memory are printed too (without allocations of the profiler).
+
+        Parameters:
+            top (int): Number of rows of each table (Default: 10).
+            file (file): Output file (Default: sys.stdout).
+        """
+        file = file or sys.stdout
+        rows = []
+        for endpoint, phases in self.stats().items():
+            for phase, total in phases.items():
+                if phase != 'call':
+                    rows.append((total['cpu'], endpoint, phase, total))
+        rows.sort(key=lambda row: row[0], reverse=True)
+
+        print("{0:<28} {1:<8} {2:>8} {3:>10} {4:>10} {5:>12}".format(
+            'endpoint', 'phase', 'calls', 'cpu ms', 'us/call', 'bytes/call'),
+            file=file)
+        for cpu, endpoint, phase, total in rows[:top]:
+            calls = total['calls'] or 1
+            print("{0:<28} {1:<8} {2:>8} {3:>10.2f} {4:>10.1f} "
+                  "{5:>12.0f}".format(endpoint[:28], phase, total['calls'],
+                                      cpu * 1e3, cpu / calls * 1e6,
+                                      float(total['memory']) / calls),
+                  file=file)
+
+        if not tracemalloc.is_tracing():
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, pattern) for pattern in
+             (tracemalloc.__file__, functools.__file__, __file__,
+              '<frozen importlib.*>', '<unknown>')])
+        print("\nTop allocation sites (traced memory in use):", file=file)
+        for stat in snapshot.statistics('lineno')[:top]:
+            frame = stat.traceback[0]
+            print("{0:>10.1f} KiB {1:>8} blocks  {2}:{3}".format(
+                stat.size / 1024.0, stat.count, frame.filename,
+                frame.lineno), file=file)
@@ -14,12 +14,69 @@ from __future__ import absolute_import
 
 # External imports
 import re
+import json
+import time
+import inspect
+import contextlib
+import queue
+import threading
+import contextvars
 import requests
 
 # pybooru imports
 from . import __version__
 from .exceptions import (PybooruError, PybooruHTTPError)
 from .resources import (SITE_LIST, HTTP_STATUS_CODE)
+from .retry import Retry
+from .ratelimit import RateLimiter
+from .cache import BaseCache
+from .streaming import iter_json_array
+from .codec import get_codec
+from .singleflight import SingleFlight
+from .pool import PoolAdapter
+from . import timeouts
+from . import timing
+from .hedging import Hedging
+from .middleware import (Request, build_chain)
+from .metrics import Metrics
+from .profiling import Profiler
+from .tracing import (Tracer, NO_SPAN, NOOP_SPAN)
+
+
+# Sentinel queued by prefetch workers when a pagination ends
+_END_OF_PAGES = object()
+
+# Context manager used when the profiler isn't set
+_NO_PROFILE = contextlib.nullcontext()
+
+# Size of chunks read from streamed responses
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Ids in API calls, replaced to get endpoint names
+_ID_REGEX = re.compile(r'/\d+(?=/|\.|$)')
+
+
+def _split_fields(fields):
+    """Split an 'only' parameter on commas that aren't in brackets.
+
+    Parameters:
+        fields (str): Fields, e.g. 'id,media_asset[id,variants]'.
+
+    Returns:
+        List of fields (str), e.g. ['id', 'media_asset[id,variants]'].
+    """
+    names = []
+    depth = start = 0
+    for index, char in enumerate(fields):
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        elif char == ',' and not depth:
+            names.append(fields[start:index])
+            start = index + 1
+    names.append(fields[start:])
+    return [name.strip() for name in names if name.strip()]
 
 
 class _Pybooru(object):
@@ -29,10 +86,32 @@ class _Pybooru(object):
         site_name (str): Get or set site name set.
         site_url (str): Get or set the URL of Moebooru/Danbooru based site.
         username (str): Return user name.
-        last_call (dict): Return last call.
+        last_call (dict): Return last call of the current thread.
+        retry (Retry): Retry policy for failed requests.
+        rate_limiter (RateLimiter): Client side rate limiter.
+        cache (BaseCache): Cache for GET responses.
+        codec (JSONCodec): JSON codec used to decode responses.
+        single_flight (SingleFlight): Coalesces identical GET requests.
+        pool (PoolAdapter): Connection pool settings and statistics.
+        timeout (float or tuple): Timeout of requests, seconds or a
+                                  (connect, read) tuple.
+        hedging (Hedging): Hedging policy of GET requests.
+        middlewares (tuple): Middlewares called with each request.
+        metrics (Metrics): Metrics collector of calls.
+        profiler (Profiler): CPU and allocations profiler of calls.
+        tracer (Tracer): Writes spans of calls to a file.
+        transport (Transport): Adapter mounted instead of 'pool'.
     """
 
-    def __init__(self, site_name='', site_url='', username='', proxies=None):
+    # Class of request coalescing for 'single_flight' option
+    _single_flight_class = SingleFlight
+
+    def __init__(self, site_name='', site_url='', username='', proxies=None,
+                 retry=None, rate_limiter=None, cache=None, codec=None,
+                 single_flight=None, pool=None,
+                 timeout=timeouts.DEFAULT_TIMEOUT, hedging=None,
+                 middlewares=None, metrics=None, profiler=None,
+                 tracer=None, transport=None):
         """Initialize Pybooru.
 
         Keyword arguments:
@@ -40,6 +119,62 @@ class _Pybooru(object):
             site_url (str): URL of on Moebooru/Danbooru based sites.
             username (str): Your username of the site (Required only for
                             functions that modify the content).
+            proxies (dict): Proxies used by requests.
+            retry (Retry or int): Retry policy, or max number of retries
+                                  with default policy (Default: None, don't
+                                  retry).
+            rate_limiter (RateLimiter or float): Rate limiter consulted
+                                                 before every request, or
+                                                 max requests per second
+                                                 (Default: None).
+            cache (BaseCache or bool): Cache for GET responses
+                                       (MemoryCache or SQLiteCache), True
+                                       for a MemoryCache with default
+                                       options (Default: None).
+            codec (str or JSONCodec): JSON codec or its name ('orjson',
+                                      'ujson' or 'json'), (Default: None,
+                                      the fastest installed codec).
+            single_flight (SingleFlight or bool): Coalesce identical GET
+                                                  requests done at the same
+                                                  time, True to enable it
+                                                  (Default: None).
+            pool (PoolAdapter or int): Connection pool settings, or max
+                                       number of connections kept per host,
+                                       size it as the number of threads
+                                       that share the client (Default: None,
+                                       10 connections).
+            timeout (float or tuple): Timeout of connection and of each
+                                      socket read of requests, seconds or
+                                      a (connect, read) tuple, None to wait
+                                      forever (Default: (10, 60)).
+            hedging (Hedging, bool or float): Send a duplicate of GET
+                                              requests that don't answer
+                                              in time, True to hedge after
+                                              the p95 latency of endpoints
+                                              or a fixed delay in seconds
+                                              (Default: None). A hedge
+                                              takes 'rate_limiter' tokens
+                                              and a pool connection; with
+                                              sync clients the slower
+                                              request keeps them until it
+                                              ends, after the response.
+            middlewares (list): Middlewares called in order with each
+                                request (see pybooru.middleware).
+            metrics (Metrics or bool): Collect per endpoint metrics of
+                                       calls, True for a new collector
+                                       (Default: None).
+            profiler (Profiler or bool): Profile client side CPU time and
+                                         allocations per endpoint and
+                                         phase, True for a new profiler
+                                         (Default: None).
+            tracer (Tracer or str): Write tracing spans of calls, pages,
+                                    attempts, waits and decoding to a JSON
+                                    lines file, a Tracer or a file path
+                                    (Default: None).
+            transport (Transport): Record responses to a cassette or
+                                   replay them without network, a Recorder
+                                   or a Replayer (see pybooru.transport)
+                                   (Default: None, use 'pool').
 
         Raises:
             PybooruError: When 'site_name' and 'site_url' are empty.
@@ -49,13 +184,44 @@ class _Pybooru(object):
         self.__site_url = ''  # for site_url property
         self.username = username
         self.proxies = proxies
-        self.last_call = {}
+        self.retry = Retry.from_value(retry)
+        self.rate_limiter = RateLimiter.from_value(rate_limiter)
+        self.cache = BaseCache.from_value(cache)
+        self.codec = get_codec(codec)
+        self.single_flight = self._single_flight_class.from_value(
+            single_flight)
+        self.pool = PoolAdapter.from_value(pool)
+        self.transport = transport
+        self.timeout = timeout
+        self.hedging = Hedging.from_value(hedging)
+        self.metrics = Metrics.from_value(metrics)
+        self.tracer = Tracer.from_value(tracer)
+        self._middlewares = ()
+        self._chain = None  # middlewares composed by use()
+        if self.metrics is not None:
+            # First middleware, times the whole call
+            self.use(self.metrics)
+        if self.tracer is not None:
+            # Spans of user middlewares are children of the call span
+            self.use(self.tracer)
+        for middleware in middlewares or ():
+            self.use(middleware)
+        self.profiler = Profiler.from_value(profiler)
+        if self.profiler is not None:
+            self.profiler.start()
+            # Mark the start of API function calls
+            for name in dir(type(self)):
+                if (not name.startswith('_') and
+                        not hasattr(_Pybooru, name) and
+                        inspect.isfunction(getattr(type(self), name))):
+                    setattr(self, name, self.profiler.wrap(
+                        getattr(self, name)))
+        self._local = threading.local()  # for last_call property
 
         # Set HTTP Client
-        self.client = requests.Session()
         headers = {'user-agent': 'Pybooru/{0}'.format(__version__),
                    'content-type': 'application/json; charset=utf-8'}
-        self.client.headers = headers
+        self.client = self._create_client(headers)
 
         # Validate site_name or site_url
         if site_name:
@@ -66,6 +232,43 @@ class _Pybooru(object):
             raise PybooruError("Unexpected empty arguments, specify parameter "
                                "'site_name' or 'site_url'.")
 
+    @property
+    def last_call(self):
+        """Get or set information about the last call of current thread.
+
+        Every thread has its own record, so a client can be shared by
+        several threads.
+        """
+        try:
+            return self._local.last_call
+        except AttributeError:
+            self._local.last_call = {}
+            return self._local.last_call
+
+    @last_call.setter
+    def last_call(self, record):
+        """Set information about the last call of current thread.
+
+        Parameters:
+            record (dict): Call information.
+        """
+        self._local.last_call = record
+
+    @property
+    def middlewares(self):
+        """Return middlewares of the client (tuple)."""
+        return self._middlewares
+
+    def use(self, middleware):
+        """Add a middleware at the end of the chain.
+
+        Parameters:
+            middleware (function): Callable that takes a Request and the
+                                   next stage (see pybooru.middleware).
+        """
+        self._middlewares += (middleware,)
+        self._chain = build_chain(self._middlewares, self._send_request)
+
     @property
     def site_name(self):
         """Get or set site name.
@@ -134,6 +337,96 @@ class _Pybooru(object):
             raise PybooruError(
                 "Invalid URL scheme, use HTTP or HTTPS: {0}".format(url))
 
+    def _create_client(self, headers):
+        """Create the HTTP client used by _request.
+
+        Parameters:
+            headers (dict): Default headers sent with every request.
+
+        Returns:
+            requests.Session object with 'pool' adapter, or 'transport',
+            mounted.
+        """
+        adapter = self.pool
+        if self.transport is not None:
+            self.transport.bind(self.pool)
+            adapter = self.transport
+        client = requests.Session()
+        client.headers = headers
+        client.mount('https://', adapter)
+        client.mount('http://', adapter)
+        return client
+
+    def warmup(self, connections=None):
+        """Open connections to the site before the first requests.
+
+        Parameters:
+            connections (int): Connections to open (Default and max:
+                               'pool_maxsize' of 'pool').
+
+        Returns:
+            Number of connections opened (int), 0 with an offline
+            transport.
+        """
+        if self.transport is not None and self.transport.offline:
+            return 0
+        # Same proxies and TLS settings as requests, so same pool is used
+        settings = self.client.merge_environment_settings(
+            self.site_url, self.proxies or {}, None, None, None)
+        return self.pool.warmup(self.site_url, connections,
+                                settings['proxies'], settings['verify'])
+
+    def connection_stats(self):
+        """Return connection reuse statistics (see PoolAdapter.stats)."""
+        return self.pool.stats()
+
+    def timeouts(self, timeout=None, deadline=None):
+        """Context manager that sets timeout and deadline of calls.
+
+        The timeout replaces the client timeout for calls done in the block.
+        The deadline is a budget for all calls in the block: requests fail
+        with PybooruDeadlineError once it's spent. Scopes apply to the
+        current thread or asyncio task, and to calls of any client.
+
+            with client.timeouts(timeout=(3, 10), deadline=30):
+                posts = client.post_list(tags='computer')
+                tags = client.tag_list(name_matches='computer*')
+
+        Parameters:
+            timeout (float or tuple): Timeout of each request, seconds or a
+                                      (connect, read) tuple.
+            deadline (float): Seconds for all calls in the block.
+        """
+        return timeouts.scope(timeout, deadline)
+
+    @staticmethod
+    def _get_endpoint(api_call):
+        """Get endpoint name of an API call.
+
+        Parameters:
+            api_call (str): API function called, e.g. 'posts/1.json'.
+
+        Returns:
+            API call with ids replaced by '{id}', e.g. 'posts/{id}.json'.
+        """
+        return _ID_REGEX.sub('/{id}', api_call)
+
+    @staticmethod
+    def _json_error(error):
+        """Build the exception raised when a response isn't valid JSON.
+
+        Parameters:
+            error (ValueError): Error raised by the JSON codec.
+
+        Returns:
+            PybooruError object.
+        """
+        if isinstance(error, json.JSONDecodeError):
+            return PybooruError(
+                "JSON Error: {0} in line {1} column {2}".format(
+                    error.msg, error.lineno, error.colno))
+        return PybooruError("JSON Error: {0}".format(error))
+
     @staticmethod
     def _get_status(status_code):
         """Get status message for status code.
@@ -147,43 +440,584 @@ class _Pybooru(object):
         return "{0}, {1}".format(*HTTP_STATUS_CODE.get(
             status_code, ('Undefined', 'undefined')))
 
-    def _request(self, url, api_call, request_args, method='GET'):
+    def _paginate(self, fetch, params, limit=None, cursor=False,
+                  prefetch=0, deadline=None):
+        """Generator that yields every record of a list API function.
+
+        Pages are fetched one at a time, so only one page is kept in memory.
+        Iteration stops when a page has less than 'limit' records (or no
+        records when 'limit' is None).
+
+        With 'prefetch' greater than 0, a background thread fetches the
+        next pages while the current one is consumed. At most 'prefetch'
+        pages wait in the queue, so memory stays bounded.
+
+        Parameters:
+            fetch (function): API function that returns one page.
+            params (dict): Parameters for 'fetch'.
+            limit (int): Page size, sent as 'limit' parameter.
+            cursor (bool): Use id cursors ('page=b<id>') instead of page
+                           numbers (Danbooru only).
+            prefetch (int): Number of pages to fetch ahead (Default: 0).
+            deadline (float): Seconds for the whole iteration, counted from
+                              the first record requested (Default: None).
+        """
+        deadline = timeouts.Deadline.from_value(deadline)
+        span = self._start_span('paginate', limit=limit, cursor=cursor,
+                                prefetch=prefetch)
+        if prefetch > 0:
+            pages = self._prefetch_pages(fetch, params, limit, cursor,
+                                         prefetch, deadline, span)
+        else:
+            pages = self._iter_pages(fetch, params, limit, cursor, deadline,
+                                     span)
+
+        try:
+            for records in pages:
+                for record in records:
+                    yield record
+        except Exception as e:
+            span.fail(e)
+            raise
+        finally:
+            span.finish()
+
+    def _iter_pages(self, fetch, params, limit, cursor, deadline=None,
+                    span=None):
+        """Generator that yields every page of a list API function.
+
+        Parameters:
+            fetch (function): API function that returns one page.
+            params (dict): Parameters for 'fetch'.
+            limit (int): Page size.
+            cursor (bool): Use id cursors instead of page numbers.
+            deadline (Deadline): Deadline of the iteration.
+            span (Span): Span of the iteration, parent of page spans.
+        """
+        params = self._first_page(params, limit, cursor)
+        number = 1
+        while params is not None:
+            # Scope and span are set only while fetching, generators share
+            # the context of the consumer
+            with timeouts.scope(deadline=deadline), self._trace(
+                    'page', span, page=number) as page_span:
+                records = fetch(**params)
+                page_span.set(records=len(records))
+            yield records
+            params = self._next_page(params, records, limit, cursor)
+            number += 1
+
+    def _prefetch_pages(self, fetch, params, limit, cursor, depth,
+                        deadline=None, span=None):
+        """Generator that yields pages fetched by a background thread.
+
+        The thread stops when the pagination ends, when it raises an
+        exception (re-raised in the consumer) or when this generator is
+        closed.
+
+        Parameters:
+            fetch (function): API function that returns one page.
+            params (dict): Parameters for 'fetch'.
+            limit (int): Page size.
+            cursor (bool): Use id cursors instead of page numbers.
+            depth (int): Max number of pages waiting in the queue.
+            deadline (Deadline): Deadline of the iteration.
+            span (Span): Span of the iteration, parent of page spans.
+        """
+        pages = queue.Queue(maxsize=depth)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def worker():
+            try:
+                for records in self._iter_pages(fetch, params, limit, cursor,
+                                                deadline, span):
+                    if not put((records, None)):
+                        return
+                put((_END_OF_PAGES, None))
+            except Exception as e:
+                put((None, e))
+
+        # The worker runs in a copy of the consumer context, so timeout
+        # scopes of the consumer apply to it
+        thread = threading.Thread(target=contextvars.copy_context().run,
+                                  args=(worker,), name='pybooru-prefetch')
+        thread.daemon = True
+        thread.start()
+        try:
+            while True:
+                records, error = pages.get()
+                if error is not None:
+                    raise error
+                if records is _END_OF_PAGES:
+                    return
+                yield records
+        finally:
+            stop.set()
+
+    @staticmethod
+    def _first_page(params, limit, cursor):
+        """Return parameters of the first page of a pagination.
+
+        Parameters:
+            params (dict): Parameters for the API function.
+            limit (int): Page size.
+            cursor (bool): Use id cursors instead of page numbers.
+
+        Raises:
+            PybooruError: When 'stream' is set, pages are lists.
+            ValueError: When 'limit' isn't greater than 0, pages would
+                        never end ('limit=0' is the whole list on
+                        Moebooru).
+        """
+        if params.get('stream'):
+            raise PybooruError("'stream' isn't supported by paginated "
+                               "iterators, they keep one page in memory.")
+        if limit is not None and limit <= 0:
+            raise ValueError("'limit' of paginated iterators must be greater "
+                             "than 0, got {0!r}.".format(limit))
+        params = dict(params)
+        if limit is not None:
+            params['limit'] = limit
+        if not cursor and params.get('page') is None:
+            params['page'] = 1
+        if cursor and params.get('only') is not None:
+            # Cursors are ids of the last records
+            params['only'] = _Pybooru._only(params['only'], ('id',))
+        return params
+
+    @staticmethod
+    def _next_page(params, records, limit, cursor):
+        """Return parameters of the next page, or None if it was the last.
+
+        Parameters:
+            params (dict): Parameters of the current page.
+            records (list): Records of the current page.
+            limit (int): Page size.
+            cursor (bool): Use id cursors instead of page numbers.
+        """
+        if not records or (limit is not None and len(records) < limit):
+            return None
+        if cursor:
+            params['page'] = 'b{0}'.format(
+                min(record['id'] for record in records))
+        else:
+            params['page'] = int(params['page']) + 1
+        return params
+
+    @staticmethod
+    def _models(model, data, enabled=True, only=None):
+        """Return records of a list API function as model objects.
+
+        Parameters:
+            model (class): Model class (see pybooru.models).
+            data (list or generator): Records, a generator when streamed.
+            enabled (bool): Convert the records, else data is returned.
+            only (str): Fields selected by the request, models are partial
+                        (Default: None, all fields).
+        """
+        if not enabled:
+            return data
+        if isinstance(data, list):
+            return model.from_list(data, only)
+        if inspect.isgenerator(data):
+            return (model(record, only) for record in data)
+        return data
+
+    @staticmethod
+    def _only(fields, required=()):
+        """Return the 'only' parameter of Danbooru, the fields of records.
+
+        Parameters:
+            fields (str, list or dict): Field names, comma separated or in
+                                        a list. Fields of nested records
+                                        are selected with brackets
+                                        ('media_asset[id,variants]') or a
+                                        dict of names and fields
+                                        ({'media_asset': ['id',
+                                        'variants']}), at any depth.
+            required (tuple): Fields added when they aren't selected.
+
+        Returns:
+            'only' parameter (str), None when 'fields' is None.
+        """
+        if fields is None:
+            return None
+        if isinstance(fields, str):
+            names = _split_fields(fields)
+        else:
+            names = []
+            for field in ([fields] if isinstance(fields, dict) else fields):
+                if not isinstance(field, dict):
+                    names.append(field)
+                    continue
+                names.extend('{0}[{1}]'.format(name, _Pybooru._only(nested))
+                             if nested else name
+                             for name, nested in field.items())
+        selected = set(name.split('[', 1)[0] for name in names)
+        names.extend(name for name in required if name not in selected)
+        return ','.join(names)
+
+    def _request(self, url, api_call, request_args, method='GET',
+                 stream=False):
+        """Run a request through middlewares and return JSON data.
+
+        Without middlewares the request is sent directly.
+
+        Parameters:
+            url (str): Base url call.
+            api_call (str): API function to be called.
+            request_args (dict): All requests parameters.
+            method (str): (Defauld: GET) HTTP method 'GET' or 'POST'
+            stream (bool): Return a generator that decodes records of the
+                           response while it's downloaded (not cached).
+        """
+        if self.profiler is not None:
+            self.profiler.end_build(self._get_endpoint(api_call))
+        if self._chain is None:
+            return self._send(url, api_call, request_args, method, stream)
+        return self._chain(Request(self, method, url, api_call, request_args,
+                                   stream))
+
+    def _profile(self, endpoint, phase):
+        """Return a context manager that profiles a phase of a call.
+
+        Parameters:
+            endpoint (str): Endpoint name.
+            phase (str): Phase name (see pybooru.profiling).
+        """
+        if self.profiler is None:
+            return _NO_PROFILE
+        return self.profiler.span(endpoint, phase)
+
+    def _trace(self, name, parent=None, **attributes):
+        """Return a context manager that runs its block in a span.
+
+        It yields the span, or a span that records nothing when 'tracer'
+        isn't set.
+
+        Parameters:
+            name (str): Span name (see pybooru.tracing).
+            parent (Span): Parent span (Default: None, the current span).
+            **attributes: Attributes of the span.
+        """
+        if self.tracer is None:
+            return NO_SPAN
+        return self.tracer.span(name, parent, **attributes)
+
+    def _start_span(self, name, **attributes):
+        """Start a span that isn't current, end it with finish().
+
+        Returns a span that records nothing when 'tracer' isn't set.
+
+        Parameters:
+            name (str): Span name (see pybooru.tracing).
+            **attributes: Attributes of the span.
+        """
+        if self.tracer is None:
+            return NOOP_SPAN
+        return self.tracer.start_span(name, **attributes)
+
+    def _sleep(self, seconds, url, name):
+        """Wait before a request, in a span.
+
+        Parameters:
+            seconds (float): Time to wait.
+            url (str): Url of the request.
+            name (str): Span name.
+
+        Raises:
+            PybooruDeadlineError: When the deadline of the timeouts scope
+                                  expires before the wait ends.
+        """
+        timeouts.check_wait(seconds, url)
+        with self._trace(name, seconds=seconds):
+            time.sleep(seconds)
+
+    def _send_request(self, request):
+        """Last stage of middlewares, send a Request with _send."""
+        return self._send(request.url, request.api_call,
+                          request.request_args, request.method,
+                          request.stream)
+
+    def _send(self, url, api_call, request_args, method='GET',
+              stream=False):
         """Function to request and returning JSON data.
 
+        GET requests are served from 'cache' when it's set. Expired entries
+        with 'ETag' or 'Last-Modified' are revalidated with a conditional
+        request. 'last_call' tells if the response was a cache 'hit',
+        'miss' or 'revalidated'. With 'single_flight', identical GET
+        requests done at the same time share one request, 'last_call'
+        tells if the response was 'shared'.
+
         Parameters:
             url (str): Base url call.
             api_call (str): API function to be called.
             request_args (dict): All requests parameters.
             method (str): (Defauld: GET) HTTP method 'GET' or 'POST'
+            stream (bool): Return a generator that decodes records of the
+                           response while it's downloaded (not cached).
 
         Raises:
             PybooruHTTPError: HTTP Error.
-            requests.exceptions.Timeout: When HTTP Timeout.
-            ValueError: When can't decode JSON response.
+            PybooruError: When HTTP Timeout or can't decode JSON response.
+            PybooruDeadlineError: When the deadline of the timeouts scope
+                                  expires.
+            requests.exceptions.ConnectionError: When connection fails.
         """
-        try:
-            if method != 'GET':
-                # Reset content-type for data encoded as a multipart form
-                self.client.headers.update({'content-type': None})
+        endpoint = self._get_endpoint(api_call)
+        if method != 'GET' or stream:
+            return self._fetch(url, api_call, endpoint, request_args,
+                               method, stream=stream)[1]
+        if self.cache is None and self.single_flight is None:
+            return self._fetch_hedged(url, api_call, endpoint,
+                                      request_args)[1]
+
+        key = BaseCache.make_key(method, url, request_args.get('params'),
+                                 request_args.get('auth', (None,))[0])
+        if self.single_flight is None:
+            return self._get_cached(url, api_call, endpoint, request_args,
+                                    key)
+
+        (data, record), shared = self.single_flight.do(
+            key, self._get_recorded, url, api_call, endpoint, request_args,
+            key)
+        self.last_call = dict(record, shared=shared)
+        return data
+
+    def _get_recorded(self, *args):
+        """Call _get_cached and return its data and a copy of 'last_call'.
+
+        The record is passed to threads that share the request.
+        """
+        data = self._get_cached(*args)
+        return data, dict(self.last_call)
+
+    def _get_cached(self, url, api_call, endpoint, request_args, key):
+        """Do a GET request, using 'cache' when it's set.
+
+        Parameters:
+            url (str): Base url call.
+            api_call (str): API function to be called.
+            endpoint (str): Endpoint name.
+            request_args (dict): All requests parameters.
+            key (tuple): Cache key of the request.
+        """
+        if self.cache is None:
+            return self._fetch_hedged(url, api_call, endpoint,
+                                      request_args)[1]
+
+        with self._trace('cache.lookup', endpoint=endpoint) as span:
+            entry = self.cache.lookup(key)
+            span.set(result='miss' if entry is None else
+                     'hit' if entry.fresh else 'stale')
+        if entry is not None and entry.fresh:
+            self.last_call = {
+                'API': api_call,
+                'url': url,
+                'status_code': 200,
+                'status': self._get_status(200),
+                'headers': {},
+                'retries': 0,
+                'bytes': 0,
+                'timings': None,
+                'cache': 'hit'
+                }
+            return entry.value
+
+        validators = entry.get_validators() if entry is not None else None
+        status_code, data, body, headers = self._fetch_hedged(
+            url, api_call, endpoint, request_args, validators)
+        if status_code == 304:
+            self.cache.refresh(key, endpoint)
+            self.last_call['cache'] = 'revalidated'
+            return entry.value
+
+        self.last_call['cache'] = 'miss'
+        if status_code == 200:
+            self.cache.set(key, data, body, endpoint, headers.get('etag'),
+                           headers.get('last-modified'))
+        return data
+
+    def _fetch_hedged(self, url, api_call, endpoint, request_args,
+                      validators=None):
+        """Do a GET request with _fetch, hedged when 'hedging' is set.
+
+        'last_call' tells if a duplicate request was 'hedged'.
+
+        Parameters:
+            url (str): Base url call.
+            api_call (str): API function to be called.
+            endpoint (str): Endpoint name.
+            request_args (dict): All requests parameters.
+            validators (dict): Conditional request headers.
+        """
+        if self.hedging is None:
+            return self._fetch(url, api_call, endpoint, request_args, 'GET',
+                               validators)
+
+        (result, record), hedged = self.hedging.run(
+            endpoint, self._fetch_recorded, url, api_call, endpoint,
+            request_args, 'GET', validators)
+        self.last_call = dict(record, hedged=hedged)
+        return result
 
-            response = self.client.request(method, url, proxies=self.proxies, **request_args)
+    def _fetch_recorded(self, *args):
+        """Call _fetch and return its result and a copy of 'last_call'.
 
-            self.last_call.update({
+        Hedged requests run in other threads, the record is passed to the
+        caller thread.
+        """
+        result = self._fetch(*args)
+        return result, dict(self.last_call)
+
+    def _fetch(self, url, api_call, endpoint, request_args, method,
+               validators=None, stream=False):
+        """Do a request and return its status, decoded data and body.
+
+        Every attempt waits for 'rate_limiter'. Failed requests are retried
+        according to 'retry' policy. The number of retries is stored in
+        'last_call', with the 'timings' of the last attempt (see
+        pybooru.timing). Requests, retries and waits are limited by
+        'timeout' and by the deadline of the current timeouts scope.
+
+        Parameters:
+            url (str): Base url call.
+            api_call (str): API function to be called.
+            endpoint (str): Endpoint name.
+            request_args (dict): All requests parameters.
+            method (str): HTTP method.
+            validators (dict): Conditional request headers, a 304 response
+                               is accepted when they are set.
+            stream (bool): Decode the response while it's downloaded, data
+                           is a generator and body is None.
+
+        Returns:
+            Tuple with status code, decoded data, response body and
+            response headers.
+        """
+        # Headers are passed per request, the session is shared by threads
+        headers = dict(validators) if validators else {}
+        if method != 'GET':
+            # Reset content-type for data encoded as a multipart form
+            headers['content-type'] = None
+        if headers:
+            request_args = dict(request_args, headers=headers)
+
+        retries = 0
+        while True:
+            if self.rate_limiter is not None:
+                wait = self.rate_limiter.reserve(method, endpoint)
+                if wait > 0:
+                    self._sleep(wait, url, 'ratelimit.wait')
+
+            connect, read, _ = timeouts.resolve(self.timeout, url)
+            timings = timing.new_timings()
+            try:
+                with self._trace('http', method=method, endpoint=endpoint,
+                                 attempt=retries) as span:
+                    with timing.collect(timings), self._profile(endpoint,
+                                                                'request'):
+                        response = self.client.request(
+                            method, url, proxies=self.proxies,
+                            stream=stream, timeout=(connect, read),
+                            hooks={'response': timing.response_hook},
+                            **request_args)
+                    span.set(status_code=response.status_code,
+                             bytes=None if stream else len(response.content),
+                             reused=timings['reused'])
+            except (requests.exceptions.Timeout,
+                    requests.exceptions.ConnectionError) as e:
+                if self.retry is not None and self.retry.is_retry(method,
+                                                                  retries):
+                    self._sleep(self.retry.get_backoff(retries), url,
+                                'retry.wait')
+                    retries += 1
+                    continue
+                # Timeouts are capped to the deadline
+                timeouts.check_deadline(url)
+                if isinstance(e, requests.exceptions.Timeout):
+                    raise PybooruError("Timeout! url: {0}".format(url))
+                raise
+
+            # The body of responses that aren't streamed is read before
+            # requests returns them
+            timings['ttfb'] = max(response.elapsed.total_seconds() -
+                                  timings['connect'], 0.0)
+            if not stream:
+                timings['download'] = (time.perf_counter() -
+                                       response.pybooru_received)
+
+            self.last_call = {
                 'API': api_call,
                 'url': response.url,
                 'status_code': response.status_code,
                 'status': self._get_status(response.status_code),
-                'headers': response.headers
-                })
-
-            if response.status_code in (200, 201, 202):
-                return response.json()
+                'headers': response.headers,
+                'retries': retries,
+                'bytes': None if stream else len(response.content),
+                'timings': timings,
+                'cache': None
+                }
+
+            if response.status_code in (200, 201, 202) and stream:
+                return (response.status_code, self._stream_records(response),
+                        None, response.headers)
+            elif response.status_code in (200, 201, 202):
+                start = time.perf_counter()
+                try:
+                    with self._profile(endpoint, 'decode'), self._trace(
+                            'decode', bytes=len(response.content)):
+                        data = self.codec.loads(response.content)
+                except ValueError as e:
+                    raise self._json_error(e)
+                timings['decode'] = time.perf_counter() - start
+                return (response.status_code, data, response.content,
+                        response.headers)
             elif response.status_code == 204:
-                return True
+                return response.status_code, True, b'', response.headers
+            elif response.status_code == 304 and validators:
+                return response.status_code, None, b'', response.headers
+
+            response.close()
+            if self.retry is not None and self.retry.is_retry(
+                    method, retries, response.status_code):
+                retry_after = response.headers.get('retry-after')
+                delay = self.retry.get_backoff(retries, retry_after)
+                if delay is not None:
+                    self._sleep(delay, url, 'retry.wait')
+                    retries += 1
+                    continue
+                # The server doesn't allow a retry before backoff_max
+                self.last_call['retry_after'] = (
+                    self.retry.parse_retry_after(retry_after))
             raise PybooruHTTPError("In _request", response.status_code,
                                    response.url)
-        except requests.exceptions.Timeout:
-            raise PybooruError("Timeout! url: {0}".format(response.url))
+
+    @staticmethod
+    def _stream_records(response):
+        """Generator that yields records of a response while downloading.
+
+        Parameters:
+            response (requests.Response): Response opened with stream=True.
+
+        Raises:
+            PybooruError: When can't decode JSON response.
+        """
+        try:
+            for record in iter_json_array(
+                    response.iter_content(STREAM_CHUNK_SIZE)):
+                yield record
         except ValueError as e:
-            raise PybooruError("JSON Error: {0} in line {1} column {2}".format(
-                e.msg, e.lineno, e.colno))
+            raise _Pybooru._json_error(e)
+        finally:
+            response.close()
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.ratelimit
+
+This module contains client side rate limiting for Pybooru. Staying under
+the request rate of a site is faster than hitting 421/429 errors and
+backing off.
+
+Classes:
+    TokenBucket -- Thread safe token bucket.
+    SQLiteTokenBucket -- Token bucket shared between processes of one host.
+    RateLimiter -- Groups buckets per site, endpoint class and endpoint.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import sqlite3
+import threading
+import time
+
+
+class TokenBucket(object):
+    """Thread safe token bucket.
+
+    Tokens are added at 'rate' per second up to 'capacity'. Every request
+    takes one token; when there are no tokens left the request is scheduled
+    after the requests already waiting, so callers are served in order.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        capacity (float): Max number of tokens (burst size).
+    """
+
+    def __init__(self, rate, capacity=None):
+        """Initialize TokenBucket.
+
+        Keyword arguments:
+            rate (float): Tokens added per second.
+            capacity (float): Max number of tokens (Default: same as rate,
+                              at least 1).
+        """
+        if rate <= 0:
+            raise ValueError("'rate' must be greater than 0.")
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "{0}(rate={1}, capacity={2})".format(
+            type(self).__name__, self.rate, self.capacity)
+
+    def _take(self, tokens, available, updated, now):
+        """Refill and take tokens from a bucket state.
+
+        Parameters:
+            tokens (float): Tokens to take.
+            available (float): Tokens in the bucket at 'updated' time.
+            updated (float): Time of last update.
+            now (float): Current time.
+
+        Returns:
+            Tuple with the new number of tokens and seconds to wait.
+        """
+        available = min(self.capacity,
+                        available + (now - updated) * self.rate) - tokens
+        wait = 0.0 if available >= 0 else -available / self.rate
+        return available, wait
+
+    def reserve(self, tokens=1):
+        """Take tokens without blocking.
+
+        Parameters:
+            tokens (float): Tokens to take (Default: 1).
+
+        Returns:
+            Seconds to wait before doing the request (float).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens, wait = self._take(tokens, self._tokens,
+                                            self._updated, now)
+            self._updated = now
+        return wait
+
+    def acquire(self, tokens=1):
+        """Take tokens, blocking until they are available.
+
+        Parameters:
+            tokens (float): Tokens to take (Default: 1).
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """Token bucket stored in a sqlite database.
+
+    All processes (and threads) using the same database file and bucket
+    name share the same budget.
+
+    Attributes:
+        path (str): Path of the sqlite database.
+        name (str): Name of the bucket.
+        rate (float): Tokens added per second.
+        capacity (float): Max number of tokens (burst size).
+    """
+
+    def __init__(self, path, name, rate, capacity=None, timeout=30):
+        """Initialize SQLiteTokenBucket.
+
+        Keyword arguments:
+            path (str): Path of the sqlite database, it's created if it
+                        doesn't exist.
+            name (str): Name of the bucket, e.g. 'danbooru-read'.
+            rate (float): Tokens added per second.
+            capacity (float): Max number of tokens (Default: same as rate,
+                              at least 1).
+            timeout (float): Seconds to wait for the database lock.
+        """
+        super(SQLiteTokenBucket, self).__init__(rate, capacity)
+        self.path = path
+        self.name = name
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS pybooru_buckets ("
+            "name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def _connect(self):
+        """Return the sqlite connection of the current thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout,
+                                   isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, tokens=1):
+        """Take tokens without blocking.
+
+        Parameters:
+            tokens (float): Tokens to take (Default: 1).
+
+        Returns:
+            Seconds to wait before doing the request (float).
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM pybooru_buckets WHERE name = ?",
+                (self.name,)).fetchone()
+            available, updated = row if row else (self.capacity, now)
+            available, wait = self._take(tokens, available, updated, now)
+            conn.execute(
+                "INSERT OR REPLACE INTO pybooru_buckets VALUES (?, ?, ?)",
+                (self.name, available, now))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return wait
+
+
+class RateLimiter(object):
+    """Groups token buckets applied to each request.
+
+    A request takes a token from every bucket that applies to it: the site
+    bucket, the bucket of its endpoint class ('read' for GET requests and
+    'write' for the rest) and the bucket of its endpoint. Endpoints are
+    named like Pybooru API calls with ids replaced by '{id}', e.g.
+    'posts.json', 'posts/{id}.json' or 'post/create'.
+
+    Buckets can be shared by several clients, threads or (with
+    SQLiteTokenBucket) processes.
+
+    Attributes:
+        site (TokenBucket): Bucket for all requests.
+        read (TokenBucket): Bucket for GET requests.
+        write (TokenBucket): Bucket for POST, PUT and DELETE requests.
+        endpoints (dict): Buckets per endpoint.
+    """
+
+    def __init__(self, site=None, read=None, write=None, endpoints=None):
+        """Initialize RateLimiter.
+
+        Each bucket argument can be a TokenBucket or a rate (requests per
+        second).
+
+        Keyword arguments:
+            site (TokenBucket or float): Bucket for all requests.
+            read (TokenBucket or float): Bucket for GET requests.
+            write (TokenBucket or float): Bucket for the rest of requests.
+            endpoints (dict): Buckets (or rates) per endpoint.
+        """
+        self.site = self._bucket(site)
+        self.read = self._bucket(read)
+        self.write = self._bucket(write)
+        self.endpoints = dict((endpoint, self._bucket(bucket)) for
+                              endpoint, bucket in (endpoints or {}).items())
+
+    @staticmethod
+    def _bucket(value):
+        """Return a TokenBucket for a bucket or rate value."""
+        if value is None or isinstance(value, TokenBucket):
+            return value
+        return TokenBucket(value)
+
+    @classmethod
+    def from_value(cls, value):
+        """Build a rate limiter from a constructor argument.
+
+        Parameters:
+            value (RateLimiter, float or None): A RateLimiter object, a
+                                                rate for all requests or None.
+
+        Returns:
+            RateLimiter object or None.
+        """
+        if value is None or isinstance(value, cls):
+            return value
+        return cls(site=value)
+
+    def _buckets(self, method, endpoint):
+        """Yield buckets that apply to a request."""
+        if self.site is not None:
+            yield self.site
+        bucket = self.read if method == 'GET' else self.write
+        if bucket is not None:
+            yield bucket
+        bucket = self.endpoints.get(endpoint)
+        if bucket is not None:
+            yield bucket
+
+    def reserve(self, method, endpoint):
+        """Take tokens for a request without blocking.
+
+        Parameters:
+            method (str): HTTP method.
+            endpoint (str): Endpoint name.
+
+        Returns:
+            Seconds to wait before doing the request (float).
+        """
+        return max([bucket.reserve() for bucket in
+                    self._buckets(method, endpoint)] or [0.0])
+
+    def acquire(self, method, endpoint):
+        """Take tokens for a request, blocking until they are available.
+
+        Parameters:
+            method (str): HTTP method.
+            endpoint (str): Endpoint name.
+        """
+        wait = self.reserve(method, endpoint)
+        if wait > 0:
+            time.sleep(wait)
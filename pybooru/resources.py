@@ -39,17 +39,24 @@ HTTP_STATUS_CODE = {
           "processing has not been completed."),
     204: ("No Content", "The server successfully processed the request and is "
           "not returning any content."),
+    304: ("Not Modified", "The resource has not been modified since the "
+          "version specified by the request headers"),
     400: ("Bad request", "The server cannot or will not process the request"),
     401: ("Unauthorized", "Authentication is required and has failed or has "
           "not yet been provided."),
     403: ("Forbidden", "Access denied"),
     404: ("Not Found", "Not found"),
+    410: ("Gone", "Page limit exceeded, use id cursors for deep pages"),
     420: ("Invalid Record", "Record could not be saved"),
     421: ("User Throttled", "User is throttled, try again later"),
     422: ("Locked", "The resource is locked and cannot be modified"),
     423: ("Already Exists", "Resource already exists"),
     424: ("Invalid Parameters", "The given parameters were invalid"),
+    429: ("Too Many Requests", "The user has sent too many requests in a "
+          "given amount of time"),
     500: ("Internal Server Error", "Some unknown error occurred on the server"),
+    502: ("Bad Gateway", "The server received an invalid response from the "
+          "upstream server"),
     503: ("Service Unavailable", "Server cannot currently handle the request"),
     504: ("Gateway Timeout", "The server timed out while waiting for a response")
     }
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.retry
+
+This module contains the retry policy used by Pybooru when a request fails
+because of throttling, a temporary server error or a connection problem.
+
+Classes:
+    Retry -- Retry policy with jittered exponential backoff.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import math
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+
+class Retry(object):
+    """Retry policy with jittered exponential backoff.
+
+    The delay before retry number 'n' (starting from 0) is a random value
+    between 0 and min(backoff_max, backoff_factor * 2 ** n). When the
+    response has a 'Retry-After' header, its value is used instead; when
+    it's longer than backoff_max the request isn't retried before the
+    server allows it, the error is raised and 'last_call' has the
+    'retry_after' delay.
+
+    Attributes:
+        total (int): Max number of retries (attempts minus one).
+        backoff_factor (float): Base delay in seconds.
+        backoff_max (float): Max delay in seconds of exponential backoff
+                             and of retries after 'Retry-After' delays.
+        jitter (bool): Randomize delays to avoid retry storms.
+        status_forcelist (frozenset): HTTP status codes that are retried.
+        methods (frozenset): HTTP methods that are retried.
+        respect_retry_after (bool): Use 'Retry-After' header when present.
+    """
+
+    #: User Throttled, Too Many Requests and temporary server errors.
+    DEFAULT_STATUS_FORCELIST = frozenset((421, 429, 502, 503, 504))
+    #: Idempotent HTTP methods.
+    DEFAULT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'))
+
+    def __init__(self, total=3, backoff_factor=0.5, backoff_max=60,
+                 jitter=True, status_forcelist=None, methods=None,
+                 respect_retry_after=True):
+        """Initialize Retry.
+
+        Keyword arguments:
+            total (int): Max number of retries (Default: 3).
+            backoff_factor (float): Base delay in seconds (Default: 0.5).
+            backoff_max (float): Max delay in seconds of exponential
+                                 backoff, requests with a longer
+                                 'Retry-After' aren't retried
+                                 (Default: 60).
+            jitter (bool): Randomize delays (Default: True).
+            status_forcelist (iterable): HTTP status codes that are retried
+                                         (Default: 421, 429, 502, 503, 504).
+            methods (iterable): HTTP methods that are retried (Default:
+                                idempotent methods, POST isn't retried).
+            respect_retry_after (bool): Use 'Retry-After' header when
+                                        present (Default: True).
+        """
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.status_forcelist = frozenset(
+            self.DEFAULT_STATUS_FORCELIST if status_forcelist is None
+            else status_forcelist)
+        self.methods = frozenset(
+            self.DEFAULT_METHODS if methods is None
+            else (method.upper() for method in methods))
+        self.respect_retry_after = respect_retry_after
+
+    def __repr__(self):
+        return "Retry(total={0}, backoff_factor={1}, backoff_max={2})".format(
+            self.total, self.backoff_factor, self.backoff_max)
+
+    @classmethod
+    def from_value(cls, value):
+        """Build a retry policy from a constructor argument.
+
+        Parameters:
+            value (Retry, int or None): A Retry object, a number of retries
+                                        or None to disable retries.
+
+        Returns:
+            Retry object or None.
+        """
+        if value is None or isinstance(value, cls):
+            return value
+        return cls(total=int(value))
+
+    def is_retry(self, method, retries, status_code=None):
+        """Check if a failed request should be retried.
+
+        Parameters:
+            method (str): HTTP method.
+            retries (int): Number of retries already done.
+            status_code (int): HTTP status code, None for connection errors.
+        """
+        if retries >= self.total or method.upper() not in self.methods:
+            return False
+        return status_code is None or status_code in self.status_forcelist
+
+    def get_backoff(self, retries, retry_after=None):
+        """Return seconds to wait before the next retry.
+
+        Parameters:
+            retries (int): Number of retries already done.
+            retry_after (str): Value of 'Retry-After' header.
+
+        Returns:
+            Seconds (float), None when 'Retry-After' is longer than
+            'backoff_max': the request must not be retried.
+        """
+        if self.respect_retry_after and retry_after:
+            delay = self.parse_retry_after(retry_after)
+            if delay is not None:
+                return delay if delay <= self.backoff_max else None
+
+        delay = min(self.backoff_max, self.backoff_factor * (2 ** retries))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    @staticmethod
+    def parse_retry_after(value):
+        """Parse 'Retry-After' header value.
+
+        Parameters:
+            value (str): Delay in seconds or HTTP date.
+
+        Returns:
+            Seconds to wait (float) or None if value is invalid or isn't
+            finite.
+        """
+        value = value.strip()
+        try:
+            delay = float(value)
+        except ValueError:
+            pass
+        else:
+            return max(0.0, delay) if math.isfinite(delay) else None
+
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            return None
+        if date is None:
+            return None
+        return max(0.0, date.timestamp() - time.time())
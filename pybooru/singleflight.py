@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.singleflight
+
+This module contains request coalescing for Pybooru. While a request is in
+flight, identical requests wait for it and share its result (or its
+exception) instead of doing their own request. Waiters still fail when the
+deadline of their timeouts scope expires.
+
+Classes:
+    SingleFlight -- Request coalescing for threads.
+    AsyncSingleFlight -- Request coalescing for asyncio tasks.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import asyncio
+import threading
+
+# pybooru imports
+from . import timeouts
+
+
+class _Call(object):
+    """A call in flight."""
+
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class _AsyncCall(object):
+    """A call in flight, done by a task that its callers share."""
+
+    __slots__ = ('task', 'callers')
+
+    def __init__(self, task):
+        self.task = task
+        self.callers = 0
+
+
+class SingleFlight(object):
+    """Request coalescing for threads.
+
+    Attributes:
+        calls (int): Number of calls done.
+        shared (int): Number of calls that got the result of another call.
+    """
+
+    def __init__(self):
+        """Initialize SingleFlight."""
+        self.calls = 0
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_value(cls, value):
+        """Build request coalescing from a constructor argument.
+
+        Parameters:
+            value (SingleFlight or bool): A SingleFlight object, True for a
+                new one, or None/False to disable it.
+
+        Returns:
+            SingleFlight object or None.
+        """
+        if not value or isinstance(value, cls):
+            return value or None
+        return cls()
+
+    def do(self, key, function, *args, **kwargs):
+        """Call a function, or wait for the call in flight with same key.
+
+        Parameters:
+            key (hashable): Identifies identical calls.
+            function (function): Function to call.
+            *args: Arguments of the function.
+            **kwargs: Keyword arguments of the function.
+
+        Returns:
+            Tuple with the result of the function and a bool that is True
+            when the result was shared by another call.
+
+        Raises:
+            PybooruDeadlineError: When the deadline of the timeouts scope
+                                  expires while waiting.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            # remaining() raises once the deadline expired
+            while not call.event.wait(timeouts.remaining()):
+                pass
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = function(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+    def stats(self):
+        """Return coalescing statistics (dict with calls and shared)."""
+        return {'calls': self.calls, 'shared': self.shared}
+
+
+class AsyncSingleFlight(object):
+    """Request coalescing for asyncio tasks.
+
+    Attributes:
+        calls (int): Number of calls done.
+        shared (int): Number of calls that got the result of another call.
+    """
+
+    def __init__(self):
+        """Initialize AsyncSingleFlight."""
+        self.calls = 0
+        self.shared = 0
+        self._calls = {}
+
+    @classmethod
+    def from_value(cls, value):
+        """Build request coalescing from a constructor argument.
+
+        Parameters:
+            value (AsyncSingleFlight or bool): An AsyncSingleFlight object,
+                True for a new one, or None/False to disable it.
+
+        Returns:
+            AsyncSingleFlight object or None.
+        """
+        if not value or isinstance(value, cls):
+            return value or None
+        return cls()
+
+    async def do(self, key, function, *args, **kwargs):
+        """Await a coroutine function, or the call in flight with same key.
+
+        The call runs in its own task, so a caller that is cancelled
+        doesn't cancel it for the others. It's cancelled when all its
+        callers are.
+
+        Parameters:
+            key (hashable): Identifies identical calls.
+            function (function): Coroutine function to call.
+            *args: Arguments of the function.
+            **kwargs: Keyword arguments of the function.
+
+        Returns:
+            Tuple with the result of the function and a bool that is True
+            when the result was shared by another call.
+        """
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.get_running_loop().create_task(
+                function(*args, **kwargs))
+            call = self._calls[key] = _AsyncCall(task)
+            self.calls += 1
+            shared = False
+        else:
+            self.shared += 1
+            shared = True
+
+        call.callers += 1
+        try:
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.callers -= 1
+            if not call.callers:
+                del self._calls[key]
+                call.task.cancel()
+
+    def stats(self):
+        """Return coalescing statistics (dict with calls and shared)."""
+        return {'calls': self.calls, 'shared': self.shared}
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.streaming
+
+This module contains an incremental JSON parser for list responses. Records
+of a JSON array are decoded as soon as they are downloaded, so huge
+responses (e.g. Moebooru tag_list(limit=0)) use almost constant memory.
+
+Classes:
+    JSONArrayParser -- Push parser that returns records of a JSON array.
+
+Functions:
+    iter_json_array -- Yield records of a JSON array from byte chunks.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import codecs
+import json
+import re
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Parser states
+_START = 0  # Before '['
+_FIRST = 1  # After '[', a value or ']'
+_VALUE = 2  # After ',', a value
+_NEXT = 3  # After a value, ',' or ']'
+_END = 4  # After ']'
+_DOCUMENT = 5  # Response isn't an array, decoded when it ends
+
+
+class JSONArrayParser(object):
+    """Push parser that returns records of a JSON array.
+
+    Feed it with chunks of the response body, every call returns the
+    records completed by that chunk. If the response isn't an array, the
+    whole document is returned by close().
+
+    Example:
+        parser = JSONArrayParser()
+        for chunk in chunks:
+            for record in parser.feed(chunk):
+                ...
+        for record in parser.close():
+            ...
+    """
+
+    def __init__(self, encoding='utf-8'):
+        """Initialize JSONArrayParser.
+
+        Keyword arguments:
+            encoding (str): Encoding of the chunks (Default: utf-8).
+        """
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder(encoding)()
+        self._buffer = ''
+        self._state = _START
+
+    def feed(self, chunk):
+        """Add a chunk of the body and return completed records.
+
+        Parameters:
+            chunk (bytes): Next chunk of the response body.
+
+        Raises:
+            ValueError: When the JSON document is invalid.
+        """
+        return self._parse(self._text.decode(chunk), False)
+
+    def close(self):
+        """Finish parsing and return the remaining records.
+
+        Raises:
+            ValueError: When the JSON document is invalid or incomplete.
+        """
+        records = self._parse(self._text.decode(b'', True), True)
+        if self._state != _END:
+            raise json.JSONDecodeError("Incomplete JSON document",
+                                       self._buffer, len(self._buffer))
+        return records
+
+    def _parse(self, text, final):
+        """Parse buffered text plus 'text', keep the incomplete tail."""
+        buffer = self._buffer + text if self._buffer else text
+        pos = 0
+        state = self._state
+        records = []
+        decode = self._decoder.raw_decode
+
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+
+            if state == _START:
+                if buffer[pos] == '[':
+                    state = _FIRST
+                    pos += 1
+                else:
+                    state = _DOCUMENT
+            elif state == _DOCUMENT:
+                if not final:
+                    break
+                value, pos = decode(buffer, pos)
+                records.append(value)
+                state = _END
+            elif state == _NEXT:
+                if buffer[pos] == ',':
+                    state = _VALUE
+                elif buffer[pos] == ']':
+                    state = _END
+                else:
+                    raise json.JSONDecodeError("Expecting ',' delimiter",
+                                               buffer, pos)
+                pos += 1
+            elif state == _END:
+                raise json.JSONDecodeError("Extra data", buffer, pos)
+            elif state == _FIRST and buffer[pos] == ']':
+                state = _END
+                pos += 1
+            else:
+                try:
+                    value, end = decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break
+                # A number may continue in the next chunk ('1.' of '1.5'),
+                # it ends at a delimiter
+                if not final and not isinstance(value, (dict, list)):
+                    after = _WHITESPACE.match(buffer, end).end()
+                    if after == len(buffer) or buffer[after] not in ',]':
+                        break
+                records.append(value)
+                pos = end
+                state = _NEXT
+
+        self._buffer = buffer[pos:]
+        self._state = state
+        return records
+
+
+def iter_json_array(chunks, encoding='utf-8'):
+    """Yield records of a JSON array from an iterable of byte chunks.
+
+    Parameters:
+        chunks (iterable): Chunks of the response body.
+        encoding (str): Encoding of the chunks (Default: utf-8).
+
+    Raises:
+        ValueError: When the JSON document is invalid or incomplete.
+    """
+    parser = JSONArrayParser(encoding)
+    for chunk in chunks:
+        for record in parser.feed(chunk):
+            yield record
+    for record in parser.close():
+        yield record
@@ -0,0 +1,993 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.testing
+
+This module contains a fake Danbooru/Moebooru server for load tests and
+benchmarks. It runs in threads of the current process and serves the
+endpoints used by the API mixins (posts, tags, pools, comments, users,
+uploads, ...) from a synthetic dataset. Records are generated from their
+ids when they are requested, so a dataset of millions of posts takes no
+memory.
+
+The server can be slowed down and made unreliable like a real site:
+
+    latency -- Seconds before every response, or (min, max) for a random
+               latency.
+    bandwidth -- Bytes per second of response bodies.
+    rate, burst -- Requests per second accepted, more requests are
+                   throttled (429 on Danbooru, 421 on Moebooru) with a
+                   'Retry-After' header in fractional seconds.
+    error_rate -- Fraction of requests that fail with a server error.
+    padding -- Bytes added to every record, for bigger payloads.
+
+Danbooru records are limited to the fields of an 'only' parameter, with
+nested fields in brackets ('id,media_asset[variants[url]]').
+
+GET responses have an 'ETag', a request with a matching 'If-None-Match'
+header gets a '304 Not Modified' response. Files ('/data/<name>', e.g. the
+md5 and extension of a post) are 'file_size' random bytes, for download
+benchmarks.
+
+Example:
+    with FakeBooru(posts=100000, latency=0.02, rate=50) as server:
+        client = server.client(retry=Retry(total=5))
+        for post in client.iter_posts(tags='smile'):
+            ...
+        print(server.stats())
+
+Classes:
+    Dataset -- Synthetic records of a site.
+    FakeBooru -- Fake Danbooru or Moebooru server.
+
+Functions:
+    make_post -- Build a Danbooru post.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import fnmatch
+import functools
+import gzip
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+# pybooru imports
+from .danbooru import Danbooru
+from .exceptions import PybooruError
+from .moebooru import Moebooru
+from .pybooru import _split_fields
+from .resources import HTTP_STATUS_CODE
+
+# General tags of synthetic posts
+WORDS = ('long_hair', 'short_hair', 'blush', 'smile', 'open_mouth',
+         'blue_eyes', 'skirt', 'looking_at_viewer', 'simple_background',
+         'multiple_girls', 'hat', 'thighhighs', 'bow', 'jacket', 'outdoors',
+         'sky', 'cloud', 'tree', 'school_uniform', 'gloves', 'ribbon',
+         'holding', 'standing', 'sitting', 'animal_ears', 'food', 'flower')
+
+# Tag categories, in Danbooru order
+TAG_CATEGORIES = ('general', 'artist', None, 'copyright', 'character')
+
+FLAVORS = ('danbooru', 'moebooru')
+
+# Danbooru and Moebooru names of resources with specific records
+_RESOURCES = {'posts': 'posts', 'post': 'posts', 'tags': 'tags',
+              'tag': 'tags', 'pools': 'pools', 'pool': 'pools',
+              'comments': 'comments', 'comment': 'comments',
+              'users': 'users', 'user': 'users', 'uploads': 'uploads'}
+
+# Moebooru actions that modify records
+_WRITE_ACTIONS = frozenset(('create', 'update', 'destroy', 'vote',
+                            'add_post', 'remove_post', 'revert', 'revert_tags',
+                            'lock', 'unlock'))
+
+_DATE = '20{0:02d}-{1:02d}-{2:02d}T{3:02d}:{4:02d}:{5:02d}.000-04:00'
+
+
+def make_post(post_id, rng=None):
+    """Build a Danbooru post (dict) with the fields of posts.json.
+
+    Parameters:
+        post_id (int): Post id, also the seed of other values.
+        rng (random.Random): Random generator (Default: seeded by post_id).
+    """
+    rng = rng or random.Random(post_id)
+    md5 = hashlib.md5(str(post_id).encode('ascii')).hexdigest()
+    general = ' '.join(rng.sample(WORDS, rng.randint(5, 20)))
+    artist = 'artist_{0}'.format(rng.randint(1, 5000))
+    character = 'character_{0}'.format(rng.randint(1, 20000))
+    copyright = 'copyright_{0}'.format(rng.randint(1, 2000))
+    file_ext = rng.choice(('jpg', 'jpg', 'png', 'gif', 'webm'))
+    width, height = rng.randint(300, 4000), rng.randint(300, 4000)
+    date = _DATE.format(
+        rng.randint(5, 24), rng.randint(1, 12), rng.randint(1, 28),
+        rng.randint(0, 23), rng.randint(0, 59), rng.randint(0, 59))
+    url = 'https://cdn.donmai.us/{0}/{1}/{2}/{3}'
+    score = rng.randint(-5, 500)
+    return {
+        'id': post_id,
+        'created_at': date,
+        'uploader_id': rng.randint(1, 900000),
+        'score': score,
+        'source': 'https://www.pixiv.net/artworks/{0}'.format(
+            rng.randint(1, 10 ** 8)),
+        'md5': md5,
+        'last_comment_bumped_at': None,
+        'rating': rng.choice(('g', 's', 'q', 'e')),
+        'image_width': width,
+        'image_height': height,
+        'tag_string': ' '.join((general, artist, character, copyright)),
+        'fav_count': rng.randint(0, 1000),
+        'file_ext': file_ext,
+        'last_noted_at': None,
+        'parent_id': rng.choice((None, None, None, rng.randint(1, post_id))),
+        'has_children': rng.random() < 0.1,
+        'approver_id': rng.choice((None, rng.randint(1, 1000))),
+        'tag_count_general': general.count(' ') + 1,
+        'tag_count_artist': 1,
+        'tag_count_character': 1,
+        'tag_count_copyright': 1,
+        'file_size': rng.randint(10 ** 4, 10 ** 7),
+        'up_score': score + 2,
+        'down_score': -2,
+        'is_pending': False,
+        'is_flagged': False,
+        'is_deleted': rng.random() < 0.02,
+        'tag_count': general.count(' ') + 4,
+        'updated_at': date,
+        'is_banned': False,
+        'pixiv_id': rng.choice((None, rng.randint(1, 10 ** 8))),
+        'last_commented_at': None,
+        'has_active_children': False,
+        'bit_flags': 0,
+        'tag_count_meta': 0,
+        'has_large': width > 850,
+        'has_visible_children': False,
+        'media_asset': {
+            'id': post_id + 1000000,
+            'created_at': date,
+            'updated_at': date,
+            'md5': md5,
+            'file_ext': file_ext,
+            'file_size': rng.randint(10 ** 4, 10 ** 7),
+            'image_width': width,
+            'image_height': height,
+            'duration': None,
+            'status': 'active',
+            'file_key': md5[:9],
+            'is_public': True,
+            'pixel_hash': md5[::-1],
+            'variants': [
+                {'type': variant, 'url': url.format(variant, md5[:2],
+                                                    md5[2:4], md5 + '.jpg'),
+                 'width': min(width, size), 'height': min(height, size),
+                 'file_ext': 'jpg'}
+                for variant, size in (('180x180', 180), ('360x360', 360),
+                                      ('720x720', 720), ('sample', 850))]
+            },
+        'tag_string_general': general,
+        'tag_string_character': character,
+        'tag_string_copyright': copyright,
+        'tag_string_artist': artist,
+        'tag_string_meta': '',
+        'file_url': url.format('original', md5[:2], md5[2:4],
+                               md5 + '.' + file_ext),
+        'large_file_url': url.format('sample', md5[:2], md5[2:4],
+                                     'sample-' + md5 + '.jpg'),
+        'preview_file_url': url.format('180x180', md5[:2], md5[2:4],
+                                       md5 + '.jpg'),
+        }
+
+
+def _moebooru_post(post):
+    """Return the Moebooru post.json record of a Danbooru post."""
+    width, height = post['image_width'], post['image_height']
+    scale = min(1.0, 1500.0 / max(width, height))
+    return {
+        'id': post['id'],
+        'tags': post['tag_string'],
+        'created_at': 1100000000 + post['id'] * 60,
+        'updated_at': 1100000000 + post['id'] * 60,
+        'creator_id': post['uploader_id'],
+        'author': 'user_{0}'.format(post['uploader_id']),
+        'change': post['id'] * 3,
+        'source': post['source'],
+        'score': post['score'],
+        'md5': post['md5'],
+        'file_size': post['file_size'],
+        'file_ext': post['file_ext'],
+        'file_url': post['file_url'],
+        'is_shown_in_index': True,
+        'preview_url': post['preview_file_url'],
+        'preview_width': 150,
+        'preview_height': 150,
+        'actual_preview_width': 300,
+        'actual_preview_height': 300,
+        'sample_url': post['large_file_url'],
+        'sample_width': int(width * scale),
+        'sample_height': int(height * scale),
+        'sample_file_size': post['file_size'] // 4,
+        'jpeg_url': post['file_url'],
+        'jpeg_width': width,
+        'jpeg_height': height,
+        'jpeg_file_size': 0,
+        'rating': {'g': 's'}.get(post['rating'], post['rating']),
+        'is_rating_locked': False,
+        'has_children': post['has_children'],
+        'parent_id': post['parent_id'],
+        'status': 'deleted' if post['is_deleted'] else 'active',
+        'is_pending': False,
+        'width': width,
+        'height': height,
+        'is_held': False,
+        'frames_pending_string': '',
+        'frames_pending': [],
+        'frames_string': '',
+        'frames': [],
+        'is_note_locked': False,
+        'last_noted_at': 0,
+        'last_commented_at': 0,
+        }
+
+
+class Dataset(object):
+    """Synthetic records of a site, generated from their ids.
+
+    Ids of a resource go from 1 to its size, the same seed and id always
+    give the same record. Recently used posts are cached, they're the
+    slowest records to build.
+
+    Attributes:
+        seed (int): Seed of the records.
+        padding (int): Bytes added to every record.
+        sizes (dict): Number of records by resource ('posts', 'tags',
+                      'pools', 'comments', 'users' and 'other' for the
+                      rest).
+    """
+
+    def __init__(self, posts=10000, seed=0, padding=0, cache_size=65536,
+                 **sizes):
+        """Initialize Dataset.
+
+        Keyword arguments:
+            posts (int): Number of posts (Default: 10000).
+            seed (int): Seed of the records (Default: 0).
+            padding (int): Bytes added to every record, in a '_padding'
+                           field (Default: 0).
+            cache_size (int): Number of posts cached (Default: 65536).
+            **sizes: Number of records of other resources: tags (Default:
+                     posts / 10, at least 1000), pools (posts / 100),
+                     comments (posts), users (posts / 10) and other
+                     (posts / 10).
+        """
+        self.seed = seed
+        self.padding = padding
+        self.sizes = {'posts': posts,
+                      'tags': max(1000, posts // 10),
+                      'pools': max(1, posts // 100),
+                      'comments': posts,
+                      'users': max(1, posts // 10),
+                      'other': max(1, posts // 10)}
+        unknown = set(sizes) - set(self.sizes)
+        if unknown:
+            raise PybooruError("Unknown dataset resources: {0}".format(
+                ', '.join(sorted(unknown))))
+        self.sizes.update(sizes)
+        self._post = functools.lru_cache(maxsize=cache_size)(self._make_post)
+        self._ids = dict((resource, itertools.count(size + 1))
+                         for resource, size in self.sizes.items())
+        self._builders = {'tags': self._tags, 'pools': self._pools,
+                          'comments': self._comments, 'users': self._users,
+                          'uploads': self._uploads}
+
+    def __repr__(self):
+        return "{0}(posts={1}, seed={2})".format(
+            type(self).__name__, self.sizes['posts'], self.seed)
+
+    def size(self, resource):
+        """Return the number of records of a resource.
+
+        Parameters:
+            resource (str): Resource name, e.g. 'posts'.
+        """
+        return self.sizes.get(resource, self.sizes['other'])
+
+    def new_id(self, resource):
+        """Return the id of a created record of a resource.
+
+        Parameters:
+            resource (str): Resource name, e.g. 'posts'.
+        """
+        return next(self._ids.get(resource, self._ids['other']))
+
+    def _rng(self, resource, record_id):
+        """Return the random generator of a record."""
+        # str seeds are hashed with SHA-512, stable between processes
+        return random.Random('{0}:{1}:{2}'.format(self.seed, resource,
+                                                  record_id))
+
+    def _make_post(self, post_id):
+        """Build a Danbooru post, 'seed' 0 gives make_post(post_id)."""
+        return make_post(post_id, random.Random(post_id) if not self.seed
+                         else self._rng('posts', post_id))
+
+    def record(self, resource, record_id, flavor='danbooru'):
+        """Return a record.
+
+        Parameters:
+            resource (str): Resource name, e.g. 'posts'.
+            record_id (int): Record id.
+            flavor (str): Format of the record, 'danbooru' or 'moebooru'.
+
+        Returns:
+            The record (dict), None when the id is out of the dataset.
+        """
+        if not 0 < record_id <= self.size(resource):
+            return None
+        if resource == 'posts':
+            record = self._post(record_id)
+            if flavor == 'moebooru':
+                record = _moebooru_post(record)
+        else:
+            rng = self._rng(resource, record_id)
+            build = self._builders.get(resource, self._other)
+            record = build(record_id, rng, flavor)
+        if self.padding:
+            record = dict(record, _padding='x' * self.padding)
+        return record
+
+    def _tags(self, tag_id, rng, flavor):
+        """Build a tag, general tags are the first ones."""
+        if tag_id <= len(WORDS):
+            name, category = WORDS[tag_id - 1], 0
+        else:
+            category = (1, 3, 4)[tag_id % 3]
+            name = '{0}_{1}'.format(TAG_CATEGORIES[category], tag_id)
+        count = rng.randint(1, self.sizes['posts'])
+        if flavor == 'moebooru':
+            return {'id': tag_id, 'name': name, 'count': count,
+                    'type': category, 'ambiguous': False}
+        date = _date(rng)
+        return {'id': tag_id, 'name': name, 'post_count': count,
+                'category': category, 'created_at': date,
+                'updated_at': date, 'is_deprecated': False, 'words': [name]}
+
+    def _pools(self, pool_id, rng, flavor):
+        """Build a pool of random posts."""
+        post_ids = sorted(rng.sample(range(1, self.sizes['posts'] + 1),
+                                     min(rng.randint(2, 50),
+                                         self.sizes['posts'])))
+        name = 'pool_{0}'.format(pool_id)
+        date = _date(rng)
+        if flavor == 'moebooru':
+            return {'id': pool_id, 'name': name, 'created_at': date,
+                    'updated_at': date, 'user_id': rng.randint(1, 900000),
+                    'is_public': True, 'post_count': len(post_ids),
+                    'description': ' '.join(rng.sample(WORDS, 5))}
+        return {'id': pool_id, 'name': name, 'created_at': date,
+                'updated_at': date,
+                'description': ' '.join(rng.sample(WORDS, 5)),
+                'is_active': rng.random() < 0.5, 'is_deleted': False,
+                'post_ids': post_ids,
+                'category': rng.choice(('series', 'collection')),
+                'post_count': len(post_ids)}
+
+    def _comments(self, comment_id, rng, flavor):
+        """Build a comment of a random post."""
+        post_id = rng.randint(1, self.sizes['posts'])
+        creator_id = rng.randint(1, self.sizes['users'])
+        body = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 40)))
+        date = _date(rng)
+        if flavor == 'moebooru':
+            return {'id': comment_id, 'created_at': date, 'post_id': post_id,
+                    'creator': 'user_{0}'.format(creator_id),
+                    'creator_id': creator_id, 'body': body}
+        return {'id': comment_id, 'post_id': post_id,
+                'creator_id': creator_id, 'body': body,
+                'score': rng.randint(-5, 30), 'created_at': date,
+                'updated_at': date, 'updater_id': creator_id,
+                'do_not_bump_post': False, 'is_deleted': False,
+                'is_sticky': False}
+
+    def _users(self, user_id, rng, flavor):
+        """Build a user."""
+        name = 'user_{0}'.format(user_id)
+        if flavor == 'moebooru':
+            return {'name': name, 'id': user_id}
+        level = rng.choice((20, 20, 20, 30, 31, 32, 40))
+        return {'id': user_id, 'name': name, 'level': level,
+                'inviter_id': None, 'created_at': _date(rng),
+                'post_update_count': rng.randint(0, 10000),
+                'note_update_count': rng.randint(0, 1000),
+                'post_upload_count': rng.randint(0, 5000),
+                'is_banned': False, 'can_approve_posts': level >= 40,
+                'can_upload_free': level >= 32,
+                'level_string': {20: 'Member', 30: 'Gold', 31: 'Platinum',
+                                 32: 'Builder', 40: 'Moderator'}[level]}
+
+    def _uploads(self, upload_id, rng, flavor):
+        """Build an upload of a random post."""
+        date = _date(rng)
+        return {'id': upload_id, 'source': '', 'uploader_id':
+                rng.randint(1, self.sizes['users']), 'status': 'completed',
+                'created_at': date, 'updated_at': date,
+                'referer_url': '', 'error': None,
+                'post_id': rng.randint(1, self.sizes['posts'])}
+
+    def _other(self, record_id, rng, flavor):
+        """Build a record of any other resource."""
+        date = _date(rng)
+        return {'id': record_id, 'created_at': date, 'updated_at': date,
+                'creator_id': rng.randint(1, self.sizes['users']),
+                'post_id': rng.randint(1, self.sizes['posts']),
+                'title': 'title_{0}'.format(record_id),
+                'body': ' '.join(rng.sample(WORDS, rng.randint(3, 15)))}
+
+    def select(self, resource, page=None, limit=20, match=None,
+               flavor='danbooru'):
+        """Return a page of records, newest first.
+
+        Parameters:
+            resource (str): Resource name, e.g. 'posts'.
+            page (int or str): Page number or Danbooru id cursor, 'b<id>'
+                               for records before an id and 'a<id>' after
+                               it (Default: None, first page).
+            limit (int): Records per page, None for all records ('page'
+                         is ignored).
+            match (function): Function that returns whether a record is
+                              selected (Default: None, all records).
+                              Records are scanned until the page is full.
+            flavor (str): Format of records, 'danbooru' or 'moebooru'.
+
+        Returns:
+            List of records.
+        """
+        size = self.size(resource)
+        skip = 0
+        page = str(page or 1)
+        if page[0] == 'b':
+            ids = range(min(int(page[1:]), size + 1) - 1, 0, -1)
+        elif page[0] == 'a':
+            ids = range(max(int(page[1:]), 0) + 1, size + 1)
+        else:
+            ids = range(size, 0, -1)
+            skip = (max(int(page), 1) - 1) * limit if limit else 0
+        if match is None and limit is not None:
+            ids, skip = ids[skip:skip + limit], 0
+
+        records = []
+        for record_id in ids:
+            record = self.record(resource, record_id, flavor)
+            if match is not None and not match(record):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            records.append(record)
+            if len(records) == limit:
+                break
+        if page[0] == 'a':
+            records.reverse()
+        return records
+
+
+def _date(rng):
+    """Return a random Danbooru date."""
+    return _DATE.format(
+        rng.randint(5, 24), rng.randint(1, 12), rng.randint(1, 28),
+        rng.randint(0, 23), rng.randint(0, 59), rng.randint(0, 59))
+
+
+def _tags_matcher(query, field):
+    """Return a function that matches posts of a tag search.
+
+    Plain tags, '-tag' exclusions and 'rating:' are supported, other
+    metatags are ignored.
+
+    Parameters:
+        query (str): Tag search.
+        field (str): Field of posts with their tags.
+    """
+    include, exclude, ratings = set(), set(), None
+    for term in query.split():
+        if term.startswith('rating:'):
+            ratings = set(rating[0] for rating in term[7:].split(','))
+        elif ':' in term:
+            continue
+        elif term.startswith('-'):
+            exclude.add(term[1:])
+        else:
+            include.add(term)
+    if not (include or exclude or ratings):
+        return None
+
+    def match(post):
+        tags = set(post[field].split())
+        return (include <= tags and not exclude & tags and
+                (ratings is None or post['rating'] in ratings))
+    return match
+
+
+def _field_matcher(field, pattern=None, values=None):
+    """Return a function that matches records by a field.
+
+    Parameters:
+        field (str): Field name.
+        pattern (str): Pattern of the field, '*' is a wildcard.
+        values (str): Comma separated values of the field.
+    """
+    if pattern:
+        pattern = pattern.lower()
+        if '*' not in pattern:
+            pattern = '*{0}*'.format(pattern)
+        return lambda record: fnmatch.fnmatchcase(
+            str(record.get(field)).lower(), pattern)
+    if values:
+        values = set(values.split(','))
+        return lambda record: str(record.get(field)) in values
+    return None
+
+
+def _parse_only(only):
+    """Return the fields of an 'only' parameter as a dict of names and
+    nested fields (None for a whole field)."""
+    fields = {}
+    for name in _split_fields(only):
+        name, bracket, nested = name.partition('[')
+        fields[name.strip()] = (_parse_only(nested[:-1]) if bracket
+                                else None)
+    return fields
+
+
+def _project(data, fields):
+    """Return records (dict or list of dicts) with some fields only."""
+    if isinstance(data, list):
+        return [_project(record, fields) for record in data]
+    if not isinstance(data, dict):
+        return data
+    return dict((name, data[name] if nested is None
+                 else _project(data[name], nested))
+                for name, nested in fields.items() if name in data)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler of FakeBooru, served by its 'booru' attribute."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        self.server.booru.handle(self)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeBooru(object):
+    """Fake Danbooru or Moebooru server, served by threads.
+
+    Danbooru urls are '<resource>.json', '<resource>/<id>.json' and
+    '<resource>/<id>/<action>.json', pages are numbers or id cursors.
+    Moebooru urls are '<resource>.json' (or '<resource>/index.json') and
+    '<resource>/<action>.json', pages are numbers. Posts, tags, pools,
+    comments, users and uploads have records of the real sites, the other
+    resources have generic records. Writes are accepted and answered, they
+    don't change the dataset.
+
+    Attributes:
+        flavor (str): 'danbooru' or 'moebooru'.
+        dataset (Dataset): Records served.
+        url (str): Url of the server, None until it's started.
+    """
+
+    def __init__(self, flavor='danbooru', dataset=None, posts=10000, seed=0,
+                 padding=0, latency=0, bandwidth=None, rate=None, burst=None,
+                 throttle_status=None, error_rate=0,
+                 error_statuses=(500, 502, 503), max_limit=1000,
+                 max_page=1000, compress=False, file_size=65536,
+                 host='127.0.0.1', port=0):
+        """Initialize FakeBooru.
+
+        Keyword arguments:
+            flavor (str): 'danbooru' or 'moebooru' (Default: 'danbooru').
+            dataset (Dataset): Records served (Default: None, a Dataset of
+                               'posts', 'seed' and 'padding').
+            posts (int): Number of posts (Default: 10000).
+            seed (int): Seed of the records and of random failures
+                        (Default: 0).
+            padding (int): Bytes added to every record (Default: 0).
+            latency (float or tuple): Seconds before every response, or
+                                      (min, max) for a random latency
+                                      (Default: 0).
+            bandwidth (int): Bytes per second of response bodies
+                             (Default: None, unlimited).
+            rate (float): Requests accepted per second, more requests are
+                          throttled (Default: None, unlimited).
+            burst (int): Requests accepted at once (Default: rate, at
+                         least 1).
+            throttle_status (int): Status of throttled requests (Default:
+                                   429 on Danbooru, 421 on Moebooru).
+            error_rate (float): Fraction of requests that fail with one of
+                                'error_statuses' (Default: 0).
+            error_statuses (tuple): Status codes of random failures
+                                    (Default: 500, 502 and 503).
+            max_limit (int): Maximum records per page, Moebooru pages with
+                             'limit=0' have all records (Default: 1000).
+            max_page (int): Maximum page number on Danbooru, deeper pages
+                            fail with 410 like the real site (Default:
+                            1000).
+            compress (bool): Gzip responses when the client accepts it
+                             (Default: False).
+            file_size (int): Bytes of files served under '/data/'
+                             (Default: 65536).
+            host (str): Address to listen on (Default: '127.0.0.1').
+            port (int): Port to listen on (Default: 0, a free port).
+
+        Raises:
+            PybooruError: When 'flavor' isn't valid.
+        """
+        if flavor not in FLAVORS:
+            raise PybooruError("Invalid flavor: {0}, use 'danbooru' or "
+                               "'moebooru'.".format(flavor))
+        self.flavor = flavor
+        self.dataset = dataset or Dataset(posts, seed=seed, padding=padding)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.rate = rate
+        self.burst = burst or max(1, int(rate or 1))
+        self.throttle_status = throttle_status or (
+            429 if flavor == 'danbooru' else 421)
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.max_limit = max_limit
+        self.max_page = max_page
+        self.compress = compress
+        self.file_size = file_size
+        self.host = host
+        self.port = port
+        self.url = None
+        self._server = None
+        self._thread = None
+        self._random = random.Random(seed)
+        # Random.randbytes() of Python 3.9
+        self._file = (random.Random(seed).getrandbits(
+            file_size * 8).to_bytes(file_size, 'little') if file_size
+            else b'')
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = None
+        self.reset_stats()
+
+    def __repr__(self):
+        return "{0}({1!r}, url={2!r})".format(type(self).__name__,
+                                              self.flavor, self.url)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Start serving in a background thread.
+
+        Returns:
+            Url of the server (str).
+        """
+        if self._server is None:
+            self._server = ThreadingHTTPServer((self.host, self.port),
+                                               _Handler)
+            self._server.daemon_threads = True
+            self._server.request_queue_size = 1024
+            self._server.booru = self
+            self._thread = threading.Thread(
+                target=self._server.serve_forever, name='FakeBooru',
+                daemon=True)
+            self._thread.start()
+            self.url = 'http://{0}:{1}'.format(self.host,
+                                               self._server.server_port)
+        return self.url
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = self._thread = None
+
+    def client(self, **kwargs):
+        """Return a client of the server.
+
+        Parameters:
+            **kwargs: Arguments of Danbooru or Moebooru.
+        """
+        self.start()
+        if self.flavor == 'danbooru':
+            return Danbooru(site_url=self.url, **kwargs)
+        return Moebooru(site_url=self.url, **kwargs)
+
+    def stats(self):
+        """Return counters of the requests served.
+
+        Returns:
+            dict with 'requests', 'bytes' (of response bodies), 'throttled',
+            'errors' (random failures), 'not_modified', 'peak_active'
+            (most requests served at once), 'statuses' (requests by status
+            code) and 'endpoints' (requests by method and path, ids are
+            replaced by '{id}').
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['statuses'] = dict(stats['statuses'])
+            stats['endpoints'] = dict(stats['endpoints'])
+        del stats['active']
+        return stats
+
+    def reset_stats(self):
+        """Reset the counters of requests."""
+        with self._lock:
+            active = self._stats['active'] if self._stats else 0
+            self._stats = {'requests': 0, 'bytes': 0, 'throttled': 0,
+                           'errors': 0, 'not_modified': 0, 'active': active,
+                           'peak_active': active, 'statuses': {},
+                           'endpoints': {}}
+
+    def _throttled(self):
+        """Take a token of the rate limit.
+
+        Returns:
+            Seconds until a token is available (float), 0 when the request
+            is accepted.
+        """
+        if not self.rate:
+            return 0
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens +
+                           (now - self._refilled) * self.rate)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def handle(self, handler):
+        """Answer a request, called by the handler threads.
+
+        Parameters:
+            handler (BaseHTTPRequestHandler): Handler of the request.
+        """
+        length = int(handler.headers.get('content-length') or 0)
+        form = handler.rfile.read(length) if length else b''
+        split = urlsplit(handler.path)
+        endpoint = '{0} {1}'.format(handler.command,
+                                    re.sub(r'/\d+', '/{id}', split.path))
+        with self._lock:
+            stats = self._stats
+            stats['requests'] += 1
+            stats['active'] += 1
+            stats['peak_active'] = max(stats['peak_active'],
+                                       stats['active'])
+            stats['endpoints'][endpoint] = (
+                stats['endpoints'].get(endpoint, 0) + 1)
+        try:
+            self._answer(handler, split, form)
+        finally:
+            with self._lock:
+                self._stats['active'] -= 1
+
+    def _answer(self, handler, split, form):
+        """Build and send the response of a request."""
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            with self._lock:
+                latency = self._random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+        headers = {}
+        with self._lock:
+            wait = self._throttled()
+            failed = (not wait and self.error_rate and
+                      self._random.random() < self.error_rate)
+            error_status = (self._random.choice(self.error_statuses)
+                            if failed else None)
+        if wait:
+            status, data = self.throttle_status, self._error(
+                self.throttle_status, 'Rate limit exceeded')
+            headers['Retry-After'] = '{0:.3f}'.format(wait)
+        elif failed:
+            status, data = error_status, self._error(error_status)
+        else:
+            params = dict(parse_qsl(split.query))
+            params.update(parse_qsl(form.decode('latin-1'))
+                          if handler.headers.get('content-type', '')
+                          .startswith('application/x-www-form-urlencoded')
+                          else ())
+            try:
+                status, data = self._route(handler.command, split.path,
+                                           params)
+            except ValueError as e:
+                status, data = 400, self._error(400, str(e))
+
+        body = b''
+        if isinstance(data, bytes):
+            body = data
+            headers['Content-Type'] = 'application/octet-stream'
+        elif data is not None:
+            body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+            headers['Content-Type'] = 'application/json; charset=utf-8'
+        if status == 200 and handler.command == 'GET':
+            etag = '"{0}"'.format(hashlib.md5(body).hexdigest())
+            headers['ETag'] = etag
+            if handler.headers.get('if-none-match') == etag:
+                status, body = 304, b''
+        if body and self.compress and 'gzip' in handler.headers.get(
+                'accept-encoding', ''):
+            body = gzip.compress(body, 1)
+            headers['Content-Encoding'] = 'gzip'
+        self._send(handler, status, headers, body)
+
+        with self._lock:
+            stats = self._stats
+            stats['bytes'] += len(body)
+            stats['throttled'] += bool(wait)
+            stats['errors'] += bool(failed)
+            stats['not_modified'] += status == 304
+            stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+
+    def _send(self, handler, status, headers, body):
+        """Write a response, slowed down to 'bandwidth'."""
+        reason = HTTP_STATUS_CODE.get(status, ('Unknown',))[0]
+        head = ['HTTP/1.1 {0} {1}'.format(status, reason),
+                'Content-Length: {0}'.format(len(body))]
+        head.extend('{0}: {1}'.format(*header) for header in headers.items())
+        head = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1')
+        if not self.bandwidth:
+            # Head and body in one write, avoids delayed ACK stalls
+            handler.wfile.write(head + body)
+            return
+        chunk = max(1024, int(self.bandwidth) // 20)
+        handler.wfile.write(head + body[:chunk])
+        for start in range(chunk, len(body), chunk):
+            time.sleep(float(chunk) / self.bandwidth)
+            handler.wfile.write(body[start:start + chunk])
+
+    def _error(self, status, message=None):
+        """Return the JSON body of an error response."""
+        message = message or HTTP_STATUS_CODE.get(status, ('Error',))[0]
+        if self.flavor == 'danbooru':
+            return {'success': False, 'error': 'FakeBooru',
+                    'message': message}
+        return {'success': False, 'reason': message}
+
+    def _route(self, method, path, params):
+        """Answer a request of the API.
+
+        Returns:
+            Status code (int) and JSON data, file content (bytes) or None
+            for no body.
+        """
+        path = path.strip('/')
+        if path.startswith('data/'):
+            return 200, self._file
+        for suffix in ('/index.json', '.json'):
+            if path.endswith(suffix):
+                path = path[:-len(suffix)]
+                break
+        parts = path.split('/') if path else []
+        if not parts:
+            return 404, self._error(404)
+        resource = _RESOURCES.get(parts[0], parts[0])
+
+        if self.flavor == 'danbooru':
+            if parts == ['counts', 'posts']:
+                return 200, {'counts': {'posts': self.dataset.size('posts')}}
+            record_id = (int(parts[1]) if len(parts) > 1 and
+                         parts[1].isdigit() else None)
+            if method != 'GET' or len(parts) > 2:
+                return self._write(method, resource, record_id)
+            if record_id is not None:
+                status, data = self._show(resource, record_id)
+            else:
+                status, data = self._list(resource, params)
+            if status == 200 and params.get('only'):
+                data = _project(data, _parse_only(params['only']))
+            return status, data
+
+        action = parts[1] if len(parts) > 1 else None
+        if action in _WRITE_ACTIONS or method != 'GET':
+            return self._write(method, resource, params.get('id'))
+        if action == 'show':
+            # Records shown by other keys (e.g. wiki titles) are the first
+            record_id = params.get('id', '1')
+            return self._show(resource,
+                              int(record_id) if record_id.isdigit() else 1)
+        return self._list(resource, params)
+
+    def _show(self, resource, record_id):
+        """Answer the request of a record."""
+        record = self.dataset.record(resource, record_id, self.flavor)
+        if record is None:
+            return 404, self._error(404)
+        if resource == 'pools' and self.flavor == 'moebooru':
+            posts = [self.dataset.record('posts', post_id, 'moebooru')
+                     for post_id in self._pools_posts(record_id)]
+            record = dict(record, posts=posts)
+        return 200, record
+
+    def _pools_posts(self, pool_id):
+        """Return the post ids of a pool."""
+        return self.dataset.record('pools', pool_id)['post_ids']
+
+    def _list(self, resource, params):
+        """Answer the request of a page of records."""
+        limit = int(params.get('limit') or 20)
+        if limit == 0 and self.flavor == 'moebooru':
+            # Moebooru returns all records with limit=0 (e.g. tag dumps)
+            limit = None
+        else:
+            limit = min(limit, self.max_limit)
+        page = params.get('page') or '1'
+        if (self.flavor == 'danbooru' and page.isdigit() and
+                int(page) > self.max_page):
+            return 410, self._error(410, "You cannot go beyond page "
+                                         "{0}.".format(self.max_page))
+        return 200, self.dataset.select(resource, page, limit,
+                                        self._matcher(resource, params),
+                                        self.flavor)
+
+    def _matcher(self, resource, params):
+        """Return the function that matches records of a search."""
+        if resource == 'posts':
+            return _tags_matcher(params.get('tags', ''),
+                                 'tag_string' if self.flavor == 'danbooru'
+                                 else 'tags')
+        if self.flavor == 'moebooru':
+            if resource == 'tags':
+                return _field_matcher('name', params.get('name'))
+            if resource == 'pools':
+                return _field_matcher('name', params.get('query'))
+            if resource == 'comments':
+                return _field_matcher('post_id',
+                                      values=params.get('post_id'))
+            return None
+        if resource in ('tags', 'pools'):
+            return (_field_matcher('name',
+                                   params.get('search[name_matches]')) or
+                    _field_matcher('name', values=params.get('search[name]'))
+                    or _field_matcher('category',
+                                      values=params.get('search[category]')))
+        return _field_matcher('post_id', values=params.get('search[post_id]'))
+
+    def _write(self, method, resource, record_id):
+        """Answer a request that modifies a record."""
+        if self.flavor == 'moebooru':
+            data = {'success': True}
+            if record_id is None:
+                data['{0}_id'.format(resource.rstrip('s'))] = (
+                    self.dataset.new_id(resource))
+            return 200, data
+        if method == 'DELETE':
+            return 204, None
+        if record_id is None:
+            record_id = self.dataset.new_id(resource)
+            record = (self.dataset.record(resource, 1, self.flavor) or
+                      self.dataset.record('other', 1, self.flavor))
+            return 201, dict(record, id=record_id)
+        record = self.dataset.record(resource, record_id, self.flavor)
+        if record is None:
+            return 404, self._error(404)
+        return 200, record
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.timeouts
+
+This module contains timeouts and deadlines of Pybooru requests. A timeout
+limits each connection attempt and socket read of a request. A deadline
+limits the total time of a block of calls (e.g. a paginated crawl or a bulk
+fetch): requests fail fast once the budget is spent, and retries or rate
+limiter waits that would end after the deadline aren't done.
+
+Timeouts and deadlines set with scope() apply to calls done inside the
+block, in the current thread or asyncio task (and tasks created inside it).
+
+Classes:
+    Deadline -- Point in time when a budget runs out.
+
+Functions:
+    scope -- Context manager that sets timeout and deadline of calls.
+    resolve -- Return the timeouts of a request.
+    check_deadline -- Check the deadline didn't expire.
+    remaining -- Return seconds left before the deadline.
+    check_wait -- Check a wait ends before the deadline.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import contextlib
+import contextvars
+import time
+
+# pybooru imports
+from .exceptions import PybooruDeadlineError
+
+# Default (connect, read) timeout in seconds
+DEFAULT_TIMEOUT = (10.0, 60.0)
+
+# (timeout, deadline) of the current scope
+_SCOPE = contextvars.ContextVar('pybooru_timeouts', default=(None, None))
+
+
+class Deadline(object):
+    """Point in time when a budget runs out.
+
+    Attributes:
+        expires (float): Value of time.monotonic() when it expires.
+    """
+
+    __slots__ = ('expires',)
+
+    def __init__(self, seconds):
+        """Initialize Deadline.
+
+        Keyword arguments:
+            seconds (float): Budget in seconds from now.
+        """
+        self.expires = time.monotonic() + seconds
+
+    def __repr__(self):
+        return "{0}(remaining={1:.3f})".format(type(self).__name__,
+                                               self.remaining())
+
+    @classmethod
+    def from_value(cls, value):
+        """Build a deadline from an argument.
+
+        Parameters:
+            value (Deadline, float or None): A Deadline object, seconds from
+                                             now or None.
+
+        Returns:
+            Deadline object or None.
+        """
+        if value is None or isinstance(value, cls):
+            return value
+        return cls(value)
+
+    def remaining(self):
+        """Return seconds left, negative when expired (float)."""
+        return self.expires - time.monotonic()
+
+    @property
+    def expired(self):
+        """Return True when the budget is spent."""
+        return self.remaining() <= 0
+
+    def check(self, url=None):
+        """Return seconds left.
+
+        Parameters:
+            url (str): Url of the request, for the error message.
+
+        Raises:
+            PybooruDeadlineError: When the deadline expired.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise PybooruDeadlineError(
+                "Deadline exceeded, url: {0}".format(url))
+        return remaining
+
+
+@contextlib.contextmanager
+def scope(timeout=None, deadline=None):
+    """Context manager that sets timeout and deadline of calls in its block.
+
+    Nested scopes keep the earliest deadline.
+
+    Parameters:
+        timeout (float or tuple): Timeout of each request, seconds or a
+                                  (connect, read) tuple (Default: None,
+                                  timeout of the client or outer scope).
+        deadline (Deadline or float): Budget of all calls in the block,
+                                      seconds from now (Default: None).
+
+    Yields:
+        Deadline object of the block, or None.
+    """
+    outer_timeout, outer_deadline = _SCOPE.get()
+    deadline = Deadline.from_value(deadline)
+    if deadline is None or (outer_deadline is not None and
+                            outer_deadline.expires < deadline.expires):
+        deadline = outer_deadline
+    token = _SCOPE.set((outer_timeout if timeout is None else timeout,
+                        deadline))
+    try:
+        yield deadline
+    finally:
+        _SCOPE.reset(token)
+
+
+def resolve(timeout, url=None):
+    """Return the timeouts of a request in the current scope.
+
+    Connect and read timeouts are capped to the time left before the
+    deadline.
+
+    Parameters:
+        timeout (float or tuple): Timeout of the client, seconds or a
+                                  (connect, read) tuple.
+        url (str): Url of the request, for the error message.
+
+    Returns:
+        Tuple with connect, read and total timeouts, None when unlimited.
+
+    Raises:
+        PybooruDeadlineError: When the deadline expired.
+    """
+    scope_timeout, deadline = _SCOPE.get()
+    if scope_timeout is not None:
+        timeout = scope_timeout
+    if isinstance(timeout, (tuple, list)):
+        connect, read = timeout
+    else:
+        connect = read = timeout
+    if deadline is None:
+        return connect, read, None
+
+    remaining = deadline.check(url)
+    connect = remaining if connect is None else min(connect, remaining)
+    read = remaining if read is None else min(read, remaining)
+    return connect, read, remaining
+
+
+def check_deadline(url=None):
+    """Check the deadline of the current scope didn't expire.
+
+    Parameters:
+        url (str): Url of the request, for the error message.
+
+    Raises:
+        PybooruDeadlineError: When the deadline expired.
+    """
+    deadline = _SCOPE.get()[1]
+    if deadline is not None:
+        deadline.check(url)
+
+
+def remaining(url=None):
+    """Return seconds left before the deadline of the current scope.
+
+    Parameters:
+        url (str): Url of the request, for the error message.
+
+    Returns:
+        Seconds left (float), None when there is no deadline.
+
+    Raises:
+        PybooruDeadlineError: When the deadline expired.
+    """
+    deadline = _SCOPE.get()[1]
+    if deadline is not None:
+        return deadline.check(url)
+    return None
+
+
+def check_wait(seconds, url=None):
+    """Check a wait (retry backoff, rate limiter) ends before the deadline.
+
+    Parameters:
+        seconds (float): Time to wait.
+        url (str): Url of the request, for the error message.
+
+    Raises:
+        PybooruDeadlineError: When the deadline expires before the wait
+                              ends.
+    """
+    deadline = _SCOPE.get()[1]
+    if deadline is not None and deadline.check(url) <= seconds:
+        raise PybooruDeadlineError(
+            "Deadline exceeded, url: {0} (can't wait {1:.3f}s)".format(
+                url, seconds))
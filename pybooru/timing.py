@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.timing
+
+This module contains the timing breakdown of Pybooru requests. Every request
+records how long its phases took, in seconds:
+
+    connect -- Open a connection (DNS, TCP and TLS), 0 when a pooled
+               connection was reused ('reused' is True).
+    ttfb -- Time to first byte: send the request and wait for the response
+            headers.
+    download -- Read the response body.
+    decode -- Decode the JSON response.
+
+Sync clients also record 'tls' (TLS handshake, part of connect) and asyncio
+clients 'dns' (host resolution, part of connect). Timings are stored in
+'timings' of 'last_call' and aggregated per endpoint by metrics.
+
+Functions:
+    new_timings -- Return the timings record of a request.
+    collect -- Context manager that collects connection timings.
+    response_hook -- requests hook that stores when headers were received.
+    add_connect -- Add a connection opened for the current request.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import contextlib
+import contextvars
+import time
+
+# Phases of a request, aggregated by metrics
+PHASES = ('connect', 'ttfb', 'download', 'decode')
+
+# Timings record of the request done in the current context
+_CURRENT = contextvars.ContextVar('pybooru_timing', default=None)
+
+
+def new_timings():
+    """Return the timings record of a request (dict)."""
+    return {'reused': True, 'connect': 0.0, 'dns': None, 'tls': None,
+            'ttfb': None, 'download': None, 'decode': None}
+
+
+@contextlib.contextmanager
+def collect(timings):
+    """Context manager that adds connections opened in its block to timings.
+
+    Parameters:
+        timings (dict): Record returned by new_timings().
+
+    Yields:
+        The timings record.
+    """
+    token = _CURRENT.set(timings)
+    try:
+        yield timings
+    finally:
+        _CURRENT.reset(token)
+
+
+def response_hook(response, *args, **kwargs):
+    """requests hook, store when the headers of a response were received.
+
+    The time is stored in 'pybooru_received' attribute of the response.
+    """
+    response.pybooru_received = time.perf_counter()
+    return response
+
+
+def add_connect(seconds, dns=None, tls=None):
+    """Add a connection opened for the request of the current context.
+
+    Connections opened outside a collect() block (e.g. by warmup) aren't
+    recorded.
+
+    Parameters:
+        seconds (float): Time to open the connection.
+        dns (float): Time to resolve the host, when it's known.
+        tls (float): Time of the TLS handshake, when it's known.
+    """
+    timings = _CURRENT.get()
+    if timings is None:
+        return
+    timings['reused'] = False
+    timings['connect'] += seconds
+    if dns is not None:
+        timings['dns'] = (timings['dns'] or 0.0) + dns
+    if tls is not None:
+        timings['tls'] = (timings['tls'] or 0.0) + tls
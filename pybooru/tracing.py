@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.tracing
+
+This module contains local tracing of Pybooru requests. Spans are written
+to a JSON lines file, one finished span per line, with the fields of
+OpenTelemetry spans (traceId, spanId, parentSpanId, name, startTimeUnixNano,
+endTimeUnixNano, attributes and status).
+
+Spans of a client:
+
+    paginate -- A paginated iteration, parent of its 'page' spans.
+    page -- A page of an iteration, with 'page' number and 'records'.
+    <METHOD> <endpoint> -- A call, with status, cache, retries and bytes.
+    cache.lookup -- Cache lookup of a GET request, with its 'result'.
+    http -- An HTTP attempt, with 'attempt', status, bytes and timings.
+    retry.wait -- Backoff before retrying a failed attempt.
+    ratelimit.wait -- Wait for the rate limiter.
+    decode -- JSON decoding of a response.
+
+Calls done inside a span of the application (see Tracer.span) are its
+children. to_chrome_trace() converts a file to the Chrome trace event
+format, loaded by chrome://tracing, Perfetto or speedscope.
+
+Example:
+    client = Danbooru('danbooru', tracer='crawl.jsonl')
+    with client.tracer.span('crawl', tags='cat'):
+        for post in client.iter_posts(tags='cat'):
+            ...
+    client.tracer.close()
+    to_chrome_trace('crawl.jsonl', 'crawl.json')
+
+Classes:
+    Span -- A timed operation with attributes.
+    Tracer -- Creates spans and writes them to a file.
+
+Functions:
+    current_span -- Return the span of the current context.
+    to_chrome_trace -- Convert a spans file to Chrome trace event format.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import asyncio
+import contextlib
+import contextvars
+import inspect
+import json
+import random
+import threading
+import time
+
+# Span of the current context, parent of new spans
+_CURRENT = contextvars.ContextVar('pybooru_span', default=None)
+
+
+class Span(object):
+    """A timed operation with attributes.
+
+    Attributes:
+        name (str): Span name.
+        trace_id (str): Id of the trace, shared by a root span and its
+                        descendants.
+        span_id (str): Id of the span.
+        parent_id (str): Id of the parent span, or None.
+        start (int): Start time, nanoseconds since epoch.
+        end (int): End time, or None while it's running.
+        attributes (dict): Attributes of the span.
+        error (str): Error that ended the span, or None.
+    """
+
+    __slots__ = ('tracer', 'name', 'trace_id', 'span_id', 'parent_id',
+                 'start', 'end', 'attributes', 'error', 'thread', 'task')
+
+    def __init__(self, tracer, name, parent=None, attributes=None):
+        """Initialize Span and start it.
+
+        Parameters:
+            tracer (Tracer): Tracer that writes the span.
+            name (str): Span name.
+            parent (Span): Parent span (Default: None, root span).
+            attributes (dict): Attributes of the span.
+        """
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = (parent.trace_id if parent is not None
+                         else '{0:032x}'.format(random.getrandbits(128)))
+        self.span_id = '{0:016x}'.format(random.getrandbits(64))
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes or {}
+        self.error = None
+        self.end = None
+        self.thread = threading.get_ident()
+        try:
+            self.task = id(asyncio.current_task())
+        except RuntimeError:
+            self.task = None
+        self.start = time.time_ns()
+
+    def __repr__(self):
+        return "{0}({1!r}, span_id={2})".format(type(self).__name__,
+                                                self.name, self.span_id)
+
+    def set(self, **attributes):
+        """Set attributes of the span."""
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        """Mark the span as failed.
+
+        Parameters:
+            error (Exception): The error.
+        """
+        self.error = "{0}: {1}".format(type(error).__name__, error)
+
+    def finish(self):
+        """End the span and write it, calls after the first are ignored."""
+        if self.end is None:
+            self.end = time.time_ns()
+            self.tracer.export(self)
+
+    def to_dict(self):
+        """Return the span as an OpenTelemetry like dict."""
+        status = ({'code': 'ERROR', 'message': self.error} if self.error
+                  else {'code': 'OK'})
+        return {'traceId': self.trace_id,
+                'spanId': self.span_id,
+                'parentSpanId': self.parent_id or '',
+                'name': self.name,
+                'startTimeUnixNano': self.start,
+                'endTimeUnixNano': self.end,
+                'attributes': self.attributes,
+                'status': status,
+                'thread': self.thread,
+                'task': self.task}
+
+
+class _NoSpan(object):
+    """Span that records nothing, used when tracing is off."""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def fail(self, error):
+        pass
+
+    def finish(self):
+        pass
+
+
+# Span and context manager used when tracing is off
+NOOP_SPAN = _NoSpan()
+NO_SPAN = contextlib.nullcontext(NOOP_SPAN)
+
+
+def current_span():
+    """Return the span of the current context, or None."""
+    return _CURRENT.get()
+
+
+class Tracer(object):
+    """Creates spans and writes them to a JSON lines file.
+
+    Spans are written when they end, so children come before parents. A
+    tracer is installed as a middleware of a client, calls are spans.
+
+    Attributes:
+        path (str): Path of the file.
+    """
+
+    def __init__(self, path):
+        """Initialize Tracer.
+
+        Keyword arguments:
+            path (str): Path of the JSON lines file, spans are appended.
+        """
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "{0}({1!r})".format(type(self).__name__, self.path)
+
+    @classmethod
+    def from_value(cls, value):
+        """Build a tracer from a constructor argument.
+
+        Parameters:
+            value (Tracer, str or None): A Tracer object, a file path or
+                                         None.
+
+        Returns:
+            Tracer object or None.
+        """
+        if value is None or isinstance(value, cls):
+            return value
+        return cls(value)
+
+    def start_span(self, name, parent=None, **attributes):
+        """Start a span without making it current, end it with finish().
+
+        Parameters:
+            name (str): Span name.
+            parent (Span): Parent span (Default: None, the current span).
+            **attributes: Attributes of the span.
+        """
+        return Span(self, name, parent or _CURRENT.get(), attributes)
+
+    @contextlib.contextmanager
+    def span(self, name, parent=None, **attributes):
+        """Context manager that runs its block in a new current span.
+
+        Errors raised in the block mark the span as failed.
+
+        Parameters:
+            name (str): Span name.
+            parent (Span): Parent span (Default: None, the current span).
+            **attributes: Attributes of the span.
+
+        Yields:
+            The Span.
+        """
+        span = self.start_span(name, parent, **attributes)
+        token = _CURRENT.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.fail(e)
+            raise
+        finally:
+            _CURRENT.reset(token)
+            span.finish()
+
+    def __call__(self, request, call_next):
+        """Middleware: run a call in a span."""
+        endpoint = request.endpoint
+        span = self.start_span("{0} {1}".format(request.method, endpoint),
+                               method=request.method, endpoint=endpoint,
+                               url=request.url)
+        previous = request.client.last_call
+        token = _CURRENT.set(span)
+        try:
+            data = call_next(request)
+        except Exception as e:
+            span.fail(e)
+            span.finish()
+            raise
+        finally:
+            _CURRENT.reset(token)
+        if inspect.isawaitable(data):
+            return self._finish_async(span, request, data, previous)
+        span.set(**_call_attributes(request.client.last_call, previous))
+        span.finish()
+        return data
+
+    async def _finish_async(self, span, request, awaitable, previous):
+        """Await the call of an asyncio client in its span."""
+        token = _CURRENT.set(span)
+        try:
+            data = await awaitable
+            span.set(**_call_attributes(request.client.last_call,
+                                        previous))
+            return data
+        except Exception as e:
+            span.fail(e)
+            raise
+        finally:
+            _CURRENT.reset(token)
+            span.finish()
+
+    def export(self, span):
+        """Write a finished span to the file.
+
+        Parameters:
+            span (Span): The span.
+        """
+        line = json.dumps(span.to_dict(), default=str) + '\n'
+        with self._lock:
+            if self._file is None:
+                # Line buffered, spans are kept if the program crashes
+                self._file = open(self.path, 'a', buffering=1,
+                                  encoding='utf-8')
+            self._file.write(line)
+
+    def close(self):
+        """Close the file, it's opened again by the next span."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _call_attributes(record, previous):
+    """Return span attributes of a call, 'short_circuited' when a later
+    middleware answered it without a request (no new 'last_call')."""
+    if record is previous:
+        return {'short_circuited': True}
+    return _record_attributes(record)
+
+
+def _record_attributes(record):
+    """Return span attributes of a 'last_call' record (dict)."""
+    attributes = dict((key, record[key]) for key in (
+        'status_code', 'cache', 'retries', 'bytes', 'shared', 'hedged')
+        if record.get(key) is not None)
+    for phase, value in (record.get('timings') or {}).items():
+        if value is not None:
+            attributes['timings.' + phase] = value
+    return attributes
+
+
+def to_chrome_trace(source, destination):
+    """Convert a spans file to Chrome trace event format.
+
+    Each thread, or asyncio task, is a row of the trace.
+
+    Parameters:
+        source (str): Path of the JSON lines file written by a Tracer.
+        destination (str): Path of the JSON file to write.
+
+    Returns:
+        Number of spans converted (int).
+    """
+    events = []
+    lanes = {}
+    with open(source, encoding='utf-8') as spans:
+        for line in spans:
+            if not line.strip():
+                continue
+            span = json.loads(line)
+            lane = (span.get('thread'), span.get('task'))
+            if lane not in lanes:
+                lanes[lane] = len(lanes) + 1
+                events.append({
+                    'name': 'thread_name', 'ph': 'M', 'pid': 1,
+                    'tid': lanes[lane],
+                    'args': {'name': "thread {0}{1}".format(
+                        lane[0], " task {0}".format(lane[1])
+                        if lane[1] else '')}})
+            args = dict(span['attributes'], span_id=span['spanId'],
+                        parent_id=span['parentSpanId'],
+                        trace_id=span['traceId'])
+            if span['status']['code'] == 'ERROR':
+                args['error'] = span['status'].get('message')
+            events.append({
+                'name': span['name'],
+                'cat': 'pybooru',
+                'ph': 'X',
+                'ts': span['startTimeUnixNano'] / 1000.0,
+                'dur': (span['endTimeUnixNano'] -
+                        span['startTimeUnixNano']) / 1000.0,
+                'pid': 1,
+                'tid': lanes[lane],
+                'args': args})
+
+    with open(destination, 'w', encoding='utf-8') as trace:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace)
+    return sum(1 for event in events if event['ph'] == 'X')
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+
+"""pybooru.transport
+
+This module contains the transports of Pybooru: requests adapters mounted
+in the session of a client instead of its connection pool. They record
+responses to a cassette file and replay them without network, so API calls
+can be benchmarked and tested offline and reproducibly.
+
+A cassette is a gzip compressed JSON lines file, with one request and
+response per line. Credentials (api_key, login, password_hash) are removed
+from recorded urls and forms, and aren't needed to replay them.
+
+Example:
+    # Record
+    client = Danbooru('danbooru', transport=Recorder('posts.jsonl.gz'))
+    client.post_list(tags='cat')
+    client.transport.close()
+
+    # Replay, with the recorded latency
+    client = Danbooru('danbooru',
+                      transport=Replayer('posts.jsonl.gz', latency='recorded'))
+    client.post_list(tags='cat')
+
+Transports are only supported by sync clients.
+
+Classes:
+    Transport -- Base class of transports.
+    Recorder -- Records responses of another adapter to a cassette.
+    Replayer -- Serves responses recorded in a cassette.
+"""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import base64
+import gzip
+import io
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib.parse import (urlsplit, urlunsplit, parse_qsl, urlencode)
+
+# pybooru imports
+from .exceptions import PybooruError
+
+# Version of the cassette format
+CASSETTE_VERSION = 1
+
+# Parameters removed from recorded urls and forms
+CREDENTIAL_PARAMS = frozenset(('api_key', 'login', 'password_hash'))
+
+# Headers not recorded, bodies are stored decoded
+_DROPPED_HEADERS = frozenset(('content-encoding', 'transfer-encoding',
+                              'content-length', 'set-cookie', 'connection',
+                              'keep-alive'))
+
+
+def _clean_query(query):
+    """Return a query string without credentials, with sorted parameters."""
+    return urlencode(sorted((key, value) for key, value in
+                            parse_qsl(query, keep_blank_values=True)
+                            if key not in CREDENTIAL_PARAMS))
+
+
+def _request_key(request):
+    """Return method, url and form of a request without credentials.
+
+    The form is only compared for urlencoded bodies, multipart bodies have
+    random boundaries.
+
+    Parameters:
+        request (requests.PreparedRequest): The request.
+    """
+    scheme, netloc, path, query, _ = urlsplit(request.url)
+    url = urlunsplit((scheme, netloc, path, _clean_query(query), ''))
+    form = None
+    content_type = request.headers.get('content-type') or ''
+    if request.body and content_type.startswith(
+            'application/x-www-form-urlencoded'):
+        body = request.body
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        form = _clean_query(body)
+    return request.method, url, form
+
+
+class Transport(BaseAdapter):
+    """Base class of transports.
+
+    A transport is a requests adapter mounted by a client for http:// and
+    https:// urls instead of its 'pool'.
+
+    Attributes:
+        offline (bool): The transport doesn't use the network.
+    """
+
+    offline = False
+
+    def bind(self, pool):
+        """Called by a client with its pool adapter before mounting.
+
+        Parameters:
+            pool (PoolAdapter): Connection pool of the client.
+        """
+        pass
+
+
+class Recorder(Transport):
+    """Records responses of another adapter to a cassette.
+
+    Entries are flushed after every response, so a cassette can be read
+    before the recorder is closed. Streamed responses are read before they
+    are returned.
+
+    Attributes:
+        path (str): Path of the cassette, overwritten.
+        adapter (requests.adapters.BaseAdapter): Adapter that sends the
+                                                 requests.
+    """
+
+    def __init__(self, path, adapter=None):
+        """Initialize Recorder.
+
+        Keyword arguments:
+            path (str): Path of the cassette, it's overwritten.
+            adapter (BaseAdapter): Adapter that sends the requests
+                                   (Default: None, the pool of the client).
+        """
+        super(Recorder, self).__init__()
+        self.path = path
+        self.adapter = adapter
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "{0}({1!r})".format(type(self).__name__, self.path)
+
+    def bind(self, pool):
+        """Send requests with the pool of the client, if no adapter is set.
+
+        Parameters:
+            pool (PoolAdapter): Connection pool of the client.
+        """
+        if self.adapter is None:
+            self.adapter = pool
+
+    def send(self, request, **kwargs):
+        """Send a request with the adapter and record its response."""
+        if self.adapter is None:
+            raise PybooruError("Recorder has no adapter, mount it with the "
+                               "'transport' option of a client.")
+        start = time.monotonic()
+        response = self.adapter.send(request, **kwargs)
+        content = response.content
+        self.record(request, response, content, time.monotonic() - start)
+        return response
+
+    def record(self, request, response, content, elapsed):
+        """Write a request and its response to the cassette.
+
+        Parameters:
+            request (requests.PreparedRequest): The request.
+            response (requests.Response): The response.
+            content (bytes): Decoded body of the response.
+            elapsed (float): Seconds until the body was read.
+        """
+        method, url, form = _request_key(request)
+        try:
+            body, encoding = content.decode('utf-8'), 'utf-8'
+        except UnicodeDecodeError:
+            body = base64.b64encode(content).decode('ascii')
+            encoding = 'base64'
+        entry = {'method': method, 'url': url, 'form': form,
+                 'status': response.status_code, 'reason': response.reason,
+                 'headers': dict((key, value) for key, value in
+                                 response.headers.items()
+                                 if key.lower() not in _DROPPED_HEADERS),
+                 'body': body, 'encoding': encoding,
+                 'elapsed': round(elapsed, 6)}
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+                self._file.write(json.dumps(
+                    {'cassette': 'pybooru', 'version': CASSETTE_VERSION}) +
+                    '\n')
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        """Close the cassette and the adapter."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if self.adapter is not None:
+            self.adapter.close()
+
+
+class Replayer(Transport):
+    """Serves responses recorded in a cassette.
+
+    Responses of a request are served in the order they were recorded, the
+    last one is repeated after that, so a call can be replayed many times.
+
+    Attributes:
+        path (str): Path of the cassette.
+        latency (float or str): Simulated latency of responses.
+        hits (int): Number of responses served.
+    """
+
+    offline = True
+
+    def __init__(self, path, latency=None):
+        """Initialize Replayer.
+
+        Keyword arguments:
+            path (str): Path of the cassette.
+            latency (float or str): Seconds to wait before every response,
+                                    or 'recorded' for the latency of the
+                                    recorded response (Default: None, no
+                                    wait).
+
+        Raises:
+            PybooruError: When the file isn't a cassette.
+        """
+        super(Replayer, self).__init__()
+        self.path = path
+        self.latency = latency
+        self.hits = 0
+        self._entries = {}
+        self._served = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def __repr__(self):
+        return "{0}({1!r}, latency={2!r})".format(type(self).__name__,
+                                                  self.path, self.latency)
+
+    def _load(self):
+        """Read the cassette."""
+        with gzip.open(self.path, 'rt', encoding='utf-8') as cassette:
+            lines = iter(cassette)
+            try:
+                header = json.loads(next(lines))
+            except (StopIteration, ValueError):
+                header = {}
+            if header.get('cassette') != 'pybooru':
+                raise PybooruError("Not a Pybooru cassette: {0}".format(
+                    self.path))
+            try:
+                for line in lines:
+                    entry = json.loads(line)
+                    key = (entry['method'], entry['url'], entry['form'])
+                    self._entries.setdefault(key, []).append(entry)
+            except EOFError:
+                # Recorder wasn't closed, entries are flushed
+                pass
+
+    def __len__(self):
+        """Return the number of recorded responses."""
+        return sum(len(entries) for entries in self._entries.values())
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        """Return the recorded response of a request.
+
+        Raises:
+            PybooruError: When the request wasn't recorded.
+            requests.exceptions.ReadTimeout: When the simulated latency is
+                                             longer than the read timeout.
+        """
+        key = _request_key(request)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise PybooruError(
+                    "No recorded response for {0} {1}".format(key[0],
+                                                              key[1]))
+            index = self._served.get(key, 0)
+            self._served[key] = index + 1
+            self.hits += 1
+        entry = entries[min(index, len(entries) - 1)]
+
+        latency = (entry['elapsed'] if self.latency == 'recorded'
+                   else self.latency)
+        if latency:
+            read = timeout[1] if isinstance(timeout, tuple) else timeout
+            if read is not None and latency > read:
+                time.sleep(read)
+                raise requests.exceptions.ReadTimeout(
+                    "Replayed response slower than the read timeout",
+                    request=request)
+            time.sleep(latency)
+        return self._build_response(request, entry)
+
+    @staticmethod
+    def _build_response(request, entry):
+        """Build a requests.Response from a cassette entry."""
+        if entry['encoding'] == 'base64':
+            content = base64.b64decode(entry['body'])
+        else:
+            content = entry['body'].encode('utf-8')
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = entry['reason']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.headers['content-length'] = str(len(content))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(content)
+        response._content = content
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        """Nothing to release."""
+        pass
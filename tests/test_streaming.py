@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""Tests of pybooru.streaming."""
+
+# __future__ imports
+from __future__ import absolute_import
+
+# External imports
+import json
+import unittest
+
+# pybooru imports
+from pybooru.streaming import iter_json_array
+
+# Numbers, literals, strings and nested records, with whitespace
+SAMPLE = (' [ 1.5 , -2e-3, 10, 0, 1E+2, true, false, null, "a,]b", '
+          '{"id": 1, "tags": "x y", "ratio": 0.25, "ids": [1, 22]}, '
+          '[], {}, -0.5e10 ] ')
+
+
+class IterJSONArrayTest(unittest.TestCase):
+
+    def test_every_split(self):
+        """Cut the sample at every position, in two and in three chunks."""
+        body = SAMPLE.encode('utf-8')
+        expected = json.loads(SAMPLE)
+        for first in range(len(body) + 1):
+            chunks = [body[:first], body[first:]]
+            self.assertEqual(list(iter_json_array(chunks)), expected,
+                             chunks)
+            for second in range(first, len(body) + 1):
+                chunks = [body[:first], body[first:second], body[second:]]
+                self.assertEqual(list(iter_json_array(chunks)), expected,
+                                 chunks)
+
+    def test_scalar_array(self):
+        self.assertEqual(list(iter_json_array([b'[1.', b'5]'])), [1.5])
+        self.assertEqual(list(iter_json_array([b'[1e', b'-', b'2]'])),
+                         [0.01])
+        self.assertEqual(list(iter_json_array([b'[1', b'2, 3', b']'])),
+                         [12, 3])
+
+    def test_document(self):
+        self.assertEqual(list(iter_json_array([b'{"a"', b': 1}'])),
+                         [{'a': 1}])
+
+    def test_invalid(self):
+        for chunks in ([b'[1x]'], [b'[1', b' 2]'], [b'[1,'], [b'[1] 2']):
+            with self.assertRaises(ValueError):
+                list(iter_json_array(chunks))
+
+
+if __name__ == '__main__':
+    unittest.main()